@@ -0,0 +1,192 @@
+# answer_cache.py
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+import traceback
+from array import array
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "answer_cache.sqlite3")
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.93"))
+
+
+class SemanticAnswerCache:
+    """
+    Caches final answers by question embedding, scoped to the loaded ontology.
+
+    A lookup embeds the question and returns the answer of the most similar earlier
+    question in the same scope, if its cosine similarity reaches the threshold. Entries
+    are held in memory in LRU order and written through to a local SQLite file, so
+    they survive restarts. The SQLite file is opened and read on first use, not on
+    construction, and numpy is only imported then.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None, threshold: float = None):
+        self.path = path or ANSWER_CACHE_PATH
+        self.max_entries = max_entries or ANSWER_CACHE_MAX_ENTRIES
+        self.threshold = ANSWER_CACHE_THRESHOLD if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> {"scope", "question", "vector", "answer"}
+        self._matrices = {}  # scope -> (ids, matrix of unit vectors), rebuilt lazily
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._open_lock = threading.Lock()
+
+    def _open(self):
+        """
+        Opens the SQLite file and loads its entries, once.
+        """
+        if self._db is not None:
+            return
+        with self._open_lock:
+            if self._db is not None:
+                return
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT NOT NULL, question TEXT NOT NULL, "
+                "vector BLOB NOT NULL, answer TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.commit()
+            self._load(db)
+            self._db = db
+
+    def _load(self, db):
+        import numpy as np
+
+        rows = db.execute(
+            "SELECT id, scope, question, vector, answer FROM answers ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for entry_id, scope, question, vector_blob, answer in reversed(rows):
+            vector = array("f")
+            vector.frombytes(vector_blob)
+            self._entries[entry_id] = {"scope": scope, "question": question, "vector": np.asarray(vector, dtype=np.float32), "answer": answer}
+        logger.info(f"Semantic answer cache loaded {len(self._entries)} entries from {self.path}.")
+
+    @staticmethod
+    def _normalise(vector):
+        import numpy as np
+
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _matrix_for(self, scope):
+        import numpy as np
+
+        cached = self._matrices.get(scope)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry["scope"] == scope]
+            matrix = np.vstack([self._entries[i]["vector"] for i in ids]) if ids else None
+            cached = self._matrices[scope] = (ids, matrix)
+        return cached
+
+    def lookup(self, vector, scope: str):
+        """
+        Returns {"answer", "question", "similarity"} for the nearest cached question in
+        scope, or None if nothing reaches the threshold.
+        """
+        import numpy as np
+
+        self._open()
+        query = self._normalise(vector)
+        with self._lock:
+            ids, matrix = self._matrix_for(scope)
+            if matrix is None or matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = ids[best]
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+        self._execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+        return {"answer": entry["answer"], "question": entry["question"], "similarity": similarity}
+
+    def store(self, question: str, vector, answer: str, scope: str):
+        """
+        Adds an answer to the cache, evicting the least recently used entries beyond max_entries.
+        """
+        self._open()
+        vector = self._normalise(vector)
+        cursor = self._execute(
+            "INSERT INTO answers (scope, question, vector, answer, last_used) VALUES (?, ?, ?, ?, ?)",
+            (scope, question, array("f", vector.tolist()).tobytes(), answer, time.time())
+        )
+        if cursor is None:
+            return
+        evicted = []
+        with self._lock:
+            self._entries[cursor.lastrowid] = {"scope": scope, "question": question, "vector": vector, "answer": answer}
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                evicted_id, evicted_entry = self._entries.popitem(last=False)
+                self._matrices.pop(evicted_entry["scope"], None)
+                evicted.append((evicted_id,))
+        if evicted:
+            self._executemany("DELETE FROM answers WHERE id = ?", evicted)
+
+    def invalidate(self, scope: str = None):
+        """
+        Drops all entries for scope, or the whole cache if scope is None.
+        """
+        self._open()
+        with self._lock:
+            if scope is None:
+                self._entries.clear()
+                self._matrices.clear()
+            else:
+                for entry_id in [i for i, e in self._entries.items() if e["scope"] == scope]:
+                    del self._entries[entry_id]
+                self._matrices.pop(scope, None)
+        if scope is None:
+            self._execute("DELETE FROM answers", ())
+        else:
+            self._execute("DELETE FROM answers WHERE scope = ?", (scope,))
+        logger.info(f"Semantic answer cache invalidated (scope={scope}).")
+
+    def _execute(self, sql, params):
+        try:
+            self._open()
+            with self._lock:
+                cursor = self._db.execute(sql, params)
+                self._db.commit()
+                return cursor
+        except Exception as e:
+            logger.error(f"ERROR in SemanticAnswerCache: {e}")
+            traceback.print_exc()
+            return None
+
+    def _executemany(self, sql, params):
+        try:
+            self._open()
+            with self._lock:
+                self._db.executemany(sql, params)
+                self._db.commit()
+        except Exception as e:
+            logger.error(f"ERROR in SemanticAnswerCache: {e}")
+            traceback.print_exc()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+            }
@@ -1,10 +1,16 @@
-# app2.py
+# app3.py
 
 import os
-from flask import Flask, request, jsonify, render_template
+import re
+import hashlib
+import functools
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import logging
 import json
+import time
+import uuid
+import threading
 import traceback
 
 # Load environment variables first
@@ -16,17 +22,41 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Make sure these imports are correct based on your project structure
-from connector_loader import load_connectors
-
-# Initialize OpenAI client (ensure this happens after env variables are loaded)
-from openai import OpenAI
-try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    logger.info("OpenAI client initialized successfully.")
-except Exception as e:
-    logger.critical(f"Failed to initialize OpenAI client: {e}")
-    traceback.print_exc()
-    client = None
+from tool_results import shape_tool_result, fetch_more, preview, CONTINUATION_TOOL_NAME
+from tool_executor import ToolCallExecutor, stop_when_set
+from chat_session import SessionStore
+from answer_cache import SemanticAnswerCache
+from ingestion import IngestionQueue
+from knowledge_registry import KnowledgeRegistry
+from connectors.mongo_connector import MongoConnector, MONGO_TOOL_NAME
+from connectors.client_pool import client_pool
+from metrics import metrics
+from lexical_index import query_embedding_cache
+
+# OpenAI client, created on the first chat completion: importing the SDK takes about a
+# second, which would otherwise be paid by every worker at startup. Tests can assign a
+# stand-in here.
+client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """
+    Returns the OpenAI client, creating it on first use. Raises if it cannot be created.
+    """
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                try:
+                    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+                    logger.info("OpenAI client initialized successfully.")
+                except Exception as e:
+                    logger.critical(f"Failed to initialize OpenAI client: {e}")
+                    traceback.print_exc()
+                    raise
+    return client
 
 app = Flask(__name__)
 
@@ -34,23 +64,144 @@ app = Flask(__name__)
 UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-# Global variables for connectors, tools, and the RAG handler instance
-connectors = {}
-llm_tools = []
-rdf_rag_handler_instance = None
-detected_ontology_types_global = []
-loaded_ontology_prefixes_global = {}
+# Uploads are saved as <content hash>_<file name>; only such files are ever deleted
+UPLOAD_NAME_PATTERN = re.compile(r"^[0-9a-f]{16}_")
+
+# Named knowledge bases, each with its own connectors, tools and RAG handler; loaded
+# on first use and replaced as a whole when an upload finishes
+knowledge_registry = KnowledgeRegistry()
+# Bounded thread pool that runs the tool calls of one LLM turn concurrently
+tool_executor = ToolCallExecutor()
+# Server-side conversation history and fetched tool results, per session ID
+session_store = SessionStore()
+# Answers to earlier questions, matched by question embedding and scoped to the ontology
+answer_cache = SemanticAnswerCache()
+# Client factory for MongoDB connectors; None means pymongo.MongoClient (tests can
+# substitute mongomock.MongoClient)
+mongo_client_factory = None
+# Upper bound on LLM tool-calling rounds per user message
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "4"))
+# Tools answering from the ontology alone. Answers of turns that also used another tool
+# (e.g. a live database) are not put in the semantic cache, whose scope is the ontology
+ONTOLOGY_TOOL_NAMES = {"query_text_with_rag", "query_uploaded_rdf_graph", "lookup_ontology_schema", CONTINUATION_TOOL_NAME}
+# Knowledge bases loaded by the warm-up (comma-separated; empty for none)
+KNOWLEDGE_PRELOAD = [
+    name.strip() for name in os.getenv("KNOWLEDGE_PRELOAD", knowledge_registry.default_name).split(",") if name.strip()
+]
+# Warm-up progress reported by /readyz: idle -> running -> ready | failed
+warmup_state = {"status": "idle", "started_at": None, "finished_at": None, "knowledge_bases": {}, "error": None}
+_warmup_lock = threading.Lock()
 
 def initialize_app_data():
     """
-    Initializes connectors and tools. This function is called once on app startup.
+    Warms the app up: creates the OpenAI client and loads the KNOWLEDGE_PRELOAD knowledge
+    bases that have an ontology, so the first chat does not pay for them. Nothing is
+    loaded at import time; start_warmup() runs this in the background.
+    """
+    try:
+        get_openai_client()
+        for name in KNOWLEDGE_PRELOAD:
+            if name not in knowledge_registry:
+                warmup_state["knowledge_bases"][name] = "not registered"
+                continue
+            snapshot = knowledge_registry.get(name)
+            warmup_state["knowledge_bases"][name] = "loaded" if snapshot.loaded else "empty"
+        warmup_state["status"] = "ready"
+        logger.info(f"Application data initialized: {len(knowledge_registry.names())} knowledge bases registered ({', '.join(knowledge_registry.names()) or 'none'}), warm-up loaded {warmup_state['knowledge_bases']}.")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+        traceback.print_exc()
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = str(e)
+    finally:
+        warmup_state["finished_at"] = time.time()
+
+
+def start_warmup():
+    """
+    Starts initialize_app_data() on a background thread, once per process (again after a
+    failure). Called by the readiness probe, i.e. after any fork, so no threads are
+    started before workers fork.
+    """
+    with _warmup_lock:
+        if warmup_state["status"] not in ("idle", "failed"):
+            return
+        warmup_state.update(status="running", started_at=time.time(), finished_at=None, error=None)
+    threading.Thread(target=initialize_app_data, name="warmup", daemon=True).start()
+
+
+def on_knowledge_swap(previous, snapshot):
+    """
+    Called after an ingestion job publishes a new snapshot.
     """
-    global connectors, llm_tools, rdf_rag_handler_instance
-    connectors, llm_tools, rdf_rag_handler_instance = load_connectors()
-    logger.info("Application data (connectors, tools, RAG handler) initialized.")
+    # Cached answers about a replaced ontology are no longer valid
+    previous_cache_scope = answer_cache_scope(previous)
+    if previous_cache_scope and previous_cache_scope != answer_cache_scope(snapshot):
+        answer_cache.invalidate(previous_cache_scope)
+    # The replaced upload is no longer served (a re-upload of the same content keeps its path)
+    remove_unused_upload(previous.ontology_file, keep=(snapshot.ontology_file,))
 
-initialize_app_data()
+
+def save_upload(file, upload_dir, filename):
+    """
+    Saves an uploaded ontology as <content hash>_<filename> in upload_dir and returns
+    its path. The file a knowledge base is serving is never overwritten: the registry
+    only points at the new file once its ingestion job publishes, so an upload that
+    fails to parse leaves the live ontology and its registry entry intact.
+    """
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.upload")
+    file.save(tmp_path)
+    digest = hashlib.sha256()
+    with open(tmp_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    file_path = os.path.join(upload_dir, f"{digest.hexdigest()[:16]}_{filename}")
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def remove_unused_upload(file_path, keep=()):
+    """
+    Deletes an ontology file saved by save_upload() that is no longer served, unless it
+    is one of the paths in keep or a queued job still has to ingest it. Other files are
+    left alone.
+    """
+    if not file_path or file_path in keep or not UPLOAD_NAME_PATTERN.match(os.path.basename(file_path)):
+        return
+    upload_root = os.path.abspath(app.config['UPLOAD_FOLDER']) + os.sep
+    if not os.path.abspath(file_path).startswith(upload_root) or file_path in ingestion_queue.active_files():
+        return
+    try:
+        os.remove(file_path)
+        logger.info(f"Removed unused upload {file_path}.")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error removing unused upload {file_path}: {e}")
+
+
+def on_ingestion_discard(job):
+    """
+    Called after an ingestion job failed or was superseded; its upload is not needed.
+    """
+    remove_unused_upload(job.file_path, keep=(
+        knowledge_registry.ontology_file(job.knowledge_base), knowledge_registry.current(job.knowledge_base).ontology_file
+    ))
+
+
+# Uploads are parsed, indexed and embedded in the background
+ingestion_queue = IngestionQueue(knowledge_registry, on_swap=on_knowledge_swap, on_discard=on_ingestion_discard)
+
+
+def requested_knowledge_base(name):
+    """
+    Returns the knowledge base name for a request (the default if none given), or None
+    if the named base is not registered.
+    """
+    name = name or knowledge_registry.default_name
+    if name != knowledge_registry.default_name and name not in knowledge_registry:
+        return None
+    return name
 
 ALLOWED_EXTENSIONS = {'ttl', 'owl', 'rdf', 'xml'}
 
@@ -64,7 +215,15 @@ def index():
 
 @app.route('/upload-ontology', methods=['POST'])
 def upload_ontology():
-    global connectors, llm_tools, rdf_rag_handler_instance, detected_ontology_file
+    """
+    Saves the uploaded ontology and queues its ingestion into the knowledge base named
+    by the optional "knowledge_base" form field (created if new). Returns 202 with a
+    job ID; progress is reported by /jobs/<job_id> and the new ontology goes live when
+    the job succeeds.
+    """
+    knowledge_base = request.form.get('knowledge_base') or knowledge_registry.default_name
+    if not knowledge_registry.valid_name(knowledge_base):
+        return jsonify({"status": "error", "message": f"Invalid knowledge base name '{knowledge_base}'. Use up to 40 letters, digits, '-' or '_'."}), 400
 
     if 'file' not in request.files:
         return jsonify({"status": "error", "message": "No file part in the request."}), 400
@@ -75,26 +234,21 @@ def upload_ontology():
     
     if file:
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        detected_ontology_file = file_path # Update the global path to the current ontology
+        # One folder per knowledge base so equally named files don't overwrite each other
+        upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], knowledge_base)
+        os.makedirs(upload_dir, exist_ok=True)
+        file_path = save_upload(file, upload_dir, filename)
 
         try:
-            # --- START OF FIX ---
-            # Call load_connectors to re-initialize everything with the new file
-            connectors, llm_tools, rdf_rag_handler_instance = load_connectors(ontology_file_path=file_path)
-
-            # Check if RDFConnector successfully loaded the graph
-            if "rdf_connector" in connectors and connectors["rdf_connector"].graph:
-                message = f"Ontology '{filename}' uploaded and loaded successfully!"
-                logger.info(message)
-                return jsonify({"status": "success", "message": message, "file_name": filename})
-            else:
-                error_message = f"Failed to load ontology graph from '{filename}'. Please check logs for details."
-                logger.error(error_message)
-                return jsonify({"status": "error", "message": error_message}), 500
-            # --- END OF FIX ---
-
+            job = ingestion_queue.submit(file_path, filename, knowledge_base)
+            return jsonify({
+                "status": "accepted",
+                "message": f"Ontology '{filename}' uploaded; processing started.",
+                "file_name": filename,
+                "knowledge_base": knowledge_base,
+                "job_id": job.job_id,
+                "status_url": f"/jobs/{job.job_id}"
+            }), 202
         except Exception as e:
             logger.error(f"Error processing uploaded file: {e}")
             traceback.print_exc()
@@ -103,21 +257,162 @@ def upload_ontology():
     return jsonify({"status": "error", "message": "Unexpected error during file upload."}), 500
 
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Reports an ingestion job's status and per-stage progress (parse, index, chunk, embed).
+    """
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job '{job_id}'."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/knowledge-bases', methods=['GET'])
+def list_knowledge_bases():
+    """
+    Lists registered knowledge bases and whether each is currently loaded.
+    """
+    bases = knowledge_registry.stats()["bases"]
+    return jsonify({
+        "default": knowledge_registry.default_name,
+        "knowledge_bases": [
+            {"name": name, "loaded": entry["loaded"], "triples": entry["triples"]}
+            for name, entry in bases.items()
+        ]
+    })
+
+
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return jsonify({"status": "ok"})
+
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    """
+    Readiness probe: starts the warm-up on first call and answers 503 until it has
+    finished, then 200. The body reports which knowledge bases the warm-up loaded.
+    """
+    start_warmup()
+    status = warmup_state["status"]
+    body = {**warmup_state, "knowledge_bases": dict(warmup_state["knowledge_bases"]), "loaded": knowledge_registry.stats()["loaded"]}
+    return jsonify(body), 200 if status == "ready" else 503
+
+
+@app.route('/stats', methods=['GET'])
+def cache_stats():
+    """
+    Reports cache statistics (hit rates, occupancy) and per-tool execution times.
+    """
+    from ontology_cache import get_snapshot_cache
+
+    stats = {"ontology_snapshots": get_snapshot_cache().stats(), "knowledge_bases": knowledge_registry.stats()}
+    stats["tools"] = tool_executor.stats()
+    stats["answer_cache"] = answer_cache.stats()
+    stats["ingestion"] = ingestion_queue.stats()
+    stats["database_clients"] = client_pool.stats()
+    return jsonify(stats)
+
+
+def collect_app_metrics():
+    """
+    Reports the counters kept by the caches, tools and knowledge bases to /metrics.
+    """
+    from ontology_cache import get_snapshot_cache
+
+    answers = answer_cache.stats()
+    yield "answer_cache_lookups", "counter", {"result": "hit"}, answers["hits"]
+    yield "answer_cache_lookups", "counter", {"result": "miss"}, answers["misses"]
+    yield "answer_cache_entries", "gauge", {}, answers["entries"]
+
+    embeddings = query_embedding_cache.stats()
+    yield "query_embedding_cache_lookups", "counter", {"result": "hit"}, embeddings["hits"]
+    yield "query_embedding_cache_lookups", "counter", {"result": "miss"}, embeddings["misses"]
+
+    snapshots = get_snapshot_cache().stats()
+    yield "ontology_loads", "counter", {"source": "parse"}, snapshots["parse_count"]
+    yield "ontology_loads", "counter", {"source": "snapshot"}, snapshots["snapshot_load_count"]
+    yield "ontology_loads", "counter", {"source": "mmap"}, snapshots["mmap_open_count"]
+
+    for tool_name, tool_stats in tool_executor.stats().items():
+        yield "tool_timeouts", "counter", {"tool": tool_name}, tool_stats["timeouts"]
+        yield "tool_errors", "counter", {"tool": tool_name}, tool_stats["errors"]
+
+    registry_stats = knowledge_registry.stats()
+    yield "knowledge_bases_loaded", "gauge", {}, registry_stats["loaded"]
+    yield "knowledge_triples_loaded", "gauge", {}, registry_stats["loaded_triples"]
+    for name, base in registry_stats["bases"].items():
+        sparql_cache = base.get("sparql_result_cache")
+        if sparql_cache:
+            yield "sparql_cache_lookups", "counter", {"knowledge_base": name, "result": "hit"}, sparql_cache["hits"]
+            yield "sparql_cache_lookups", "counter", {"knowledge_base": name, "result": "miss"}, sparql_cache["misses"]
+        rag = base.get("rag")
+        if rag:
+            for mode, count in rag["queries"].items():
+                yield "rag_queries", "counter", {"knowledge_base": name, "mode": mode}, count
+        router = base.get("router")
+        if router:
+            for outcome in ("keyword_routed", "embedding_routed", "unrouted"):
+                yield "router_questions", "counter", {"knowledge_base": name, "outcome": outcome}, router[outcome]
+
+    jobs = ingestion_queue.stats()
+    for status, count in jobs["by_status"].items():
+        yield "ingestion_jobs", "gauge", {"status": status}, count
+
+
+metrics.register_collector(collect_app_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Exposes request, LLM, tool, SPARQL, RAG and ingestion metrics in Prometheus text format.
+    """
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 @app.route('/connect-databases', methods=['POST'])
 def connect_databases():
-    logger.info("Connect to Databases endpoint hit (placeholder).")
+    """
+    Connects external databases to a knowledge base (the default unless "knowledge_base"
+    is given) and exposes them to the LLM as tools. Currently supports MongoDB.
+    """
+    logger.info("Connect to Databases endpoint hit.")
     try:
-        data = request.json
+        data = request.json or {}
         graph_db_url = data.get('graphDbUrl')
         nosql_db_url = data.get('nosqlDbUrl')
         nosql_db_name = data.get('nosqlDbName')
         nosql_db_collection = data.get('nosqlDbCollection')
+        knowledge_base = data.get('knowledge_base') or knowledge_registry.default_name
+        if not knowledge_registry.valid_name(knowledge_base):
+            return jsonify({"error": f"Invalid knowledge base name '{knowledge_base}'."}), 400
 
         response_messages = []
 
+        if graph_db_url:
+            response_messages.append("SPARQL endpoint connections are not supported yet.")
+
+        if nosql_db_url:
+            if not nosql_db_name or not nosql_db_collection:
+                return jsonify({"error": "MongoDB database and collection names are required."}), 400
+            mongo_connector = MongoConnector(nosql_db_url, nosql_db_name, nosql_db_collection, client_factory=mongo_client_factory)
+            try:
+                mongo_connector.connect()
+            except Exception as e:
+                logger.error(f"Error connecting to MongoDB: {e}")
+                return jsonify({"error": f"Could not connect to MongoDB: {e}"}), 502
+            replaced = knowledge_registry.attach_connector(knowledge_base, "mongo_connector", mongo_connector, mongo_connector.tool_spec())
+            if replaced is not None:
+                replaced.close()
+            response_messages.append(f"Connected to MongoDB collection '{nosql_db_name}.{nosql_db_collection}'.")
+
         if not response_messages:
-            return jsonify({"message": "No database types selected or no URLs provided. (Connection logic not fully implemented yet.)"}), 200
+            return jsonify({"message": "No database types selected or no URLs provided."}), 200
 
         return jsonify({"message": "\n".join(response_messages)}), 200
 
@@ -127,20 +422,11 @@ def connect_databases():
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 
-@app.route('/chat', methods=['POST'])
-def handle_chat():
-    global connectors, llm_tools, rdf_rag_handler_instance
-
-    try:
-        user_message = request.json.get('message')
-        if not user_message:
-            return jsonify({"response": "No message provided."}), 400
-
-        messages = [
-            {"role": "system", "content": """You are a helpful assistant specialized in understanding and querying knowledge graphs.
+SYSTEM_PROMPT = """You are a helpful assistant specialized in understanding and querying knowledge graphs.
             You have access to tools that allow you to:
             1. Retrieve information from an uploaded ontology file using Retrieval Augmented Generation (RAG).
             2. Execute SPARQL queries directly on the uploaded RDF graph.
+            3. Query connected MongoDB collections.
 
             Always try to use the provided tools to answer questions about the ontology, its classes, properties, and instances.
             If a question is about the structure or content of the ontology, use the appropriate tool.
@@ -155,104 +441,416 @@ def handle_chat():
             PREFIX dct: <http://purl.org/dc/terms/>
             PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
             PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-            """},
-            {"role": "user", "content": user_message}
+            """
+
+
+def answer_cache_scope(snapshot):
+    """
+    Returns the semantic answer cache scope (ontology content hash + embedding model),
+    or None if no ontology or embedder is available. Only answers built from
+    ONTOLOGY_TOOL_NAMES are stored, so the scope holds nothing else they depend on.
+    """
+    if not snapshot.content_hash or snapshot.rag_handler is None:
+        return None
+    return f"{snapshot.content_hash}:{snapshot.rag_handler.embedding_model_name}"
+
+
+def embed_question(snapshot, question):
+    """
+    Embeds a question with the RAG handler's embedder. Returns None on failure.
+    The vector is cached, so a routed RAG call for the same question reuses it.
+    """
+    try:
+        with metrics.span("embed_question"):
+            return snapshot.rag_handler.embed_query(question)
+    except Exception as e:
+        logger.error(f"Error embedding question for the answer cache: {e}")
+        return None
+
+
+def current_knowledge_version(snapshot):
+    """
+    Identifies the loaded ontology, so session tool results are not reused across uploads.
+    """
+    return snapshot.version, snapshot.content_hash
+
+
+def run_tool(snapshot, tool_name, tool_args):
+    """
+    Dispatches a single tool call by name against a knowledge snapshot. Returns the
+    tool's raw result (list, generator, dict or error string).
+    """
+    current_tool_response = "No tool response." # Default for current tool
+    connectors = snapshot.connectors
+    rdf_rag_handler_instance = snapshot.rag_handler
+
+    if tool_name == "query_text_with_rag":
+        if rdf_rag_handler_instance and rdf_rag_handler_instance.vector_store:
+            try:
+                query_text = json.loads(tool_args).get("query_text")
+                k = json.loads(tool_args).get("k", 4)
+                current_tool_response = rdf_rag_handler_instance.query_text(query_text, k)
+            except Exception as e:
+                logger.error(f"Error executing RAG tool '{tool_name}': {e}")
+                current_tool_response = f"Error executing RAG tool: {e}"
+        else:
+            current_tool_response = "Error: RAG handler or vector store not initialized. Please ensure an ontology is uploaded."
+    elif tool_name == "query_uploaded_rdf_graph":
+        if "rdf_connector" in connectors and connectors["rdf_connector"].graph:
+            try:
+                sparql_query = json.loads(tool_args).get("sparql_query")
+                # Stream rows so only what fits the tool output budget is formatted
+                current_tool_response = connectors["rdf_connector"].iter_query(sparql_query)
+            except Exception as e:
+                logger.error(f"Error executing SPARQL tool '{tool_name}': {e}")
+                current_tool_response = f"Error executing SPARQL tool: {e}"
+        else:
+            current_tool_response = "Error: RDF graph not loaded or connector not initialized. Please ensure an ontology is uploaded."
+    elif tool_name == "lookup_ontology_schema":
+        if "rdf_connector" in connectors and connectors["rdf_connector"].graph:
+            try:
+                args = json.loads(tool_args)
+                current_tool_response = connectors["rdf_connector"].schema_lookup(
+                    args.get("operation"), args.get("term"), bool(args.get("transitive", False))
+                )
+            except Exception as e:
+                logger.error(f"Error executing schema lookup tool '{tool_name}': {e}")
+                current_tool_response = f"Error executing schema lookup tool: {e}"
+        else:
+            current_tool_response = "Error: RDF graph not loaded or connector not initialized. Please ensure an ontology is uploaded."
+    elif tool_name == MONGO_TOOL_NAME:
+        if "mongo_connector" in connectors:
+            try:
+                args = json.loads(tool_args)
+                # Lazy cursor: documents are fetched only as far as the result is paged
+                current_tool_response = connectors["mongo_connector"].execute_query(
+                    args.get("filter") or {}, projection=args.get("projection"),
+                    limit=args.get("limit"), sort=args.get("sort"),
+                    max_time_ms=int(tool_executor.timeout_for(MONGO_TOOL_NAME) * 1000)
+                )
+            except Exception as e:
+                logger.error(f"Error executing MongoDB tool '{tool_name}': {e}")
+                current_tool_response = f"Error executing MongoDB query: {e}"
+        else:
+            current_tool_response = "Error: no MongoDB collection connected. Connect one via /connect-databases."
+    elif tool_name == CONTINUATION_TOOL_NAME:
+        try:
+            continuation_id = json.loads(tool_args).get("continuation_id")
+            current_tool_response = fetch_more(continuation_id)
+        except Exception as e:
+            logger.error(f"Error executing continuation tool '{tool_name}': {e}")
+            current_tool_response = f"Error fetching more results: {e}"
+    else:
+        current_tool_response = f"Unknown tool: {tool_name}"
+    return current_tool_response
+
+
+def execute_tool_call(tool_call_id, tool_name, tool_args, cancel_event=None, snapshot=None):
+    """
+    Runs a tool call and returns the "tool" role message for the LLM.
+    If cancel_event is set (tool timed out), streamed results stop being consumed.
+    """
+    # Lazy results are produced while being shaped, so the span covers both
+    with metrics.span("tool", tool=tool_name):
+        current_tool_response = run_tool(snapshot or knowledge_registry.get(), tool_name, tool_args)
+        if cancel_event is not None and hasattr(current_tool_response, "__next__"):
+            current_tool_response = stop_when_set(current_tool_response, cancel_event)
+
+        # Cap rows/characters per tool call and hand back a continuation_id for the rest
+        tool_content = shape_tool_result(current_tool_response)
+    logger.info(f"Tool '{tool_name}' executed (ID: {tool_call_id}). Response ({len(tool_content)} chars): {preview(tool_content)}")
+
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call_id,
+        "name": tool_name,
+        "content": tool_content
+    }
+
+
+def _assistant_message(content, tool_calls):
+    """
+    Builds a plain-dict assistant message (storable in the session history).
+    """
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = [
+            {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+            for call in tool_calls
         ]
+    return message
+
+
+def _accumulate_tool_call_deltas(tool_calls_by_index, deltas):
+    """
+    Merges streamed tool_call fragments (id, name, argument chunks) keyed by their index.
+    """
+    for delta in deltas:
+        entry = tool_calls_by_index.setdefault(delta.index, {"id": None, "name": "", "arguments": ""})
+        if delta.id:
+            entry["id"] = delta.id
+        if delta.function:
+            if delta.function.name:
+                entry["name"] += delta.function.name
+            if delta.function.arguments:
+                entry["arguments"] += delta.function.arguments
+
+
+def _complete(request_kwargs, stream):
+    """
+    Runs one chat completion. Yields ("token", text) events while streaming and returns
+    (content, tool_calls) where tool_calls is a list of {"id", "name", "arguments"} dicts.
+    """
+    model = request_kwargs["model"]
+    if not stream:
+        with metrics.span("llm_request", model=model):
+            response = get_openai_client().chat.completions.create(**request_kwargs)
+        _record_token_usage(model, getattr(response, "usage", None))
+        response_message = response.choices[0].message
+        tool_calls = [
+            {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+            for call in (response_message.tool_calls or [])
+        ]
+        return response_message.content, tool_calls
+
+    content_parts = []
+    tool_calls_by_index = {}
+    started = time.perf_counter()
+    first_token_seconds = None
+    # The final chunk then carries the token usage of the whole completion
+    for chunk in get_openai_client().chat.completions.create(stream=True, stream_options={"include_usage": True}, **request_kwargs):
+        _record_token_usage(model, getattr(chunk, "usage", None))
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if first_token_seconds is None:
+            first_token_seconds = time.perf_counter() - started
+            metrics.observe("llm_first_token", first_token_seconds, model=model)
+        if delta.tool_calls:
+            _accumulate_tool_call_deltas(tool_calls_by_index, delta.tool_calls)
+        if delta.content:
+            content_parts.append(delta.content)
+            yield "token", {"text": delta.content}
+    # Includes the time the client took to consume the streamed tokens
+    metrics.observe("llm_request", time.perf_counter() - started, model=model)
+    tool_calls = [tool_calls_by_index[i] for i in sorted(tool_calls_by_index)]
+    return "".join(content_parts) or None, tool_calls
+
+
+def _record_token_usage(model, usage):
+    if usage is None:
+        return
+    metrics.increment("llm_tokens", usage.prompt_tokens or 0, model=model, type="prompt")
+    metrics.increment("llm_tokens", usage.completion_tokens or 0, model=model, type="completion")
+
+
+def chat_turn_events(session, user_message, stream=False, snapshot=None):
+    """
+    Runs one user turn as a bounded multi-round tool loop and yields progress events:
+    ("tool_start", ...), ("tool_end", ...), ("token", ...) when streaming, and finally
+    ("final", {"response": answer}).
 
-        logger.info(f"User message: {user_message}")
-
-        # Add tools to the LLM call
-        if not llm_tools:
-            current_ontology_path = detected_ontology_file if 'detected_ontology_file' in globals() else None
-            _, llm_tools, _ = load_connectors(ontology_file_path=current_ontology_path)
-            logger.info("Re-loaded connectors and tools in handle_chat as they were not populated.")
-
-        tool_specs = [{"type": "function", "function": tool["function"]} for tool in llm_tools]
-
-        response_llm = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            tools=tool_specs,
-            tool_choice="auto",
-            temperature=0.0
-        )
-
-        response_message = response_llm.choices[0].message
-        tool_calls = response_message.tool_calls
-
-        if tool_calls:
-            logger.info(f"--- LLM called a tool ---")
-            logger.info(f"Tool Calls: {tool_calls}")
-
-            # Append the assistant's tool_calls message to the messages list
-            messages.append(response_message)
-
-            # --- CRITICAL FIX START: Handle multiple tool calls ---
-            tool_responses_for_llm = [] # List to collect all tool outputs
-            for tool_call in tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = tool_call.function.arguments
-                
-                current_tool_response = "No tool response." # Default for current tool
-                
-                if tool_name == "query_text_with_rag":
-                    if rdf_rag_handler_instance and rdf_rag_handler_instance.vector_store:
-                        try:
-                            query_text = json.loads(tool_args).get("query_text")
-                            k = json.loads(tool_args).get("k", 4)
-                            current_tool_response = rdf_rag_handler_instance.query_text(query_text, k)
-                        except Exception as e:
-                            logger.error(f"Error executing RAG tool '{tool_name}': {e}")
-                            current_tool_response = f"Error executing RAG tool: {e}"
-                    else:
-                        current_tool_response = "Error: RAG handler or vector store not initialized. Please ensure an ontology is uploaded."
-                elif tool_name == "query_uploaded_rdf_graph":
-                    if "rdf_connector" in connectors and connectors["rdf_connector"].graph:
-                        try:
-                            sparql_query = json.loads(tool_args).get("sparql_query")
-                            current_tool_response = connectors["rdf_connector"].execute_query(sparql_query)
-                        except Exception as e:
-                            logger.error(f"Error executing SPARQL tool '{tool_name}': {e}")
-                            current_tool_response = f"Error executing SPARQL tool: {e}"
-                    else:
-                        current_tool_response = "Error: RDF graph not loaded or connector not initialized. Please ensure an ontology is uploaded."
-                else:
-                    current_tool_response = f"Unknown tool: {tool_name}"
-
-                logger.info(f"Tool '{tool_name}' executed (ID: {tool_call.id}). Response: {current_tool_response}")
-
-                # Append each tool's response to the list
-                tool_responses_for_llm.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": tool_name,
-                    "content": json.dumps(current_tool_response) if isinstance(current_tool_response, (list, dict)) else str(current_tool_response)
-                })
-            # --- CRITICAL FIX END ---
-
-            # Append all collected tool responses to the messages list
-            messages.extend(tool_responses_for_llm)
-
-
-            logger.info(f"--- Sending Tool Outputs to LLM for Final Response Generation ---")
-            final_response_llm = client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.0
-            )
-            final_answer = final_response_llm.choices[0].message.content
-            logger.info(f"--- Final Answer Generated ---")
-            logger.info(f"Answer: {final_answer}")
-
-            return jsonify({"response": final_answer})
+    The system prompt and tool specs are static and the session history is append-only,
+    so consecutive requests share an identical message prefix. Tool calls identical to
+    ones already answered in this session reuse the stored result.
 
+    The whole turn runs against one knowledge snapshot, even if an upload goes live meanwhile.
+    """
+    snapshot = snapshot or knowledge_registry.get()
+    # Tool specs are precomputed per snapshot, so every request sends an identical tools prefix
+    tool_specs = snapshot.tool_specs
+    session.sync_knowledge(current_knowledge_version(snapshot))
+
+    # Only conversation-opening questions are answered from / stored in the semantic
+    # cache; follow-ups depend on earlier turns
+    cache_scope = answer_cache_scope(snapshot) if not session.history else None
+    tools_used = set()
+    question_vector = embed_question(snapshot, user_message) if cache_scope else None
+    if question_vector is not None:
+        cached = answer_cache.lookup(question_vector, cache_scope)
+        if cached is not None:
+            logger.info(f"Answer served from semantic cache (similarity {cached['similarity']:.3f} to '{preview(cached['question'], 80)}').")
+            session.append({"role": "user", "content": user_message})
+            session.append(_assistant_message(cached["answer"], None))
+            yield "cache_hit", {"similarity": round(cached["similarity"], 4), "question": cached["question"]}
+            if stream:
+                yield "token", {"text": cached["answer"]}
+            yield "final", {"response": cached["answer"]}
+            return
+
+    session.append({"role": "user", "content": user_message})
+    logger.info(f"User message (session {session.session_id}): {preview(user_message)}")
+
+    # Questions the router can map to tool calls get them run straight away, saving the
+    # round trip in which the model would otherwise pick the same tools. Follow-ups are
+    # only routed by keyword, as they have no question vector.
+    routed_calls = snapshot.router.route(
+        user_message, question_vector=question_vector, use_embeddings=question_vector is not None
+    ) if snapshot.router is not None else []
+    if routed_calls:
+        tool_calls = [
+            {"id": f"route_{uuid.uuid4().hex[:12]}_{index}", "name": route.tool_name, "arguments": json.dumps(args)}
+            for index, (route, args) in enumerate(routed_calls)
+        ]
+        logger.info(f"--- Router selected tools --- {preview(tool_calls)}")
+        tools_used.update(call["name"] for call in tool_calls)
+        session.append(_assistant_message(None, tool_calls))
+        yield from _run_tool_calls(session, snapshot, tool_calls, round_number=0, routed=True)
+
+    for round_index in range(MAX_TOOL_ROUNDS + 1):
+        request_kwargs = {
+            "model": "gpt-4o",
+            "messages": [{"role": "system", "content": SYSTEM_PROMPT}] + session.history,
+            "temperature": 0.0
+        }
+        # The last round withholds tools so the model has to answer
+        if tool_specs and round_index < MAX_TOOL_ROUNDS:
+            request_kwargs["tools"] = tool_specs
+            request_kwargs["tool_choice"] = "auto"
+
+        content, tool_calls = yield from _complete(request_kwargs, stream)
+
+        if not tool_calls:
+            session.append(_assistant_message(content, None))
+            session.trim_history()
+            logger.info(f"--- Final Answer Generated (round {round_index + 1}) ---")
+            logger.info(f"Answer: {preview(content)}")
+            if question_vector is not None and content and tools_used <= ONTOLOGY_TOOL_NAMES:
+                answer_cache.store(user_message, question_vector, content, cache_scope)
+            yield "final", {"response": content}
+            return
+
+        logger.info(f"--- LLM called a tool (round {round_index + 1}) ---")
+        logger.info(f"Tool Calls: {preview(tool_calls)}")
+        tools_used.update(call["name"] for call in tool_calls)
+        session.append(_assistant_message(content, tool_calls))
+        yield from _run_tool_calls(session, snapshot, tool_calls, round_number=round_index + 1)
+
+
+def _run_tool_calls(session, snapshot, tool_calls, round_number, routed=False):
+    """
+    Answers tool_calls (already appended as an assistant message) and appends their
+    results to the session in call order. Calls answered earlier in the session reuse the
+    stored result; the rest run concurrently. Yields tool_start / tool_end events.
+    """
+    outcomes = []
+    pending_calls = []
+    for call in tool_calls:
+        start_event = {"id": call["id"], "name": call["name"], "round": round_number}
+        if routed:
+            start_event["routed"] = True
+        yield "tool_start", start_event
+        reused = session.get_tool_result(call["name"], call["arguments"])
+        if reused is not None:
+            logger.info(f"Tool '{call['name']}' (ID: {call['id']}) answered from session results.")
+            outcome = {"index": len(outcomes) + len(pending_calls), "id": call["id"], "name": call["name"],
+                       "status": "reused", "duration_ms": 0.0,
+                       "message": {"role": "tool", "tool_call_id": call["id"], "name": call["name"], "content": reused}}
+            outcomes.append(outcome)
         else:
-            logger.info("LLM did not call a tool, generating direct response.")
-            return jsonify({"response": response_message.content})
+            pending_calls.append((len(outcomes) + len(pending_calls), call))
+
+    for outcome in outcomes:
+        yield "tool_end", _tool_end_event(outcome)
+
+    # Run the remaining tool calls concurrently; report each as it finishes
+    for outcome in tool_executor.iter_run(
+        [(call["id"], call["name"], call["arguments"]) for _, call in pending_calls],
+        functools.partial(execute_tool_call, snapshot=snapshot)
+    ):
+        original_index, call = pending_calls[outcome["index"]]
+        outcome["index"] = original_index
+        if outcome["status"] == "ok":
+            session.store_tool_result(call["name"], call["arguments"], outcome["message"]["content"])
+        outcomes.append(outcome)
+        yield "tool_end", _tool_end_event(outcome)
+
+    # Tool results must follow the assistant message in tool_call order
+    outcomes.sort(key=lambda outcome: outcome["index"])
+    for outcome in outcomes:
+        session.append(outcome["message"])
+
+
+def _tool_end_event(outcome):
+    return {
+        "id": outcome["id"],
+        "name": outcome["name"],
+        "status": outcome["status"],
+        "duration_ms": outcome["duration_ms"],
+        "chars": len(outcome["message"]["content"])
+    }
+
+
+@app.route('/chat', methods=['POST'])
+def handle_chat():
+    try:
+        user_message = request.json.get('message')
+        if not user_message:
+            return jsonify({"response": "No message provided."}), 400
+        knowledge_base = requested_knowledge_base(request.json.get('knowledge_base'))
+        if knowledge_base is None:
+            return jsonify({"response": f"Unknown knowledge base '{request.json.get('knowledge_base')}'."}), 404
+
+        session = session_store.get_or_create(request.json.get('session_id'))
+        with metrics.trace("chat_request", endpoint="chat"), session.lock:
+            final = {"response": None}
+            snapshot = knowledge_registry.get(knowledge_base)
+            for event, data in chat_turn_events(session, user_message, snapshot=snapshot):
+                if event == "final":
+                    final = data
+        return jsonify({**final, "session_id": session.session_id})
 
     except Exception as e:
         logger.error(f"An error occurred during chat processing: {e}")
         traceback.print_exc()
         return jsonify({"response": f"An error occurred: {e}"}), 500
+
+
+def sse_event(event, data):
+    """
+    Formats one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/chat/stream', methods=['POST'])
+def handle_chat_stream():
+    """
+    Streaming variant of /chat. Emits Server-Sent Events: session first, then
+    tool_start / tool_end while tools run, token for each answer fragment, and finally
+    done (or error).
+    """
+    payload = request.json or {}
+    user_message = payload.get('message')
+    if not user_message:
+        return jsonify({"response": "No message provided."}), 400
+    knowledge_base = requested_knowledge_base(payload.get('knowledge_base'))
+    if knowledge_base is None:
+        return jsonify({"response": f"Unknown knowledge base '{payload.get('knowledge_base')}'."}), 404
+    session = session_store.get_or_create(payload.get('session_id'))
+
+    def generate():
+        yield sse_event("session", {"session_id": session.session_id, "knowledge_base": knowledge_base})
+        try:
+            with metrics.trace("chat_request", endpoint="chat_stream"), session.lock:
+                # Loads the knowledge base here if it is not in memory yet
+                snapshot = knowledge_registry.get(knowledge_base)
+                for event, data in chat_turn_events(session, user_message, stream=True, snapshot=snapshot):
+                    if event != "final":
+                        yield sse_event(event, data)
+            yield sse_event("done", {})
+        except Exception as e:
+            logger.error(f"An error occurred during streaming chat processing: {e}")
+            traceback.print_exc()
+            yield sse_event("error", {"message": f"An error occurred: {e}"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    start_warmup()
+    app.run(debug=True)
@@ -0,0 +1,347 @@
+# benchmarks/bench_app.py
+"""
+End-to-end benchmark of app3 without network access.
+
+Drives /upload-ontology and /chat through Flask's test client, with the OpenAI chat
+client and the embedding model replaced by the deterministic stand-ins in
+fake_openai.py. The ontology is scaled synthetically (each copy renames the ontology's
+own IRIs and blank nodes), and every scale runs in a fresh subprocess, so memory
+high-water marks are per scale and a scale that crashes or times out is recorded as such
+instead of ending the run.
+
+Reports per-stage ingestion time, p50/p95/p99 chat latency, per-tool execution time,
+LLM call and token counts and peak RSS, and writes them as JSON. Pass --compare with an
+earlier result file to flag regressions.
+
+Usage:
+    python benchmarks/bench_app.py [--scales 1,10,100] [--questions 60] [--output result.json]
+    python benchmarks/bench_app.py --scales 1000 --timeout 3600
+    python benchmarks/bench_app.py --compare benchmarks/results/previous.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ONTOLOGY = os.path.join(ROOT, "uploads", "DigitalVehicleTwinOntology_2024-10-28.ttl")
+DEFAULT_RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# Metrics where a higher value is worse, with the relative change reported as a regression
+REGRESSION_METRICS = ("ingestion_seconds", "chat_ms.p50", "chat_ms.p95", "chat_ms.p99", "peak_rss_mb")
+
+# Questions and the tool calls the stand-in model makes for them. Some are picked up by
+# the question router first, in which case the model answers straight from the results.
+QUESTION_SCRIPT = [
+    ("List the first classes via SPARQL", [
+        ("query_uploaded_rdf_graph", {"sparql_query": "SELECT ?class WHERE { ?class a owl:Class } LIMIT 50"}),
+    ]),
+    ("Which resources have a label mentioning vehicle?", [
+        ("query_uploaded_rdf_graph", {"sparql_query": "SELECT ?s ?label WHERE { ?s rdfs:label ?label . FILTER(CONTAINS(LCASE(STR(?label)), \"vehicle\")) }"}),
+    ]),
+    ("How many triples are there per predicate?", [
+        ("query_uploaded_rdf_graph", {"sparql_query": "SELECT ?p (COUNT(*) AS ?n) WHERE { ?s ?p ?o } GROUP BY ?p ORDER BY DESC(?n)"}),
+    ]),
+    ("What are the subclasses of dvt:Product?", [
+        ("lookup_ontology_schema", {"operation": "subclasses", "term": "dvt:Product"}),
+    ]),
+    ("Which properties can a product have?", [
+        ("lookup_ontology_schema", {"operation": "properties_of_class", "term": "dvt:Product"}),
+    ]),
+    ("Tell me about engines and their components", [
+        ("query_text_with_rag", {"query_text": "engines and their components", "k": 4}),
+    ]),
+    ("Compare the product hierarchy with the text descriptions", [
+        ("lookup_ontology_schema", {"operation": "subclasses", "term": "dvt:Product"}),
+        ("query_text_with_rag", {"query_text": "product hierarchy", "k": 4}),
+        ("query_uploaded_rdf_graph", {"sparql_query": "SELECT ?c ?p WHERE { ?c rdfs:subClassOf ?p } LIMIT 100"}),
+    ]),
+    ("Hello, what can you do?", []),
+]
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of values (fraction in 0..1), or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(round(fraction * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds):
+    milliseconds = [round(value * 1000, 3) for value in seconds]
+    return {
+        "count": len(milliseconds),
+        "mean": round(sum(milliseconds) / len(milliseconds), 3) if milliseconds else None,
+        "p50": percentile(milliseconds, 0.50),
+        "p95": percentile(milliseconds, 0.95),
+        "p99": percentile(milliseconds, 0.99),
+        "max": max(milliseconds) if milliseconds else None,
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def scale_ontology(source_path: str, factor: int, target_path: str):
+    """
+    Writes factor copies of the ontology to target_path (as N-Triples lines, which Turtle
+    parsers accept). Copy k > 0 suffixes every IRI the ontology describes (every subject
+    outside the W3C vocabularies) and every blank node with _k, so the copies are disjoint
+    but share predicates, the RDF/RDFS/OWL/SHACL vocabulary and literals. Returns the
+    number of triples written.
+    """
+    from rdflib import Graph, URIRef, BNode
+
+    graph = Graph()
+    graph.parse(source_path)
+    triples = list(graph)
+    described = {
+        subject for subject, _, _ in triples
+        if isinstance(subject, URIRef) and not str(subject).startswith("http://www.w3.org/")
+    }
+
+    def renamed(term, suffix):
+        if isinstance(term, BNode):
+            return BNode(f"{term}{suffix}")
+        if term in described:
+            return URIRef(f"{term}{suffix}")
+        return term
+
+    count = 0
+    with open(target_path, "w", encoding="utf-8") as f:
+        for copy in range(factor):
+            suffix = f"_{copy}" if copy else ""
+            lines = []
+            for triple in triples:
+                # Predicates stay shared so the schema vocabulary does not multiply
+                s, p, o = (renamed(triple[0], suffix), triple[1], renamed(triple[2], suffix)) if suffix else triple
+                lines.append(f"{s.n3()} {p.n3()} {o.n3()} .\n")
+            f.writelines(lines)
+            count += len(lines)
+    return count
+
+
+def run_scale(args):
+    """
+    Benchmarks one scale in this process and returns the result dict. Must run in a fresh
+    process: app3 is configured through environment variables read at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"bench-x{args.scale}-")
+    os.environ.update({
+        "OPENAI_API_KEY": "offline-benchmark",
+        "CHROMA_PERSIST_DIR": os.path.join(workdir, "chroma"),
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answer_cache.sqlite3"),
+        "KNOWLEDGE_REGISTRY_PATH": os.path.join(workdir, "knowledge_bases.json"),
+        "ONTOLOGY_SNAPSHOT_DIR": os.path.join(workdir, "ontology_cache"),
+    })
+    if args.backend:
+        os.environ["RDF_GRAPH_BACKEND"] = args.backend
+    os.chdir(workdir)
+    result = {"scale": args.scale, "status": "failed"}
+    try:
+        start = time.perf_counter()
+        ontology_path = os.path.join(workdir, f"ontology_x{args.scale}.ttl")
+        result["triples"] = scale_ontology(args.ontology, args.scale, ontology_path)
+        result["generate_seconds"] = round(time.perf_counter() - start, 3)
+        result["ontology_bytes"] = os.path.getsize(ontology_path)
+
+        start = time.perf_counter()
+        import logging
+        logging.disable(logging.INFO)
+        import app3
+        import connector_loader
+        from benchmarks.fake_openai import ScriptedOpenAI, FakeEmbeddings
+        result["import_seconds"] = round(time.perf_counter() - start, 3)
+
+        embeddings = FakeEmbeddings(size=args.embedding_size, latency_seconds=args.embedding_latency_ms / 1000)
+        connector_loader.OpenAIEmbeddings = lambda **kwargs: embeddings
+        llm = ScriptedOpenAI(QUESTION_SCRIPT, latency_seconds=args.llm_latency_ms / 1000)
+        app3.client = llm
+        client = app3.app.test_client()
+
+        # Ingestion
+        start = time.perf_counter()
+        with open(ontology_path, "rb") as f:
+            upload = client.post("/upload-ontology", data={"file": (f, os.path.basename(ontology_path))})
+        if upload.status_code != 202:
+            raise RuntimeError(f"Upload rejected: {upload.status_code} {upload.get_json()}")
+        while True:
+            job = client.get(upload.get_json()["status_url"]).get_json()
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.05)
+        result["ingestion_seconds"] = round(time.perf_counter() - start, 3)
+        result["ingestion_stages_ms"] = {stage: entry.get("duration_ms") for stage, entry in job["stages"].items()}
+        result["ingestion_result"] = job["result"]
+        if job["status"] != "succeeded":
+            raise RuntimeError(f"Ingestion {job['status']}: {job['error']}")
+        result["peak_rss_mb_after_ingestion"] = peak_rss_mb()
+
+        # Chat: every question is unique, so the semantic answer cache never short-circuits
+        questions = [
+            f"{QUESTION_SCRIPT[index % len(QUESTION_SCRIPT)][0]} (request {index})" for index in range(args.questions)
+        ]
+
+        def ask(question):
+            started = time.perf_counter()
+            response = app3.app.test_client().post("/chat", json={"message": question})
+            if response.status_code != 200:
+                raise RuntimeError(f"Chat failed: {response.status_code} {response.get_json()}")
+            return time.perf_counter() - started
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(ask, questions))
+        chat_seconds = time.perf_counter() - start
+        result["chat_ms"] = latency_summary(latencies)
+        result["chat_throughput_rps"] = round(len(latencies) / chat_seconds, 2) if chat_seconds else None
+        result["tools"] = app3.tool_executor.stats()
+        result["llm"] = llm.stats()
+        result["embeddings"] = {"calls": embeddings.calls, "texts": embeddings.texts}
+        result["knowledge_bases"] = app3.knowledge_registry.stats()["bases"]
+        result["peak_rss_mb"] = peak_rss_mb()
+        result["status"] = "ok"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _metric(result, dotted):
+    value = result
+    for key in dotted.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(current, baseline, tolerance):
+    """
+    Returns regressions of current against baseline: metrics that grew by more than
+    tolerance (a fraction) at a scale both runs completed.
+    """
+    regressions = []
+    baseline_scales = {entry["scale"]: entry for entry in baseline.get("scales", []) if entry.get("status") == "ok"}
+    for entry in current["scales"]:
+        before = baseline_scales.get(entry["scale"])
+        if before is None or entry.get("status") != "ok":
+            continue
+        for metric in REGRESSION_METRICS:
+            old, new = _metric(before, metric), _metric(entry, metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append({"scale": entry["scale"], "metric": metric, "baseline": old, "current": new,
+                                    "change": round(new / old - 1, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ontology", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--scales", default="1,10", help="Comma-separated copy counts, e.g. 1,10,100,1000")
+    parser.add_argument("--questions", type=int, default=40, help="Chat requests per scale")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent chat requests")
+    parser.add_argument("--backend", choices=("memory", "mmap"), help="RDF_GRAPH_BACKEND for the run")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency per chat completion")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0, help="Simulated latency per embedding call")
+    parser.add_argument("--embedding-size", type=int, default=1536)
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds allowed per scale")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/bench_app-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--keep", action="store_true", help="Keep each scale's working directory")
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)  # set for the per-scale subprocess
+    args = parser.parse_args()
+
+    if args.scale is not None:
+        print(json.dumps(run_scale(args)))
+        return
+
+    results = {
+        "benchmark": "bench_app",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("scale", "output", "compare", "keep")},
+        "scales": [],
+    }
+    for scale in [int(value) for value in args.scales.split(",") if value.strip()]:
+        command = [
+            sys.executable, os.path.abspath(__file__), "--scale", str(scale),
+            "--ontology", args.ontology, "--questions", str(args.questions), "--concurrency", str(args.concurrency),
+            "--llm-latency-ms", str(args.llm_latency_ms), "--embedding-latency-ms", str(args.embedding_latency_ms),
+            "--embedding-size", str(args.embedding_size),
+        ] + (["--backend", args.backend] if args.backend else []) + (["--keep"] if args.keep else [])
+        print(f"Scale x{scale}...", file=sys.stderr, flush=True)
+        try:
+            completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=args.timeout)
+            lines = completed.stdout.strip().splitlines()
+            if completed.returncode == 0 and lines:
+                entry = json.loads(lines[-1])
+            else:
+                entry = {"scale": scale, "status": "crashed", "returncode": completed.returncode,
+                         "error": completed.stderr.strip()[-2000:]}
+        except subprocess.TimeoutExpired:
+            entry = {"scale": scale, "status": "timeout", "timeout_seconds": args.timeout}
+        results["scales"].append(entry)
+        chat = entry.get("chat_ms") or {}
+        print(
+            f"  {entry['status']}: {entry.get('triples', '?')} triples, ingestion {entry.get('ingestion_seconds')}s "
+            f"{entry.get('ingestion_stages_ms')}, chat p50/p95/p99 {chat.get('p50')}/{chat.get('p95')}/{chat.get('p99')} ms, "
+            f"peak RSS {entry.get('peak_rss_mb')} MB",
+            file=sys.stderr, flush=True
+        )
+        if entry["status"] != "ok":
+            # Larger scales would fail the same way
+            break
+
+    if args.compare:
+        with open(args.compare) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        for regression in results["regressions"]:
+            print(f"REGRESSION x{regression['scale']} {regression['metric']}: {regression['baseline']} -> "
+                  f"{regression['current']} ({regression['change']:+.0%})", file=sys.stderr)
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_app-{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"Results written to {output}", file=sys.stderr)
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
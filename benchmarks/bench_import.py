@@ -0,0 +1,97 @@
+# benchmarks/bench_import.py
+"""
+Import-time benchmark for app3 based on python -X importtime.
+
+Imports the module in fresh interpreters, reports the median total import time and the
+slowest imports by cumulative time, and optionally writes the result as JSON or fails
+when the import takes longer than a budget.
+
+Usage:
+    python benchmarks/bench_import.py [--module app3] [--repeat 5] [--top 15]
+    python benchmarks/bench_import.py --max-ms 1000 --output import.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str):
+    """
+    Returns [(module, self_us, cumulative_us, depth)] from -X importtime output.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def measure(module: str):
+    """
+    Imports module once in a fresh interpreter. Returns the parsed importtime entries.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=ROOT,
+            OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "import-benchmark"),
+            ANSWER_CACHE_PATH=os.path.join(workdir, "answer_cache.sqlite3"),
+            KNOWLEDGE_REGISTRY_PATH=os.path.join(workdir, "knowledge_bases.json"),
+        )
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        )
+    return parse_importtime(completed.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app3")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--output", help="Write the result as JSON")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    totals = [next((cum for name, _, cum, _ in entries if name == args.module), 0) / 1000 for entries in runs]
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    slowest = sorted(
+        ((name, cum / 1000, self_us / 1000) for name, self_us, cum, depth in median_run if name != args.module),
+        key=lambda entry: entry[1], reverse=True
+    )[:args.top]
+
+    result = {
+        "module": args.module,
+        "repeat": args.repeat,
+        "median_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "max_ms": round(max(totals), 1),
+        "slowest": [{"module": name, "cumulative_ms": round(cum, 1), "self_ms": round(own, 1)} for name, cum, own in slowest],
+    }
+    print(f"import {args.module}: median {result['median_ms']} ms (min {result['min_ms']}, max {result['max_ms']}) over {args.repeat} runs\n")
+    print(f"{'module':<50}{'cumulative ms':>15}{'self ms':>10}")
+    for entry in result["slowest"]:
+        print(f"{entry['module']:<50}{entry['cumulative_ms']:>15.1f}{entry['self_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.max_ms is not None and result["median_ms"] > args.max_ms:
+        print(f"\nImport time {result['median_ms']} ms exceeds the {args.max_ms:g} ms budget.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_prepared_queries.py
+"""
+Micro-benchmark: parse+evaluate vs. prepared evaluate for the QUERY_TEMPLATES.
+
+Usage:
+    python benchmarks/bench_prepared_queries.py [ontology_file] [--repeat N]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rdflib import Graph, URIRef  # noqa: E402
+from rdflib.namespace import RDF, RDFS, OWL, SH  # noqa: E402
+from rdflib.plugins.sparql import prepareQuery  # noqa: E402
+
+from prepared_queries import QUERY_TEMPLATES  # noqa: E402
+
+DEFAULT_ONTOLOGY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "uploads", "DigitalVehicleTwinOntology_2024-10-28.ttl",
+)
+DVT = "https://graph.bmwgroup.net/Ontology/DigitalVehicleTwinOntology-1.0/"
+INIT_NS = {"dvt": URIRef(DVT), "rdf": RDF, "rdfs": RDFS, "owl": OWL, "sh": SH}
+SAMPLE_BINDINGS = {
+    "class": URIRef(DVT + "Product"),
+    "property": URIRef(DVT + "confirms"),
+}
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("ontology", nargs="?", default=DEFAULT_ONTOLOGY)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    graph = Graph()
+    graph.parse(args.ontology)
+    print(f"{args.ontology}: {len(graph)} triples, median of {args.repeat} runs\n")
+    print(f"{'template':<24}{'parse+eval ms':>15}{'prepared ms':>14}{'speedup':>10}")
+
+    for name, template in QUERY_TEMPLATES.items():
+        bindings = {var: SAMPLE_BINDINGS[var] for var in template["bindings"]}
+        text = template["query"]
+        prepared = prepareQuery(text, initNs=INIT_NS)
+
+        raw = _time(lambda: list(graph.query(text, initNs=INIT_NS, initBindings=bindings)), args.repeat)
+        fast = _time(lambda: list(graph.query(prepared, initBindings=bindings)), args.repeat)
+        print(f"{name:<24}{raw * 1000:>15.3f}{fast * 1000:>14.3f}{raw / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/fake_openai.py
+"""
+Offline stand-ins for the OpenAI chat and embedding clients used by the benchmarks.
+
+ScriptedOpenAI answers chat completions from a fixed script instead of calling the API:
+the first round of a question returns the tool calls scripted for it, every later round
+returns a short final answer. FakeEmbeddings returns a unit vector seeded from a hash of
+the text. Both are deterministic, and both can add a fixed latency per call to model
+the network round trip.
+"""
+
+import json
+import time
+import hashlib
+import itertools
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def _estimate_tokens(value) -> int:
+    # Roughly four characters per token, which is close enough for relative comparisons
+    return max(1, len(json.dumps(value, default=str)) // 4)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embeddings: the same text always maps to the same unit vector.
+    """
+
+    def __init__(self, size: int = 1536, latency_seconds: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _call(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def embed_documents(self, texts):
+        return self._call(list(texts))
+
+    def embed_query(self, text):
+        return self._call([text])[0]
+
+
+class ScriptedCompletions:
+    """
+    chat.completions stand-in. script is a list of (question substring, tool calls) pairs,
+    where tool calls are (tool name, arguments dict) pairs; the first entry whose substring
+    occurs in the user question decides the tool calls of its first round.
+    """
+
+    def __init__(self, script, latency_seconds: float = 0.0):
+        self.script = list(script)
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _tool_calls_for(self, messages, tools):
+        # Only a question the model has not seen tool results for gets tool calls
+        if not tools or messages[-1]["role"] != "user":
+            return []
+        question = messages[-1]["content"]
+        for substring, calls in self.script:
+            if substring in question:
+                return [
+                    {"id": f"call_{next(self._ids)}", "name": name, "arguments": json.dumps(args)}
+                    for name, args in calls
+                ]
+        return []
+
+    def _answer_for(self, messages):
+        tool_chars = sum(len(message.get("content") or "") for message in messages if message.get("role") == "tool")
+        return f"Answer based on {tool_chars} characters of tool results."
+
+    def create(self, stream=False, **kwargs):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        messages = kwargs["messages"]
+        tool_calls = self._tool_calls_for(messages, kwargs.get("tools"))
+        content = None if tool_calls else self._answer_for(messages)
+        prompt_tokens = _estimate_tokens(messages) + (_estimate_tokens(kwargs["tools"]) if kwargs.get("tools") else 0)
+        completion_tokens = _estimate_tokens(content or tool_calls)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+        if stream:
+            return self._stream(content, tool_calls)
+        message = SimpleNamespace(
+            content=content,
+            tool_calls=[
+                SimpleNamespace(id=call["id"], type="function",
+                                function=SimpleNamespace(name=call["name"], arguments=call["arguments"]))
+                for call in tool_calls
+            ] or None
+        )
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    @staticmethod
+    def _stream(content, tool_calls):
+        for index, call in enumerate(tool_calls):
+            delta = SimpleNamespace(content=None, tool_calls=[SimpleNamespace(
+                index=index, id=call["id"],
+                function=SimpleNamespace(name=call["name"], arguments=call["arguments"])
+            )])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+        for word in (content or "").split(" "):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " ", tool_calls=None))])
+
+
+class ScriptedOpenAI:
+    """
+    Drop-in replacement for openai.OpenAI as used by app3 (client.chat.completions.create).
+    """
+
+    def __init__(self, script, latency_seconds: float = 0.0):
+        self.chat = SimpleNamespace(completions=ScriptedCompletions(script, latency_seconds))
+
+    def stats(self):
+        completions = self.chat.completions
+        return {
+            "calls": completions.calls,
+            "prompt_tokens": completions.prompt_tokens,
+            "completion_tokens": completions.completion_tokens,
+        }
@@ -0,0 +1,130 @@
+# chat_session.py
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_HISTORY_MESSAGES = int(os.getenv("SESSION_MAX_HISTORY_MESSAGES", "40"))
+SESSION_MAX_TOOL_RESULTS = int(os.getenv("SESSION_MAX_TOOL_RESULTS", "64"))
+
+# Tools whose results depend on server-side state other than their arguments.
+NON_REUSABLE_TOOLS = {"fetch_more_tool_results"}
+
+
+def tool_result_key(tool_name: str, tool_args: str):
+    """
+    Returns a canonical key for a tool call, so argument order and whitespace don't matter.
+    """
+    try:
+        canonical_args = json.dumps(json.loads(tool_args or "{}"), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        canonical_args = tool_args
+    return tool_name, canonical_args
+
+
+class ChatSession:
+    """
+    Server-side conversation state: message history (without the system prompt) and
+    the tool results already fetched in this session.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.history = []
+        self.tool_results = OrderedDict()
+        self.knowledge_version = None
+        self.last_used = time.monotonic()
+        # Serialises turns of the same session; different sessions run in parallel
+        self.lock = threading.Lock()
+
+    def sync_knowledge(self, knowledge_version):
+        """
+        Drops reusable tool results if the loaded knowledge changed since they were fetched.
+        """
+        if knowledge_version != self.knowledge_version:
+            if self.tool_results:
+                logger.info(f"Session {self.session_id}: knowledge changed, dropping {len(self.tool_results)} cached tool results.")
+            self.tool_results.clear()
+            self.knowledge_version = knowledge_version
+
+    def append(self, message: dict):
+        self.history.append(message)
+
+    def trim_history(self, max_messages: int = None):
+        """
+        Keeps at most max_messages of history, cutting only at user-message boundaries so
+        an assistant tool_calls message is never separated from its tool results.
+        """
+        max_messages = max_messages or SESSION_MAX_HISTORY_MESSAGES
+        if len(self.history) <= max_messages:
+            return
+        cut = len(self.history) - max_messages
+        while cut < len(self.history) and self.history[cut].get("role") != "user":
+            cut += 1
+        if cut < len(self.history):
+            del self.history[:cut]
+
+    def get_tool_result(self, tool_name: str, tool_args: str):
+        if tool_name in NON_REUSABLE_TOOLS:
+            return None
+        key = tool_result_key(tool_name, tool_args)
+        content = self.tool_results.get(key)
+        if content is not None:
+            self.tool_results.move_to_end(key)
+        return content
+
+    def store_tool_result(self, tool_name: str, tool_args: str, content: str):
+        # Errors and paged results are not reused: the former may be transient and the
+        # latter refer to a continuation that is consumed on first use
+        if tool_name in NON_REUSABLE_TOOLS or content.startswith("Error") or '"continuation_id"' in content:
+            return
+        self.tool_results[tool_result_key(tool_name, tool_args)] = content
+        while len(self.tool_results) > SESSION_MAX_TOOL_RESULTS:
+            self.tool_results.popitem(last=False)
+
+
+class SessionStore:
+    """
+    Bounded LRU of chat sessions with idle expiry.
+    """
+
+    def __init__(self, max_sessions: int = None, ttl_seconds: float = None):
+        self.max_sessions = max_sessions or SESSION_MAX_COUNT
+        self.ttl_seconds = SESSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id: str = None) -> ChatSession:
+        """
+        Returns the live session for session_id, or a new session (with a fresh ID if none
+        was given or the old one expired).
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and now - session.last_used > self.ttl_seconds:
+                del self._sessions[session_id]
+                session = None
+            if session is None:
+                session = ChatSession(session_id or uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            session.last_used = now
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
@@ -2,19 +2,54 @@
 
 import os
 import json
+import time
+import hashlib
+import itertools
 import traceback
 import logging
-from abc import ABC, abstractmethod
-from openai import OpenAI
-from langchain_openai import OpenAIEmbeddings
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from rdflib import Graph, Literal, URIRef, BNode
 from rdflib.namespace import RDF, RDFS, OWL, SH
 
-from pymongo import MongoClient
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+from ontology_cache import get_snapshot_cache
+from ontology_chunker import iter_subject_documents
+from query_cache import QueryResultCache, normalize_query
+from prepared_queries import PreparedQueryRegistry, QUERY_TEMPLATES
+from ontology_index import SchemaIndex
+from namespace_compactor import NamespaceCompactor
+from tool_results import CONTINUATION_TOOL
+from metrics import metrics
+from connectors.base import BaseConnector
+from sparql_guard import QueryGuard, QueryRejected, guard_hint
+from lexical_index import LexicalIndex, is_identifier_query, reciprocal_rank_fusion, query_embedding_cache
+
+# Persistent Chroma location and embedding batch size for RAG ingestion
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "chroma_db")
+CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "ontology_chunks")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "128"))
+# Fuse BM25 results with vector results in query_text (0 = vector search only)
+RAG_HYBRID = os.getenv("RAG_HYBRID", "1") == "1"
+# Candidates taken from each retriever before reciprocal-rank fusion
+RAG_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "20"))
+# "memory" parses into an rdflib in-memory graph per process; "mmap" serves a read-only,
+# memory-mapped triple store that all worker processes share
+RDF_GRAPH_BACKEND = os.getenv("RDF_GRAPH_BACKEND", "memory").lower()
+
+# The embedding client class. langchain_openai (and with it the OpenAI SDK) is only
+# imported when the first RAG handler needs it; tests can assign a stand-in here.
+OpenAIEmbeddings = None
+
+
+def create_embeddings_model():
+    """
+    Returns a new embedding model client, importing its class on first use.
+    """
+    global OpenAIEmbeddings
+    if OpenAIEmbeddings is None:
+        from langchain_openai import OpenAIEmbeddings as embeddings_class
+        OpenAIEmbeddings = embeddings_class
+    return OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
 
 # Set up logging for connector_loader
 logger = logging.getLogger(__name__)
@@ -33,35 +68,49 @@ except Exception as e:
 # --- End Debugging ---
 
 
-class BaseConnector(ABC):
-    """Abstract base class for all database connectors."""
-    @abstractmethod
-    def connect(self, config):
-        pass
-
-    @abstractmethod
-    def execute_query(self, query):
-        pass
-
-
 class RDFConnector(BaseConnector):
-    def __init__(self, config=None):
+    def __init__(self, config=None, snapshot_cache=None, backend: str = None, file_path: str = None):
         self.graph = Graph()
+        self.file_path = file_path # Ontology loaded by connect() when it is given no path
+        self.backend = backend or RDF_GRAPH_BACKEND
         self.config = config
         self.initNs = {} # NEW: Initialize dictionary to store initial namespaces
+        self.snapshot_cache = snapshot_cache or get_snapshot_cache()
+        self.content_hash = None # SHA-256 of the loaded ontology file
+        self.graph_version = 0 # Bumped on every connect(); part of the query cache key
+        self.query_cache = QueryResultCache()
+        self.prepared_queries = PreparedQueryRegistry()
+        self.schema_index = SchemaIndex()
+        self.compactor = NamespaceCompactor()
+        self.query_guard = QueryGuard()
 
-    def connect(self, file_path=None):
+    def connect(self, file_path=None, build_index: bool = True):
         """
-        Connects to the RDF graph by loading the ontology file.
+        Connects to the RDF graph by loading the ontology file (file_path, or the path
+        given to the constructor or a previous connect()).
+        With build_index=False the schema index is left to build_schema_index(), so it
+        can be built alongside other ingestion work.
         Returns True on success, False on failure.
         """
+        file_path = file_path or self.file_path
+        self.file_path = file_path
         # Clear existing graph and namespaces before loading a new one
         self.graph = Graph()
         self.initNs = {}
+        self.content_hash = None
+        # Results computed against the previous graph are no longer valid
+        self.graph_version += 1
+        self.query_cache.clear()
+        self.prepared_queries.clear() # Prepared algebra embeds the old prefix bindings
+        self.query_guard = QueryGuard()
 
         if file_path and os.path.exists(file_path):
             try:
-                self.graph.parse(file_path)
+                # Restores a content-hash keyed snapshot when available instead of re-parsing
+                if self.read_only:
+                    self.graph, self.content_hash = self.snapshot_cache.load_mapped_graph(file_path)
+                else:
+                    self.graph, self.content_hash = self.snapshot_cache.load_graph(file_path)
                 logger.info(f"RDF graph loaded from {file_path}")
 
                 # NEW: Populate initNs with common prefixes and bind them to the graph
@@ -79,70 +128,483 @@ class RDFConnector(BaseConnector):
                 for prefix, uri in self.initNs.items():
                     self.graph.bind(prefix, uri)
 
+                # initNs prefixes take precedence; prefixes declared in the file compact too
+                self.compactor = NamespaceCompactor(list(self.initNs.items()) + list(self.graph.namespaces()))
+                self.query_guard = QueryGuard(self.graph, compact=self.compact_term)
+
+                # Precompute schema lookups (hierarchy, domain/range, labels, shapes) once per graph
+                self.schema_index = SchemaIndex(self.graph) if build_index else SchemaIndex()
+
             except Exception as e:
                 logger.error(f"Error loading RDF graph from {file_path}: {e}")
                 traceback.print_exc()
                 self.graph = None # Ensure graph is None on failure
+                self.schema_index = SchemaIndex()
                 return False
         else:
             logger.warning("WARNING: Ontology file path not provided or file does not exist.")
             self.graph = None # No graph loaded
+            self.schema_index = SchemaIndex()
             return False
         return True
 
-    def execute_query(self, query):
+    def close(self):
+        """
+        Releases the graph, its caches and, with the mmap backend, the file mapping.
+        """
+        graph = self.graph
+        self.graph = None
+        self.graph_version += 1
+        self.query_cache.clear()
+        self.prepared_queries.clear()
+        self.schema_index = SchemaIndex()
+        self.query_guard = QueryGuard()
+        if graph is not None and self.read_only:
+            graph.store.close()
+
+    @property
+    def read_only(self) -> bool:
+        """
+        True when the graph is served from the shared memory-mapped triple store.
+        """
+        return self.backend == "mmap"
+
+    def build_schema_index(self):
+        """
+        Builds the schema index for the loaded graph. Returns the index.
+        """
+        self.schema_index = SchemaIndex(self.graph) if self.graph is not None else SchemaIndex()
+        return self.schema_index
+
+    def add_triples(self, triples):
         """
-        Executes a SPARQL query on the loaded RDF graph.
-        Returns query results.
+        Adds triples to the loaded graph and incrementally updates the schema index.
+        Not available with the read-only mmap backend.
         """
+        if self.read_only:
+            raise TypeError("The mmap graph backend is read-only; re-upload the ontology to change it.")
+        triples = [t for t in triples if t not in self.graph]
+        for triple in triples:
+            self.graph.add(triple)
+        self._graph_changed(added=triples)
+
+    def remove_triples(self, triples):
+        """
+        Removes triples from the loaded graph and incrementally updates the schema index.
+        Not available with the read-only mmap backend.
+        """
+        if self.read_only:
+            raise TypeError("The mmap graph backend is read-only; re-upload the ontology to change it.")
+        triples = [t for t in triples if t in self.graph]
+        for triple in triples:
+            self.graph.remove(triple)
+        self._graph_changed(removed=triples)
+
+    def _graph_changed(self, added=(), removed=()):
+        self.graph_version += 1
+        self.query_cache.clear()
+        self.query_guard.invalidate()
+        self.schema_index.apply_changes(added=added, removed=removed)
+
+    def execute_query(self, query, limit: int = None, columnar: bool = False):
+        """
+        Executes a SPARQL query on the loaded RDF graph under the query guard.
+        Returns a lazy iterator over up to limit row dicts, evaluated as they are
+        consumed, or with columnar=True {"variables": [...], "rows": [[...], ...]}.
+        Unlike iter_query(), no query_guard rows are returned: a rejected or invalid
+        query returns no rows, and a query stopped by the guard the rows produced so far.
+        """
+        if not columnar:
+            return itertools.islice(self.iter_query(query, guard_rows=False), limit)
         if not self.graph:
             logger.error("ERROR: RDF graph is not loaded. Cannot execute query.")
-            return []
+            return {"variables": [], "rows": []}
         try:
-            # NEW: Pass initNs to the query method
-            results = self.graph.query(query, initNs=self.initNs)
-            
-            # Format results for readability
-            formatted_results = []
-            for row in results:
-                row_dict = {}
-                for var, value in row.asdict().items():
-                    # Check if value is a URIRef and shorten it if possible
-                    if isinstance(value, URIRef):
-                        # Attempt to shorten URIRefs using bound namespaces
-                        shortened = False
-                        for prefix, uri in self.initNs.items():
-                            if str(value).startswith(str(uri)):
-                                value = f"{prefix}:{str(value)[len(str(uri)):]}"
-                                shortened = True
-                                break
-                        if not shortened:
-                            value = str(value) # Fallback to full URI if not shortened
-                    else:
-                        value = str(value) # Convert Literals/BNode to string
-                    row_dict[str(var)] = value
-                formatted_results.append(row_dict)
-            
-            logger.info(f"SPARQL query executed. Results: {formatted_results}")
-            return formatted_results
+            # Own key namespace: iter_query() caches rows in another shape, with its guard hint
+            cache_key = (self.graph_version, "columnar", normalize_query(query, self.initNs))
+            cached = self.query_cache.get(cache_key)
+            if cached is None:
+                # Reuses the parsed algebra when the same query text was seen before
+                with metrics.span("sparql_parse"):
+                    prepared = self.prepared_queries.get(query, self.initNs)
+                    plan = self.query_guard.plan(prepared)
+                evaluation = self.query_guard.evaluate(plan)
+                with metrics.span("sparql_format"):
+                    # Rows are evaluated lazily as they are pulled, so this also covers the evaluation
+                    cached = self._format_results(evaluation, columnar=True)
+
+                if evaluation.stopped is not None:
+                    logger.warning(f"SPARQL query stopped by the guard after {len(cached['rows'])} rows: {evaluation.stopped['reason']}")
+                else:
+                    logger.info(f"SPARQL query executed. {len(cached['rows'])} rows.")
+                    self.query_cache.put(cache_key, cached)
+            else:
+                logger.info("SPARQL query served from cache.")
+            results = self._copy_results(cached)
+            results["rows"] = results["rows"][:limit]
+            return results
+        except QueryRejected as e:
+            logger.warning(f"SPARQL query rejected by the guard: {e}")
         except Exception as e:
             logger.error(f"ERROR in RDFConnector execute_query: {e}")
             traceback.print_exc()
+        return {"variables": [], "rows": []}
+
+    def iter_query(self, query, guard_rows: bool = True):
+        """
+        Executes a SPARQL query and yields formatted row dicts one at a time, so callers
+        can stop early without formatting the whole result. Fully consumed results are
+        added to the query cache.
+
+        Evaluation runs under the query guard. When the guard rejects the query, stops it
+        (timeout, row or memory budget) or caps it with an added LIMIT, the last row is
+        {"query_guard": hint}, telling the model why and how to rewrite the query.
+        Invalid queries and evaluation errors end the rows with {"error": message}. With
+        guard_rows=False these rows are only logged.
+        """
+        if not self.graph:
+            logger.error("ERROR: RDF graph is not loaded. Cannot execute query.")
+            return
+        try:
+            # Rows and the guard hint are cached apart, so the hint is never taken for a data row
+            cache_key = (self.graph_version, "rows", normalize_query(query, self.initNs))
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                logger.info("SPARQL query served from cache.")
+                yield from cached["rows"]
+                if cached["query_guard"] is not None and guard_rows:
+                    yield cached["query_guard"]
+                return
+
+            with metrics.span("sparql_parse"):
+                prepared = self.prepared_queries.get(query, self.initNs)
+                plan = self.query_guard.plan(prepared)
+            started = time.perf_counter()
+            results = self.query_guard.evaluate(plan)
+        except QueryRejected as e:
+            logger.warning(f"SPARQL query rejected by the guard: {e}")
+            if guard_rows:
+                yield {"query_guard": e.hint}
+            return
+        except Exception as e:
+            # Invalid SPARQL (syntax error, undeclared prefix): tell the model rather than
+            # returning an empty result it would read as "no matches"
+            logger.error(f"ERROR in RDFConnector iter_query: {e}")
+            traceback.print_exc()
+            if guard_rows:
+                metrics.increment("sparql_guard", outcome="invalid_query")
+                yield {
+                    "error": f"Invalid SPARQL query: {e}",
+                    "query_guard": guard_hint(
+                        "invalid_query",
+                        "The query could not be parsed. Fix the syntax, and declare every prefix it "
+                        "uses or use the prefixes from the system prompt.",
+                    ),
+                }
+            return
+
+        variables = plan.variables
+        compact = self._value_formatter(plan)
+        consumed = []
+        # Rows are evaluated lazily as they are pulled, so evaluation and formatting are
+        # timed separately per row; time spent by the consumer is excluded
+        evaluate_seconds = time.perf_counter() - started
+        format_seconds = 0.0
+        rows = iter(results)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    row = next(rows, None)
+                except Exception as e:
+                    logger.error(f"ERROR in RDFConnector iter_query evaluation: {e}")
+                    traceback.print_exc()
+                    if guard_rows:
+                        yield {"error": f"SPARQL evaluation failed: {e}"}
+                    return
+                formatted = time.perf_counter()
+                evaluate_seconds += formatted - started
+                if row is None:
+                    break
+                row_dict = {var: compact(value) for var, value in zip(variables, row) if value is not None}
+                format_seconds += time.perf_counter() - formatted
+                consumed.append(row_dict)
+                yield row_dict
+        finally:
+            rows.close()
+            metrics.observe("sparql_evaluate", evaluate_seconds)
+            metrics.observe("sparql_format", format_seconds)
+        if results.stopped is not None:
+            # A partial result is not cached, so a rewritten or retried query runs again
+            if guard_rows:
+                yield {"query_guard": results.stopped}
+            return
+        hint = self.query_guard.limit_hint(plan, len(consumed))
+        guard_row = {"query_guard": hint} if hint is not None else None
+        if guard_row is not None and guard_rows:
+            yield guard_row
+        logger.info(f"SPARQL query executed. {len(consumed)} rows.")
+        self.query_cache.put(cache_key, {"rows": consumed, "query_guard": guard_row})
+
+    def resolve_term(self, value):
+        """
+        Converts a CURIE (dvt:Vehicle), <IRI> or plain IRI string into a URIRef.
+        """
+        if isinstance(value, URIRef):
+            return value
+        value = str(value).strip()
+        if value.startswith("<") and value.endswith(">"):
+            return URIRef(value[1:-1])
+        prefix, sep, local = value.partition(":")
+        if sep and not local.startswith("//"):
+            if prefix in self.initNs:
+                return URIRef(f"{self.initNs[prefix]}{local}")
+            namespace = self.graph.namespace_manager.store.namespace(prefix) if self.graph is not None else None
+            if namespace is not None:
+                return URIRef(f"{namespace}{local}")
+        return URIRef(value)
+
+    def execute_template(self, name: str, **bindings):
+        """
+        Executes one of the prepared QUERY_TEMPLATES with the given variable bindings
+        (e.g. execute_template("subclasses", **{"class": "dvt:Product"})), through the
+        query result cache. Returns a list of row dicts.
+        """
+        if not self.graph:
+            logger.error("ERROR: RDF graph is not loaded. Cannot execute query.")
+            return []
+        template = QUERY_TEMPLATES.get(name)
+        if template is None:
+            logger.error(f"ERROR: Unknown query template '{name}'.")
+            return []
+        missing = [var for var in template["bindings"] if not bindings.get(var)]
+        if missing:
+            logger.error(f"ERROR: Query template '{name}' requires bindings for {missing}.")
+            return []
+        try:
+            init_bindings = {var: self.resolve_term(bindings[var]) for var in template["bindings"]}
+            cache_key = (self.graph_version, "template", name, tuple(sorted(init_bindings.items())))
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                return self._copy_results(cached)
+
+            prepared = self.prepared_queries.template(name, self.initNs)
+            formatted_results = self._format_results(self.graph.query(prepared, initBindings=init_bindings))
+            logger.info(f"Query template '{name}' executed.")
+            self.query_cache.put(cache_key, formatted_results)
+            return self._copy_results(formatted_results)
+        except Exception as e:
+            logger.error(f"ERROR in RDFConnector execute_template: {e}")
+            traceback.print_exc()
             return []
 
+    def _format_results(self, results, columnar: bool = False):
+        """
+        Formats query results as strings, shortening URIs with the known prefixes.
+        Returns a list of row dicts (unbound variables omitted), or with columnar=True
+        {"variables": [...], "rows": [[...], ...]} with None for unbound values.
+        """
+        variables = [str(var) for var in (results.vars or [])]
+        plan = getattr(results, "plan", None)
+        compact = self._value_formatter(plan) if plan is not None else self.compact_term
+        if columnar:
+            return {
+                "variables": variables,
+                "rows": [[None if value is None else compact(value) for value in row] for row in results],
+            }
+        return [
+            {var: compact(value) for var, value in zip(variables, row) if value is not None}
+            for row in results
+        ]
+
+    def _value_formatter(self, plan):
+        """
+        Returns the function formatting result values of a planned query: ASK answers
+        stay booleans, other values are compacted strings.
+        """
+        return bool if plan.form == "ASK" else self.compact_term
+
+    @staticmethod
+    def _copy_results(results):
+        # Shallow copy so callers cannot mutate cached results in place
+        if isinstance(results, dict):
+            return {"variables": list(results["variables"]), "rows": list(results["rows"])}
+        return list(results)
+
+    def compact_term(self, value) -> str:
+        """
+        Returns value as a string, shortening URIRefs to prefix:local form.
+        """
+        return self.compactor.compact(value)
+
+    def schema_lookup(self, operation: str, term: str = None, transitive: bool = False):
+        """
+        Answers schema questions from the precomputed SchemaIndex instead of running SPARQL.
+        While no index is built, the lookups covered by QUERY_TEMPLATES run as prepared
+        queries instead. Returns a JSON-serialisable dict, or an error string.
+        """
+        index = self.schema_index
+        if not self.graph:
+            return "Error: RDF graph is not loaded."
+        if operation != "list_classes" and not term:
+            return f"Error: operation '{operation}' requires a term."
+        if index.graph is None:
+            return self._template_schema_lookup(operation, term, transitive)
+
+        def compact(values):
+            return sorted(self.compact_term(v) for v in values)
+
+        if operation == "list_classes":
+            return {"classes": compact(index.classes)}
+        if operation == "find_by_label":
+            return {"label": term, "matches": compact(index.find_by_label(term))}
+
+        uri = self.resolve_term(term)
+        if operation == "subclasses":
+            return {"class": self.compact_term(uri), "subclasses": compact(index.get_subclasses(uri, transitive))}
+        if operation == "superclasses":
+            return {"class": self.compact_term(uri), "superclasses": compact(index.get_superclasses(uri, transitive))}
+        if operation == "properties_of_class":
+            properties = index.properties_of(uri, inherited=transitive)
+            return {
+                "class": self.compact_term(uri),
+                "properties": {self.compact_term(p): compact(r) for p, r in sorted(properties.items())},
+            }
+        if operation == "domain_range":
+            domain_range = index.domain_range(uri)
+            return {
+                "property": self.compact_term(uri),
+                "domain": compact(domain_range["domain"]),
+                "range": compact(domain_range["range"]),
+            }
+        if operation == "labels":
+            return {"uri": self.compact_term(uri), "labels": sorted(index.labels_of(uri))}
+        if operation == "shapes_for_target":
+            return {"target": self.compact_term(uri), "shapes": compact(index.shapes_for(uri))}
+        if operation == "shape_targets":
+            return {"shape": self.compact_term(uri), "targets": compact(index.targets_of(uri))}
+        return f"Error: unknown schema operation '{operation}'."
+
+    def _template_schema_lookup(self, operation: str, term: str = None, transitive: bool = False):
+        """
+        Answers the direct (non-transitive) schema lookups with QUERY_TEMPLATES, in the
+        same shapes as schema_lookup(). Returns a dict, or an error string.
+        """
+        def column(rows, var):
+            return sorted({row[var] for row in rows if var in row})
+
+        if operation == "list_classes":
+            return {"classes": column(self.execute_template("list_classes"), "class")}
+        if operation not in ("subclasses", "properties_of_class", "domain_range") or transitive:
+            return f"Error: operation '{operation}' needs the schema index, which is not built yet."
+
+        uri = self.compact_term(self.resolve_term(term))
+        if operation == "subclasses":
+            return {"class": uri, "subclasses": column(self.execute_template("subclasses", **{"class": uri}), "subclass")}
+        if operation == "properties_of_class":
+            properties = {}
+            for row in self.execute_template("class_properties", **{"class": uri}):
+                ranges = properties.setdefault(row["property"], set())
+                if "range" in row:
+                    ranges.add(row["range"])
+            return {"class": uri, "properties": {p: sorted(r) for p, r in sorted(properties.items())}}
+        rows = self.execute_template("property_domain_range", property=uri)
+        return {"property": uri, "domain": column(rows, "domain"), "range": column(rows, "range")}
+
 class RAGHandler:
-    def __init__(self, rdf_connector: RDFConnector = None, embeddings_model=None):
+    def __init__(self, rdf_connector: RDFConnector = None, embeddings_model=None,
+                 persist_directory: str = None, collection_name: str = None):
         self.rdf_connector = rdf_connector
         self.vector_store = None
-        self.embeddings_model = embeddings_model or OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+        self.embeddings_model = embeddings_model or create_embeddings_model()
+        self.persist_directory = persist_directory or CHROMA_PERSIST_DIR
+        self.collection_name = collection_name or CHROMA_COLLECTION_NAME
+        self.ingest_stats = {}
+        self.pending_deletes = []
+        # IDs of this handler's chunks, and of the ones it embedded itself. The collection
+        # is shared with other snapshots of the knowledge base, e.g. an ingestion running
+        # alongside, so vector results are filtered to chunk_ids
+        self.chunk_ids = frozenset()
+        self.embedded_ids = []
+        self._collection = None # (Chroma store, IDs present when opened)
+        self.lexical_index = None
+        self.query_counts = {"lexical_only": 0, "hybrid": 0, "vector_only": 0}
+        self._counts_lock = threading.Lock() # query_text runs on concurrent tool threads
         if not os.getenv("OPENAI_API_KEY"):
             logger.warning("OPENAI_API_KEY is not set. RAG embeddings may fail.")
 
-    def initialize_vector_store(self, ontology_file_path: str = None):
+    @property
+    def embedding_model_name(self) -> str:
+        """
+        Returns a stable identifier for the embedding model, used in chunk cache keys.
+        """
+        return str(getattr(self.embeddings_model, "model", None) or type(self.embeddings_model).__name__)
+
+    def chunk_id(self, text: str) -> str:
+        """
+        Returns the cache key for a chunk: a hash of the embedding model name and the chunk text.
+        """
+        return hashlib.sha256(f"{self.embedding_model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_query(self, text: str):
+        """
+        Returns the embedding of a query, reusing vectors of recently embedded queries.
+        """
+        return query_embedding_cache.get_or_embed(self.embedding_model_name, text, self.embeddings_model.embed_query)
+
+    def _split_ontology(self, ontology_file_path: str):
+        """
+        Splits the ontology into chunks. Uses one document per subject from the parsed
+        graph when available, falling back to character splitting of the raw file.
+        """
+        if self.rdf_connector and self.rdf_connector.graph:
+            return iter_subject_documents(self.rdf_connector.graph, source=ontology_file_path)
+
+        from langchain_community.document_loaders import TextLoader
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        loader = TextLoader(ontology_file_path)
+        documents = loader.load()
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+            is_separator_regex=False,
+        )
+        return text_splitter.split_documents(documents)
+
+    def open_collection(self):
+        """
+        Opens the persistent Chroma collection and lists the chunk IDs already stored.
+        Needs no parsed graph, so it can run while the ontology is being parsed.
+        Returns (vector_store, existing_ids).
+        """
+        if self._collection is None:
+            from langchain_community.vectorstores import Chroma
+
+            vector_store = Chroma(
+                collection_name=self.collection_name,
+                embedding_function=self.embeddings_model,
+                persist_directory=self.persist_directory,
+            )
+            self._collection = (vector_store, set(vector_store.get(include=[])["ids"]))
+        return self._collection
+
+    def initialize_vector_store(self, ontology_file_path: str = None, progress=None, defer_deletes: bool = False):
         """
-        Initializes the vector store from the ontology file.
-        This method will replace any existing vector store.
+        Synchronises the persistent vector store with the ontology file.
+        Only chunks whose text (or embedding model) changed are embedded; chunks that
+        no longer occur in the ontology are deleted from the collection.
+
+        Chunking and embedding overlap: full batches of new chunks are embedded on a
+        background thread while the next chunks are produced, and every chunk is added
+        to the lexical index used by query_text(). progress(stage, **details)
+        is called with "chunk" and "embed" updates. With defer_deletes=True stale chunks
+        are kept until apply_pending_deletes(), so a vector store still serving the
+        previous ontology is not emptied mid-build.
         """
+        progress = progress or (lambda stage, **details: None)
         if not ontology_file_path or not os.path.exists(ontology_file_path):
             logger.warning("WARNING: Ontology file path is not provided or file does not exist. Skipping vector store initialization.")
             self.vector_store = None
@@ -150,35 +612,153 @@ class RAGHandler:
 
         try:
             logger.info(f"Initializing vector store from {ontology_file_path}...")
-            loader = TextLoader(ontology_file_path)
-            documents = loader.load()
-
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-                is_separator_regex=False,
-            )
-            texts = text_splitter.split_documents(documents)
-            
-            # Create a new Chroma vector store from the documents
-            self.vector_store = Chroma.from_documents(texts, self.embeddings_model)
-            logger.info("Vector store initialized successfully.")
+            vector_store, existing_ids = self.open_collection()
+
+            # Deduplicate chunks by cache key; identical text embeds to the same vector
+            chunks = {}
+            new_ids = []
+            compactor = self.rdf_connector.compactor if self.rdf_connector and self.rdf_connector.graph else None
+            lexical_index = LexicalIndex(compact=compactor.compact_iri if compactor is not None else None)
+            batch = []
+            embedded = [0]
+            embed_lock = threading.Lock()
+
+            def embed_batch(texts, metadatas, ids):
+                vector_store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+                with embed_lock:
+                    embedded[0] += len(ids)
+                    progress("embed", done=embedded[0], total=len(new_ids))
+
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed") as embed_pool:
+                futures = []
+
+                def submit(batch_ids):
+                    futures.append(embed_pool.submit(
+                        embed_batch,
+                        [chunks[chunk_id].page_content for chunk_id in batch_ids],
+                        [chunks[chunk_id].metadata for chunk_id in batch_ids],
+                        batch_ids,
+                    ))
+
+                progress("chunk", status="running", done=0)
+                for doc in self._split_ontology(ontology_file_path):
+                    chunk_id = self.chunk_id(doc.page_content)
+                    if chunk_id in chunks:
+                        continue
+                    chunks[chunk_id] = doc
+                    lexical_index.add(doc)
+                    if chunk_id not in existing_ids:
+                        new_ids.append(chunk_id)
+                        batch.append(chunk_id)
+                        if len(batch) >= EMBEDDING_BATCH_SIZE:
+                            if not futures:
+                                progress("embed", status="running", done=0, total=len(new_ids))
+                            submit(batch)
+                            batch = []
+                    if len(chunks) % EMBEDDING_BATCH_SIZE == 0:
+                        progress("chunk", done=len(chunks))
+                if batch:
+                    submit(batch)
+                progress("chunk", status="done", done=len(chunks))
+                progress("embed", status="running", done=embedded[0], total=len(new_ids))
+
+                for future in futures:
+                    future.result()
+
+            stale_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in chunks]
+            self.pending_deletes = stale_ids
+            if not defer_deletes:
+                self.apply_pending_deletes()
+
+            self.vector_store = vector_store
+            self.chunk_ids = frozenset(chunks)
+            self.embedded_ids = new_ids
+            self.lexical_index = lexical_index.finish()
+            self.ingest_stats = {
+                "chunks_total": len(chunks),
+                "chunks_embedded": len(new_ids),
+                "chunks_reused": len(chunks) - len(new_ids),
+                "chunks_deleted": len(stale_ids),
+            }
+            progress("embed", status="done", done=len(new_ids), total=len(new_ids))
+            logger.info(f"Vector store initialized successfully: {self.ingest_stats}")
         except Exception as e:
             logger.error(f"ERROR: Cannot initialize vector store: {e}")
             traceback.print_exc()
             self.vector_store = None # Ensure vector store is None on failure
+            self.lexical_index = None
+
+    def apply_pending_deletes(self):
+        """
+        Deletes chunks that the last initialize_vector_store() found to be stale.
+        """
+        if self.pending_deletes and self._collection is not None:
+            self._collection[0].delete(ids=self.pending_deletes)
+            logger.info(f"Deleted {len(self.pending_deletes)} stale chunks from the vector store.")
+        self.pending_deletes = []
+
+    def discard_embedded(self, keep=()):
+        """
+        Deletes the chunks this handler embedded, except those in keep (the chunk IDs of
+        the live snapshot). Used when its snapshot is never published.
+        """
+        discarded = [chunk_id for chunk_id in self.embedded_ids if chunk_id not in keep]
+        if discarded and self._collection is not None:
+            self._collection[0].delete(ids=discarded)
+            logger.info(f"Deleted {len(discarded)} chunks embedded for an unpublished snapshot.")
+        self.embedded_ids = []
+        self.pending_deletes = []
+
+    def _vector_search(self, query: str, k: int):
+        """
+        Returns up to k of this handler's chunks nearest to query. Candidates are taken
+        from the shared collection and filtered to chunk_ids.
+        """
+        docs = self.vector_store.similarity_search_by_vector(self.embed_query(query), k=max(k, RAG_CANDIDATES))
+        return [doc for doc in docs if self.chunk_id(doc.page_content) in self.chunk_ids][:k]
+
+    def _retrieve(self, query: str, k: int):
+        """
+        Returns up to k documents for query. A query that names one ontology identifier
+        is answered from the lexical index alone when it matches a chunk's subject;
+        otherwise BM25 and vector results are fused with reciprocal-rank fusion.
+        """
+        lexical_index = self.lexical_index
+        if lexical_index is None or not RAG_HYBRID:
+            self._count_query("vector_only")
+            return self._vector_search(query, k)
+
+        if is_identifier_query(query):
+            docs = lexical_index.lookup_identifier(query)
+            if docs:
+                self._count_query("lexical_only")
+                return docs[:k]
+
+        candidates = max(k, RAG_CANDIDATES)
+        with metrics.span("rag_lexical_search"):
+            lexical_hits = lexical_index.search(query, candidates)
+        by_key = {lexical_index.keys[index]: lexical_index.documents[index] for index, _ in lexical_hits}
+        vector_docs = self._vector_search(query, candidates)
+        for doc in vector_docs:
+            by_key.setdefault(LexicalIndex.document_key(doc), doc)
+        fused = reciprocal_rank_fusion([
+            [lexical_index.keys[index] for index, _ in lexical_hits],
+            [LexicalIndex.document_key(doc) for doc in vector_docs],
+        ])
+        self._count_query("hybrid")
+        return [by_key[key] for key in fused[:k]]
 
     def query_text(self, query: str, k: int = 4):
         """
-        Queries the vector store for text relevant to the input query.
+        Queries the lexical index and vector store for text relevant to the input query.
         Returns a list of relevant document snippets.
         """
         if not self.vector_store:
             logger.warning("RAG vector store is not initialized. Cannot perform text query.")
             return "RAG vector store is not initialized. Please upload an ontology file first."
         try:
-            docs = self.vector_store.similarity_search(query, k=k)
+            with metrics.span("rag_query"):
+                docs = self._retrieve(query, k)
             # Format docs to include page_content and metadata.source
             formatted_docs = []
             for doc in docs:
@@ -193,27 +773,80 @@ class RAGHandler:
             traceback.print_exc()
             return f"Error during RAG query: {e}"
 
-def load_connectors(ontology_file_path: str = None):
+    def _count_query(self, mode: str):
+        with self._counts_lock:
+            self.query_counts[mode] += 1
+
+    def stats(self):
+        with self._counts_lock:
+            queries = dict(self.query_counts)
+        return {
+            "queries": queries,
+            "lexical_index_chunks": len(self.lexical_index) if self.lexical_index is not None else 0,
+        }
+
+def load_connectors(ontology_file_path: str = None, progress=None, defer_deletes: bool = False,
+                    collection_name: str = None):
     """
     Initializes and returns configured connectors and LLM tools based on the provided ontology file path.
+
+    Independent stages run concurrently: the vector store collection is opened while
+    the ontology is parsed, and the schema index is built while chunks are embedded.
+    progress(stage, status=..., **details) receives "parse", "index", "chunk" and
+    "embed" updates. collection_name selects the Chroma collection for the chunks
+    (one per knowledge base).
     """
+    progress = progress or (lambda stage, **details: None)
     configured_connectors = {}
     llm_tools = []
     rdf_rag_handler = None
 
     logger.info(f"Attempting to load connectors with ontology_file_path: {ontology_file_path}")
 
-    # Initialize RDFConnector
     rdf_connector = RDFConnector()
-    if rdf_connector.connect(file_path=ontology_file_path): # Pass file_path here
-        configured_connectors["rdf_connector"] = rdf_connector
-    else:
-        logger.warning("WARNING: RDF connector not initialized as ontology failed to load.")
-
-    # Initialize RAGHandler (and its vector store)
     # Ensure embeddings_model is passed if needed, or initialized within RAGHandler
-    rdf_rag_handler = RAGHandler(rdf_connector=rdf_connector)
-    rdf_rag_handler.initialize_vector_store(ontology_file_path=ontology_file_path)
+    rdf_rag_handler = RAGHandler(rdf_connector=rdf_connector, collection_name=collection_name)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest") as pool:
+        collection_future = None
+        if ontology_file_path and os.path.exists(ontology_file_path):
+            collection_future = pool.submit(rdf_rag_handler.open_collection)
+
+        # Initialize RDFConnector
+        progress("parse", status="running")
+        if rdf_connector.connect(file_path=ontology_file_path, build_index=False): # Pass file_path here
+            configured_connectors["rdf_connector"] = rdf_connector
+            progress("parse", status="done", triples=len(rdf_connector.graph))
+        else:
+            logger.warning("WARNING: RDF connector not initialized as ontology failed to load.")
+            progress("parse", status="failed")
+
+        index_future = None
+        if "rdf_connector" in configured_connectors:
+            def build_index():
+                progress("index", status="running")
+                try:
+                    index = rdf_connector.build_schema_index()
+                except Exception as e:
+                    # Schema lookups fall back to the prepared QUERY_TEMPLATES
+                    logger.error(f"ERROR: Cannot build schema index: {e}")
+                    traceback.print_exc()
+                    rdf_connector.schema_index = SchemaIndex()
+                    progress("index", status="failed", error=str(e))
+                    return
+                progress("index", status="done", classes=len(index.classes), properties=len(index.properties))
+            index_future = pool.submit(build_index)
+
+        # Initialize RAGHandler's vector store
+        if collection_future is not None:
+            try:
+                collection_future.result()
+            except Exception as e:
+                logger.error(f"ERROR: Cannot open vector store collection: {e}")
+        rdf_rag_handler.initialize_vector_store(ontology_file_path=ontology_file_path, progress=progress,
+                                                defer_deletes=defer_deletes)
+        if index_future is not None:
+            index_future.result()
 
     # Define tools only if their underlying handlers are successfully initialized
     # Tool for RAG
@@ -249,7 +882,7 @@ def load_connectors(ontology_file_path: str = None):
             "type": "function",
             "function": {
                 "name": "query_uploaded_rdf_graph",
-                "description": "Execute a SPARQL query directly on the previously uploaded RDF ontology file. Use this for precise queries about classes, properties, relationships, and instances. Ensure you use the correct prefixes (like dvt:, rdf:, rdfs:, owl:) provided in the system prompt. Always provide the full SPARQL query.",
+                "description": "Execute a SPARQL query directly on the previously uploaded RDF ontology file. Use this for precise queries about classes, properties, relationships, and instances. Ensure you use the correct prefixes (like dvt:, rdf:, rdfs:, owl:) provided in the system prompt. Always provide the full SPARQL query. If the result contains a query_guard entry, the query was rejected, stopped or capped; follow its message to rewrite the query.",
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -263,8 +896,41 @@ def load_connectors(ontology_file_path: str = None):
             }
         })
         logger.debug("DEBUG (connector_loader): SPARQL query tool added.")
+
+        # Tool for precomputed schema lookups (answers without running SPARQL)
+        llm_tools.append({
+            "type": "function",
+            "function": {
+                "name": "lookup_ontology_schema",
+                "description": "Fast lookup of ontology schema facts from precomputed indexes. Prefer this over SPARQL for: listing classes, subclasses/superclasses of a class, properties of a class, domain/range of a property, finding a URI by its label, labels of a URI, and SHACL shapes targeting a class.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "operation": {
+                            "type": "string",
+                            "enum": ["list_classes", "subclasses", "superclasses", "properties_of_class", "domain_range", "find_by_label", "labels", "shapes_for_target", "shape_targets"],
+                            "description": "The lookup to perform."
+                        },
+                        "term": {
+                            "type": "string",
+                            "description": "The class, property or shape as a prefixed name (e.g. 'dvt:Vehicle') or full URI; for find_by_label, the label text. Not needed for list_classes."
+                        },
+                        "transitive": {
+                            "type": "boolean",
+                            "description": "For subclasses/superclasses, include indirect ones; for properties_of_class, include inherited properties. Default false."
+                        }
+                    },
+                    "required": ["operation"]
+                }
+            }
+        })
+        logger.debug("DEBUG (connector_loader): Schema lookup tool added.")
     else:
         logger.warning("WARNING: SPARQL query tool not added as RDF graph is not loaded.")
         
+    # Paging tool for results truncated to the tool output budget
+    if llm_tools:
+        llm_tools.append(CONTINUATION_TOOL)
+
     logger.debug("DEBUG (connector_loader): Tools defined.")
     return configured_connectors, llm_tools, rdf_rag_handler
\ No newline at end of file
@@ -1,9 +1,81 @@
+import asyncio
+import itertools
+
+
 class BaseConnector:
+    """
+    Connector lifecycle: connect() acquires resources (typically a pooled client),
+    execute_query() returns a lazy iterator of rows, and close() releases them.
+    Connectors can be used as context managers.
+
+    For question routing, a connector declares route_keywords, a route_description and
+    the tool it answers through (tool_name); route_args() builds that tool's arguments.
+    """
+
+    tool_name = None
+    route_keywords = ()
+    route_description = None
+
+    def connect(self):
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def can_answer(self, question: str) -> bool:
-        raise NotImplementedError
+        question = question.lower()
+        return any(keyword in question for keyword in self.route_keywords)
+
+    def route_args(self, question: str, tail: str):
+        """
+        Returns tool arguments answering question, or None if the LLM should decide.
+        tail is the question text after the matched keyword.
+        """
+        return None
+
+    def routes(self):
+        """
+        Returns this connector's routes for the question router.
+        """
+        if not self.tool_name or not (self.route_keywords or self.route_description):
+            return []
+        from router import Route
+        return [Route(f"{type(self).__name__}:{self.tool_name}", self.tool_name, keywords=self.route_keywords,
+                      description=self.route_description, build_args=self.route_args)]
 
     def generate_query(self, question: str) -> str:
         raise NotImplementedError
 
-    def execute_query(self, query: str) -> list:
+    def execute_query(self, query, **options):
+        """
+        Returns an iterator over result rows. Rows are fetched as they are consumed.
+        """
         raise NotImplementedError
+
+    async def aexecute_query(self, query, limit: int = None, **options) -> list:
+        """
+        Async variant of execute_query: runs the query on the default executor and
+        returns up to limit rows, so several backends can be awaited concurrently.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: list(itertools.islice(self.execute_query(query, limit=limit, **options), limit))
+        )
+
+
+async def query_concurrently(requests):
+    """
+    Runs (connector, query, options) requests concurrently. Returns results in request
+    order; a failing request yields its exception instead of a row list.
+    """
+    return await asyncio.gather(
+        *(connector.aexecute_query(query, **options) for connector, query, options in requests),
+        return_exceptions=True
+    )
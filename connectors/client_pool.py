@@ -0,0 +1,77 @@
+# connectors/client_pool.py
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+
+def default_mongo_client_factory(uri: str, **options):
+    from pymongo import MongoClient
+    options.setdefault("maxPoolSize", MONGO_MAX_POOL_SIZE)
+    options.setdefault("serverSelectionTimeoutMS", MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    return MongoClient(uri, **options)
+
+
+class ClientPool:
+    """
+    Process-wide registry of database clients shared by URI.
+
+    Drivers such as pymongo keep their own connection pool per client, so one client
+    per URI is shared by every connector using it. Clients are reference counted and
+    closed when the last connector releases them.
+    """
+
+    def __init__(self):
+        self._clients = {}  # (uri, factory) -> [client, references]
+        self._lock = threading.Lock()
+
+    def acquire(self, uri: str, factory=None, **options):
+        """
+        Returns the shared client for uri, creating it with factory(uri, **options) on
+        first use.
+        """
+        factory = factory or default_mongo_client_factory
+        key = (uri, factory)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = self._clients[key] = [factory(uri, **options), 0]
+                logger.info(f"Opened pooled client for {self._redact(uri)}.")
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, uri: str, factory=None):
+        """
+        Drops one reference to the client for uri, closing it when none remain.
+        """
+        key = (uri, factory or default_mongo_client_factory)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._clients[key]
+        entry[0].close()
+        logger.info(f"Closed pooled client for {self._redact(uri)}.")
+
+    @staticmethod
+    def _redact(uri: str) -> str:
+        # Keep credentials out of the logs
+        scheme, sep, rest = uri.partition("://")
+        if sep and "@" in rest:
+            return f"{scheme}://***@{rest.split('@', 1)[1]}"
+        return uri
+
+    def stats(self):
+        with self._lock:
+            return {self._redact(uri): references for (uri, _), (_, references) in self._clients.items()}
+
+
+client_pool = ClientPool()
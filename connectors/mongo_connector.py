@@ -1,17 +1,194 @@
+import os
+import re
+import json
+import logging
+from datetime import date, datetime
+
 from connectors.base import BaseConnector
-from pymongo import MongoClient
+from connectors.client_pool import client_pool
+from tool_executor import TOOL_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "500"))
+# Hard cap on documents returned by one query, whatever limit the caller asks for
+MONGO_MAX_ROWS = int(os.getenv("MONGO_MAX_ROWS", "10000"))
+MONGO_TOOL_NAME = "query_mongodb"
+MONGO_ROUTE_LIMIT = int(os.getenv("MONGO_ROUTE_LIMIT", "50"))
+# Server-side time limit of one query; defaults to the tool deadline, so the server stops
+# working on a query once the tool call has timed out
+MONGO_MAX_TIME_MS = int(os.getenv("MONGO_MAX_TIME_MS", str(int(TOOL_TIMEOUT_SECONDS * 1000))))
+# Operators that run server-side JavaScript; never accepted in LLM-written queries
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator"}
+# Tokens that look like record identifiers (V123, VIN-0042, WBA12345)
+IDENTIFIER_PATTERN = re.compile(r"\b(?=[A-Za-z0-9-]*\d)[A-Z][A-Za-z0-9]*(?:-[A-Za-z0-9]+)*\b")
+
+
+def _jsonable(value):
+    """
+    Converts BSON values (ObjectId, datetimes, nested documents) into JSON-serialisable ones.
+    """
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def check_query_document(document, part: str = "filter"):
+    """
+    Raises ValueError if a filter, projection or sort document uses an operator that
+    runs server-side JavaScript, at any nesting depth.
+    """
+    if isinstance(document, dict):
+        for key, value in document.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise ValueError(f"The {key} operator is not allowed in the {part}.")
+            check_query_document(value, part)
+    elif isinstance(document, (list, tuple)):
+        for item in document:
+            check_query_document(item, part)
+
 
 class MongoConnector(BaseConnector):
-    def __init__(self, uri='mongodb://localhost:27017', db_name='vehicles'):
-        self.client = MongoClient(uri)
-        self.db = self.client[db_name]
+    """
+    Connector for one MongoDB collection.
 
-    def can_answer(self, question: str) -> bool:
-        return "service history" in question.lower()
+    The client is shared through the client pool, so connectors for the same URI reuse
+    one connection pool. execute_query() returns a lazy cursor: filter, projection, sort,
+    limit and batch size are pushed down to the server, and documents are only fetched
+    as the iterator is consumed. client_factory(uri, **options) replaces pymongo's
+    MongoClient, e.g. with mongomock.MongoClient in tests.
+    """
+
+    tool_name = MONGO_TOOL_NAME
+    route_keywords = ("service history", "service records", "service logs", "serviced", "maintenance history")
+
+    def __init__(self, uri='mongodb://localhost:27017', db_name='vehicles', collection_name='service_logs',
+                 client_factory=None, pool=None):
+        self.uri = uri
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.client_factory = client_factory
+        self.pool = pool or client_pool
+        self.client = None
+        self.db = None
+        self.collection = None
+
+    def connect(self):
+        """
+        Acquires the pooled client and checks the server is reachable.
+        Returns True on success; raises if the server cannot be reached.
+        """
+        if self.client is not None:
+            return True
+        client = self.pool.acquire(self.uri, self.client_factory)
+        try:
+            client.admin.command("ping")
+        except Exception:
+            self.pool.release(self.uri, self.client_factory)
+            raise
+        self.client = client
+        self.db = client[self.db_name]
+        self.collection = self.db[self.collection_name]
+        return True
+
+    def close(self):
+        if self.client is not None:
+            self.pool.release(self.uri, self.client_factory)
+            self.client = self.db = self.collection = None
+
+    def route_args(self, question: str, tail: str):
+        """
+        Routes questions naming record identifiers straight to a query on the collection's
+        identifier fields (those ending in "id"); other questions are left to the LLM.
+        """
+        identifiers = IDENTIFIER_PATTERN.findall(question)
+        id_fields = [field for field in self.sample_fields() if field != "_id" and field.lower().endswith("id")]
+        if not identifiers or not id_fields:
+            return None
+        conditions = [{field: identifier} for field in id_fields for identifier in identifiers]
+        return {
+            "filter": conditions[0] if len(conditions) == 1 else {"$or": conditions},
+            "projection": {"_id": 0},
+            "limit": MONGO_ROUTE_LIMIT,
+        }
 
     def generate_query(self, question: str) -> str:
         return "{}"  # Simple filter for all records
 
-    def execute_query(self, query: str) -> list:
-        results = self.db.service_logs.find()
-        return [f"{r['vehicle_id']} serviced on {r['date']}" for r in results]
+    def execute_query(self, query=None, projection=None, limit: int = None, batch_size: int = None, sort=None,
+                      max_time_ms: int = None):
+        """
+        Returns a lazy iterator of JSON-serialisable documents matching query (a filter
+        dict or its JSON text). Only the projected fields are transferred, at most
+        limit (capped at MONGO_MAX_ROWS) documents are returned, and they arrive from
+        the server batch_size at a time. The server aborts the query after max_time_ms.
+        Raises ValueError for operators that run server-side JavaScript.
+        """
+        self.connect()
+        if isinstance(query, str):
+            query = json.loads(query or "{}")
+        check_query_document(query, "filter")
+        check_query_document(projection, "projection")
+        limit = min(limit or MONGO_MAX_ROWS, MONGO_MAX_ROWS)
+        cursor = self.collection.find(query or {}, projection or None)
+        if sort:
+            cursor = cursor.sort([(field, int(direction)) for field, direction in dict(sort).items()])
+        cursor = cursor.limit(limit).batch_size(batch_size or MONGO_BATCH_SIZE)
+        cursor = cursor.max_time_ms(max_time_ms or MONGO_MAX_TIME_MS)
+        return (_jsonable(document) for document in cursor)
+
+    def sample_fields(self, sample_size: int = 20):
+        """
+        Returns the field names seen in a small sample of documents (sampled once).
+        """
+        if getattr(self, "_sample_fields", None) is not None:
+            return self._sample_fields
+        self.connect()
+        fields = []
+        for document in self.collection.find({}, limit=sample_size):
+            for field in document:
+                if field not in fields:
+                    fields.append(field)
+        self._sample_fields = fields
+        return fields
+
+    def tool_spec(self):
+        """
+        Returns the LLM tool definition for querying this collection.
+        """
+        fields = ", ".join(self.sample_fields()) or "unknown"
+        return {
+            "type": "function",
+            "function": {
+                "name": MONGO_TOOL_NAME,
+                "description": f"Query documents in the MongoDB collection '{self.db_name}.{self.collection_name}' (fields include: {fields}). Always filter and project to the fields you need; results are paged.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "filter": {
+                            "type": "object",
+                            "description": "MongoDB query filter, e.g. {\"vehicle_id\": \"V123\"}. Empty for all documents."
+                        },
+                        "projection": {
+                            "type": "object",
+                            "description": "Fields to return, e.g. {\"vehicle_id\": 1, \"date\": 1, \"_id\": 0}."
+                        },
+                        "sort": {
+                            "type": "object",
+                            "description": "Sort order, e.g. {\"date\": -1}."
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Maximum number of documents to return."
+                        }
+                    },
+                    "required": ["filter"]
+                }
+            }
+        }
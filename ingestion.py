@@ -0,0 +1,283 @@
+# ingestion.py
+
+import os
+import time
+import uuid
+import logging
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from router import build_router
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "1"))
+INGESTION_MAX_JOBS = int(os.getenv("INGESTION_MAX_JOBS", "100"))
+INGESTION_STAGES = ("parse", "index", "chunk", "embed")
+
+
+class KnowledgeSnapshot(NamedTuple):
+    """
+    Everything a chat turn reads about the loaded ontology. A snapshot is fully built
+    before it is published and never modified afterwards; a new upload publishes a new one.
+    """
+    connectors: dict
+    llm_tools: list
+    rag_handler: object
+    ontology_file: str = None
+    version: int = 0
+    tool_specs: list = ()
+    router: object = None
+
+    @classmethod
+    def create(cls, connectors, llm_tools, rag_handler, ontology_file=None, version=0):
+        """
+        Builds a snapshot, precomputing the tool specs sent with every LLM call so
+        requests against the same snapshot share an identical tools prefix, and the
+        question router over its tools.
+        """
+        tool_specs = [{"type": "function", "function": tool["function"]} for tool in llm_tools]
+        router = build_router(connectors, llm_tools, rag_handler)
+        return cls(connectors, llm_tools, rag_handler, ontology_file, version, tool_specs, router)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.connectors) or self.rag_handler is not None
+
+    @property
+    def triple_count(self) -> int:
+        rdf_connector = self.rdf_connector
+        return len(rdf_connector.graph) if rdf_connector is not None and rdf_connector.graph is not None else 0
+
+    @property
+    def rdf_connector(self):
+        return self.connectors.get("rdf_connector")
+
+    @property
+    def content_hash(self):
+        rdf_connector = self.rdf_connector
+        return rdf_connector.content_hash if rdf_connector is not None else None
+
+
+class KnowledgeStore:
+    """
+    Holds the live KnowledgeSnapshot. Readers take one reference per request and keep
+    using it, so swapping in a new snapshot never exposes a half-built state.
+    """
+
+    def __init__(self, snapshot: KnowledgeSnapshot = None):
+        self._snapshot = snapshot or KnowledgeSnapshot({}, [], None)
+        self._lock = threading.Lock()
+
+    def current(self) -> KnowledgeSnapshot:
+        return self._snapshot
+
+    def swap(self, snapshot: KnowledgeSnapshot):
+        """
+        Publishes snapshot unless a newer one is already live.
+        Returns the replaced snapshot, or None if snapshot was stale.
+        """
+        with self._lock:
+            previous = self._snapshot
+            if snapshot.version < previous.version:
+                return None
+            self._snapshot = snapshot
+        logger.info(f"Knowledge snapshot {snapshot.version} is live ({snapshot.ontology_file}).")
+        return previous
+
+    def evict(self):
+        """
+        Drops the live snapshot (keeping its version) so its graph and handlers can be
+        freed. Requests already holding it are unaffected. Returns the evicted snapshot.
+        """
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = KnowledgeSnapshot({}, [], None, previous.ontology_file, previous.version)
+        return previous
+
+
+class IngestionJob:
+    """
+    Status of one ontology ingestion: overall state plus per-stage progress.
+    """
+
+    def __init__(self, version: int, file_path: str, file_name: str, knowledge_base: str):
+        self.job_id = uuid.uuid4().hex
+        self.version = version
+        self.knowledge_base = knowledge_base
+        self.file_path = file_path
+        self.file_name = file_name
+        self.status = "queued"  # queued -> running -> succeeded | failed | superseded
+        self.stages = {stage: {"status": "pending"} for stage in INGESTION_STAGES}
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def progress(self, stage: str, status: str = None, **details):
+        """
+        Records progress for a stage. Matches the load_connectors progress callback.
+        """
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"status": "pending"})
+            now = time.time()
+            if status:
+                if status == "running" and "started_at" not in entry:
+                    entry["started_at"] = now
+                if status in ("done", "failed"):
+                    entry["duration_ms"] = round((now - entry.get("started_at", now)) * 1000, 1)
+                entry["status"] = status
+            entry.update(details)
+        if status in ("done", "failed"):
+            metrics.observe("ingestion_stage", entry["duration_ms"] / 1000, stage=stage, status=status)
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = time.time()
+
+    def finish(self, status: str, result: dict = None, error: str = None):
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+        metrics.observe("ingestion_job", self.finished_at - (self.started_at or self.created_at), status=status)
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "file_name": self.file_name,
+                "knowledge_base": self.knowledge_base,
+                "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class IngestionQueue:
+    """
+    Runs ontology ingestion jobs on a worker pool and publishes each finished build to
+    its knowledge base in one swap. registry must provide collection_name(name),
+    publish(name, snapshot) and current(name) (see KnowledgeRegistry).
+    on_swap(previous, snapshot) is called after a swap, and on_discard(job) after a job
+    that failed or was superseded, whose file was therefore never published.
+
+    Jobs are versioned in submission order, so a job that finishes after a newer one
+    for the same knowledge base has already been published is marked "superseded"
+    instead of replacing it. The default of one worker also keeps jobs from editing the
+    same vector store collection at once. Chunks embedded by a job that fails or is
+    superseded are deleted again; until a snapshot is published, its chunks are in the
+    collection but filtered out of the live snapshot's retrieval.
+    """
+
+    def __init__(self, registry, on_swap=None, on_discard=None, max_workers: int = None, max_jobs: int = None):
+        self.registry = registry
+        self.on_swap = on_swap
+        self.on_discard = on_discard
+        self.max_jobs = max_jobs or INGESTION_MAX_JOBS
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or INGESTION_WORKERS, thread_name_prefix="ingestion")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_version = 1
+
+    def submit(self, file_path: str, file_name: str = None, knowledge_base: str = None) -> IngestionJob:
+        """
+        Queues ingestion of file_path into knowledge_base and returns its job immediately.
+        """
+        knowledge_base = knowledge_base or self.registry.default_name
+        with self._lock:
+            job = IngestionJob(self._next_version, file_path, file_name or os.path.basename(file_path), knowledge_base)
+            self._next_version += 1
+            self._jobs[job.job_id] = job
+            # Forget the oldest finished jobs beyond max_jobs
+            for job_id in [i for i, j in self._jobs.items() if j.finished][:max(len(self._jobs) - self.max_jobs, 0)]:
+                del self._jobs[job_id]
+        self._pool.submit(self._run, job)
+        logger.info(f"Queued ingestion job {job.job_id} for {file_path} (knowledge base '{knowledge_base}').")
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_files(self):
+        """
+        Returns the file paths of jobs that have not finished.
+        """
+        with self._lock:
+            return {job.file_path for job in self._jobs.values() if not job.finished}
+
+    def _run(self, job: IngestionJob):
+        from connector_loader import load_connectors
+
+        job.start()
+        try:
+            connectors, llm_tools, rag_handler = load_connectors(
+                ontology_file_path=job.file_path, progress=job.progress, defer_deletes=True,
+                collection_name=self.registry.collection_name(job.knowledge_base)
+            )
+            rdf_connector = connectors.get("rdf_connector")
+            if rdf_connector is None or not rdf_connector.graph:
+                self._discard(job, rag_handler)
+                job.finish("failed", error=f"Failed to load ontology graph from '{job.file_name}'. Please check logs for details.")
+                logger.error(f"Ingestion job {job.job_id} failed: ontology graph not loaded.")
+                return
+
+            snapshot = KnowledgeSnapshot.create(connectors, llm_tools, rag_handler, job.file_path, job.version)
+            previous = self.registry.publish(job.knowledge_base, snapshot)
+            if previous is None:
+                self._discard(job, rag_handler)
+                job.finish("superseded", error="A newer upload was published before this one finished.")
+                return
+
+            # Stale chunks were kept for the previous snapshot until it stopped being live
+            rag_handler.apply_pending_deletes()
+            if self.on_swap:
+                self.on_swap(previous, snapshot)
+            job.finish("succeeded", result={
+                "message": f"Ontology '{job.file_name}' uploaded and loaded successfully!",
+                "file_name": job.file_name,
+                "knowledge_base": job.knowledge_base,
+                "embedding_stats": rag_handler.ingest_stats,
+            })
+            logger.info(f"Ingestion job {job.job_id} succeeded in {job.finished_at - job.started_at:.2f}s.")
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+            traceback.print_exc()
+            job.finish("failed", error=f"An error occurred while processing the file: {e}")
+        finally:
+            if job.status != "succeeded" and self.on_discard:
+                self.on_discard(job)
+
+    def _discard(self, job: IngestionJob, rag_handler):
+        """
+        Deletes the chunks a job embedded for a snapshot that is not published, keeping
+        those the live snapshot of its knowledge base also uses.
+        """
+        if rag_handler is None:
+            return
+        live = self.registry.current(job.knowledge_base)
+        rag_handler.discard_embedded(keep=live.rag_handler.chunk_ids if live.rag_handler is not None else ())
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"jobs": len(self._jobs), "by_status": counts}
@@ -0,0 +1,314 @@
+# knowledge_registry.py
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import traceback
+
+from ingestion import KnowledgeSnapshot, KnowledgeStore
+from tool_results import CONTINUATION_TOOL
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_REGISTRY_PATH = os.getenv("KNOWLEDGE_REGISTRY_PATH", "knowledge_bases.json")
+KNOWLEDGE_DEFAULT_BASE = os.getenv("KNOWLEDGE_DEFAULT_BASE", "default")
+KNOWLEDGE_MAX_LOADED = int(os.getenv("KNOWLEDGE_MAX_LOADED", "8"))
+# Triple count is the memory proxy for loaded graphs and their indexes.
+KNOWLEDGE_MAX_TRIPLES = int(os.getenv("KNOWLEDGE_MAX_TRIPLES", "5000000"))
+
+# Knowledge base names end up in Chroma collection names (3-63 chars of [A-Za-z0-9._-]).
+KNOWLEDGE_BASE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,39}$")
+
+
+class KnowledgeBase:
+    """
+    A named ontology with its own connectors, RAG collection and tools. The snapshot is
+    loaded on first use and may be evicted again; the ontology file stays registered.
+    """
+
+    def __init__(self, name: str, ontology_file: str = None, content_hash: str = None):
+        self.name = name
+        self.ontology_file = ontology_file
+        # Hash of the published ontology content; a re-upload may reuse the file path
+        self.content_hash = content_hash
+        self.store = KnowledgeStore()
+        # Connectors attached at runtime (e.g. databases): key -> (connector, tool spec)
+        self.attached = {}
+        self.last_used = 0.0
+        # Serialises lazy loads so concurrent first requests load the graph once
+        self.load_lock = threading.Lock()
+
+
+class KnowledgeRegistry:
+    """
+    Registry of named knowledge bases, persisted as a small JSON file of name -> ontology
+    file and content hash. Snapshots are loaded lazily and kept in an LRU bounded by the number of loaded
+    bases and their total triple count. Evicted bases reload from the ontology snapshot
+    cache and the persistent vector store, so nothing is re-parsed or re-embedded.
+    Each load still re-chunks the graph, hashes the chunks and builds the schema index,
+    query-guard statistics and BM25 index in this process; only the graph is shared
+    between workers (with the mmap backend).
+    """
+
+    def __init__(self, path: str = None, default_name: str = None, max_loaded: int = None, max_triples: int = None):
+        self.path = path or KNOWLEDGE_REGISTRY_PATH
+        self.default_name = default_name or KNOWLEDGE_DEFAULT_BASE
+        self.max_loaded = max_loaded or KNOWLEDGE_MAX_LOADED
+        self.max_triples = max_triples or KNOWLEDGE_MAX_TRIPLES
+        self._bases = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self._registry_mtime = None
+        self._load_registry()
+
+    @staticmethod
+    def valid_name(name: str) -> bool:
+        return bool(name) and bool(KNOWLEDGE_BASE_NAME_PATTERN.match(name))
+
+    def collection_name(self, name: str) -> str:
+        """
+        Returns the Chroma collection for a knowledge base. The default base keeps the
+        original collection name.
+        """
+        from connector_loader import CHROMA_COLLECTION_NAME
+
+        return CHROMA_COLLECTION_NAME if name == self.default_name else f"{CHROMA_COLLECTION_NAME}_{name}"
+
+    def _load_registry(self):
+        """
+        Reads the registry file if it changed since the last read. Other worker processes
+        publish uploads through this file, so a base whose ontology file or content hash
+        changed is evicted here and reloads the new file on its next use. The hash catches
+        re-uploads that overwrite the same file path.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._registry_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            with self._lock:
+                self._registry_mtime = mtime
+                for name, entry in entries.items():
+                    base = self._bases.get(name)
+                    if base is None:
+                        self._bases[name] = KnowledgeBase(name, entry.get("ontology_file"), entry.get("content_hash"))
+                    elif (base.ontology_file != entry.get("ontology_file")
+                          or base.content_hash != entry.get("content_hash")):
+                        base.ontology_file = entry.get("ontology_file")
+                        base.content_hash = entry.get("content_hash")
+                        base.store.evict()
+            logger.info(f"Knowledge registry loaded {len(entries)} knowledge bases from {self.path}.")
+        except Exception as e:
+            logger.error(f"ERROR loading knowledge registry {self.path}: {e}")
+            traceback.print_exc()
+
+    def _save_registry(self):
+        try:
+            with self._lock:
+                data = {
+                    name: {"ontology_file": base.ontology_file, "content_hash": base.content_hash}
+                    for name, base in self._bases.items() if base.ontology_file
+                }
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._registry_mtime = os.stat(self.path).st_mtime_ns
+        except Exception as e:
+            logger.error(f"ERROR saving knowledge registry {self.path}: {e}")
+            traceback.print_exc()
+
+    def names(self):
+        with self._lock:
+            return sorted(self._bases)
+
+    def __contains__(self, name):
+        self._load_registry()
+        with self._lock:
+            return name in self._bases
+
+    def get(self, name: str = None) -> KnowledgeSnapshot:
+        """
+        Returns the live snapshot for a knowledge base, loading it on first use.
+        Unknown names (and the default base before any upload) return an empty snapshot.
+        """
+        name = name or self.default_name
+        self._load_registry()
+        with self._lock:
+            base = self._bases.get(name)
+        if base is None:
+            return KnowledgeSnapshot.create({}, [], None)
+        base.last_used = time.monotonic()
+
+        snapshot = base.store.current()
+        if snapshot.loaded or not (base.ontology_file or base.attached):
+            return snapshot
+
+        with base.load_lock:
+            snapshot = base.store.current()
+            if snapshot.loaded:
+                return snapshot
+            started = time.perf_counter()
+            if base.ontology_file:
+                # rdflib and numpy come with the connectors; importing them here keeps app startup light
+                from connector_loader import load_connectors
+
+                # Stale chunks are left to the ingestion job that publishes a snapshot: a job
+                # running concurrently may just have embedded chunks this file lacks
+                connectors, llm_tools, rag_handler = load_connectors(
+                    ontology_file_path=base.ontology_file, collection_name=self.collection_name(name),
+                    defer_deletes=True,
+                )
+                if rag_handler is not None:
+                    rag_handler.pending_deletes = []
+            else:
+                connectors, llm_tools, rag_handler = {}, [], None
+            loaded = self._with_attached(base, KnowledgeSnapshot.create(
+                connectors, llm_tools, rag_handler, base.ontology_file, snapshot.version
+            ))
+            # An upload published while we were loading wins
+            if base.store.swap(loaded) is None:
+                return base.store.current()
+            # The registry may not list this content yet; do not evict it again when it does
+            base.content_hash = loaded.content_hash
+            self.loads += 1
+            logger.info(f"Knowledge base '{name}' loaded lazily in {time.perf_counter() - started:.2f}s.")
+        self._enforce_limits(keep=name)
+        return loaded
+
+    def ontology_file(self, name: str = None):
+        """
+        Returns the ontology file registered for a knowledge base, or None.
+        """
+        with self._lock:
+            base = self._bases.get(name or self.default_name)
+        return base.ontology_file if base is not None else None
+
+    def current(self, name: str = None) -> KnowledgeSnapshot:
+        """
+        Returns the live snapshot of a knowledge base without loading it.
+        """
+        with self._lock:
+            base = self._bases.get(name or self.default_name)
+        return base.store.current() if base is not None else KnowledgeSnapshot({}, [], None)
+
+    def publish(self, name: str, snapshot: KnowledgeSnapshot):
+        """
+        Makes snapshot the live version of knowledge base name, registering the base if
+        it is new. Returns the replaced snapshot, or None if a newer one is already live.
+        """
+        # Pick up other processes' uploads first so saving does not drop them
+        self._load_registry()
+        with self._lock:
+            base = self._bases.get(name)
+            if base is None:
+                base = self._bases[name] = KnowledgeBase(name)
+        previous = base.store.swap(self._with_attached(base, snapshot))
+        if previous is None:
+            return None
+        base.ontology_file = snapshot.ontology_file
+        base.content_hash = snapshot.content_hash
+        base.last_used = time.monotonic()
+        self._save_registry()
+        self._enforce_limits(keep=name)
+        return previous
+
+    def attach_connector(self, name: str, key: str, connector, tool: dict):
+        """
+        Adds a runtime connector and its tool to knowledge base name (replacing any
+        connector under the same key) and republishes the base's snapshot with it.
+        Attached connectors survive uploads and evictions, but not restarts.
+        Returns the replaced connector, if any.
+        """
+        self._load_registry()
+        with self._lock:
+            base = self._bases.get(name)
+            if base is None:
+                base = self._bases[name] = KnowledgeBase(name)
+        with base.load_lock:
+            replaced = base.attached.get(key)
+            base.attached[key] = (connector, tool)
+            current = base.store.current()
+            # An ontology that is not loaded yet picks the connector up when it loads
+            if current.loaded or not base.ontology_file:
+                base.store.swap(self._with_attached(base, current))
+        base.last_used = time.monotonic()
+        return replaced[0] if replaced else None
+
+    @staticmethod
+    def _with_attached(base: KnowledgeBase, snapshot: KnowledgeSnapshot) -> KnowledgeSnapshot:
+        """
+        Returns snapshot with the base's attached connectors and tools merged in; the
+        continuation tool stays last.
+        """
+        if not base.attached:
+            return snapshot
+        attached_names = {tool["function"]["name"] for _, tool in base.attached.values()}
+        connectors = dict(snapshot.connectors)
+        llm_tools = [
+            tool for tool in snapshot.llm_tools
+            if tool is not CONTINUATION_TOOL and tool["function"]["name"] not in attached_names
+        ]
+        for key, (connector, tool) in base.attached.items():
+            connectors[key] = connector
+            llm_tools.append(tool)
+        llm_tools.append(CONTINUATION_TOOL)
+        return KnowledgeSnapshot.create(connectors, llm_tools, snapshot.rag_handler, snapshot.ontology_file, snapshot.version)
+
+    def _enforce_limits(self, keep: str = None):
+        """
+        Evicts the least recently used loaded bases (other than keep) until the loaded
+        count and triple budget are respected.
+        """
+        with self._lock:
+            loaded = sorted(
+                (base for base in self._bases.values() if base.store.current().loaded),
+                key=lambda base: base.last_used
+            )
+            loaded_count = len(loaded)
+            total_triples = sum(base.store.current().triple_count for base in loaded)
+            for base in loaded:
+                if loaded_count <= self.max_loaded and total_triples <= self.max_triples:
+                    break
+                if base.name == keep:
+                    continue
+                evicted = base.store.evict()
+                loaded_count -= 1
+                total_triples -= evicted.triple_count
+                self.evictions += 1
+                logger.info(f"Evicted idle knowledge base '{base.name}' ({evicted.triple_count} triples).")
+
+    def stats(self):
+        with self._lock:
+            bases = {}
+            for name, base in self._bases.items():
+                snapshot = base.store.current()
+                bases[name] = {
+                    "loaded": snapshot.loaded,
+                    "version": snapshot.version,
+                    "triples": snapshot.triple_count,
+                    "ontology_file": base.ontology_file,
+                }
+                if snapshot.rdf_connector is not None:
+                    bases[name]["sparql_result_cache"] = snapshot.rdf_connector.query_cache.stats()
+                if snapshot.router is not None:
+                    bases[name]["router"] = snapshot.router.stats()
+                if snapshot.rag_handler is not None:
+                    bases[name]["rag"] = snapshot.rag_handler.stats()
+            return {
+                "bases": bases,
+                "loaded": sum(1 for entry in bases.values() if entry["loaded"]),
+                "loaded_triples": sum(entry["triples"] for entry in bases.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "max_loaded": self.max_loaded,
+                "max_triples": self.max_triples,
+            }
@@ -0,0 +1,194 @@
+# lexical_index.py
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import OrderedDict, Counter
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Terms occurring in more than this fraction of chunks (IRI scheme, host, common
+# predicates) add almost nothing to BM25 scores and are skipped at query time
+BM25_MAX_DOC_FRACTION = float(os.getenv("BM25_MAX_DOC_FRACTION", "0.5"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE", "1024"))
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# A query that is just one ontology identifier: a CURIE, an IRI or a camelCase name
+IDENTIFIER_QUERY_PATTERN = re.compile(
+    r"^(?:<?https?://\S+?>?|[A-Za-z][\w-]*:[A-Za-z_][\w.-]*|[a-z]+[A-Z][\w]*|[A-Z][a-z0-9]+[A-Z][\w]*)$"
+)
+
+
+def tokenize(text: str):
+    """
+    Returns lower-cased tokens for text. Identifiers are kept whole and also split at
+    camelCase boundaries, so "hasEngine" matches "hasengine", "has" and "engine".
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        lower = word.lower()
+        tokens.append(lower)
+        parts = CAMEL_PATTERN.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def local_name(iri: str) -> str:
+    """
+    Returns the part of an IRI after its last '#', '/' or ':'.
+    """
+    return re.split(r"[#/:]", iri.rstrip("/#"))[-1]
+
+
+def is_identifier_query(query: str) -> bool:
+    return bool(IDENTIFIER_QUERY_PATTERN.match(query.strip()))
+
+
+def reciprocal_rank_fusion(rankings, k: int = None):
+    """
+    Fuses ranked lists of keys. Each key scores sum(1 / (k + rank)) over the lists it
+    appears in. Returns the keys ordered by fused score.
+    """
+    k = RRF_K if k is None else k
+    scores = Counter()
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return [key for key, _ in scores.most_common()]
+
+
+class LexicalIndex:
+    """
+    In-process BM25 inverted index over chunk documents, plus an exact lookup from
+    identifiers (full IRI, CURIE and local name of each chunk's subject) to chunks.
+
+    Built once per ingestion from the same chunks that are embedded, so identifier
+    questions and exact terms can be answered without an embedding round trip.
+    """
+
+    def __init__(self, compact=None):
+        self.compact = compact
+        self.documents = []   # doc index -> Document
+        self.keys = []        # doc index -> fusion key
+        self._postings = {}   # term -> [(doc index, term frequency)]
+        self._lengths = []
+        self._identifiers = {}  # lower-cased identifier -> [doc index]
+        self._average_length = 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    @staticmethod
+    def document_key(document) -> str:
+        return document.metadata.get("subject") or document.page_content
+
+    def add(self, document):
+        """
+        Indexes one chunk document.
+        """
+        index = len(self.documents)
+        self.documents.append(document)
+        self.keys.append(self.document_key(document))
+        tokens = tokenize(document.page_content)
+        self._lengths.append(len(tokens))
+        for term, frequency in Counter(tokens).items():
+            self._postings.setdefault(term, []).append((index, frequency))
+
+        subject = document.metadata.get("subject")
+        if subject:
+            names = {subject, local_name(subject)}
+            if self.compact is not None:
+                names.add(self.compact(subject))
+            for name in names:
+                self._identifiers.setdefault(name.lower(), []).append(index)
+
+    def finish(self):
+        """
+        Computes corpus statistics once all documents are added.
+        """
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        logger.info(f"Lexical index built: {len(self.documents)} chunks, {len(self._postings)} terms.")
+        return self
+
+    def lookup_identifier(self, identifier: str):
+        """
+        Returns the documents whose subject is identifier (IRI, CURIE or local name).
+        """
+        identifier = identifier.strip().strip("<>").lower()
+        indexes = self._identifiers.get(identifier)
+        if indexes is None and ":" in identifier and "//" not in identifier:
+            indexes = self._identifiers.get(identifier.split(":", 1)[1])
+        return [self.documents[i] for i in (indexes or [])]
+
+    def search(self, query: str, k: int = 10):
+        """
+        Returns up to k (doc index, BM25 score) pairs for query, best first.
+        """
+        document_count = len(self.documents)
+        if not document_count:
+            return []
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings or len(postings) > document_count * BM25_MAX_DOC_FRACTION:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, frequency in postings:
+                length_norm = 1 - BM25_B + BM25_B * self._lengths[index] / self._average_length
+                scores[index] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        return scores.most_common(k)
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query embeddings keyed on (model name, text).
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = QUERY_EMBEDDING_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_embed(self, model_name: str, text: str, embed):
+        """
+        Returns the cached vector for text, or embed(text) stored for next time.
+        """
+        key = (model_name, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+        vector = embed(text)
+        with self._lock:
+            self._entries[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+# Shared by every RAG handler, so re-uploads and knowledge bases using the same
+# embedding model reuse vectors for repeated questions
+query_embedding_cache = QueryEmbeddingCache()
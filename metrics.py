@@ -0,0 +1,309 @@
+# metrics.py
+
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "chatbot")
+# Histogram bucket upper bounds in seconds, from sub-millisecond lookups to slow LLM calls
+METRICS_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_BUCKETS", "0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60"
+).split(","))
+# Requests slower than this log their span breakdown
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))
+# Opt-in sampling profiler: set to profile requests and keep the samples of those slower
+# than this many seconds
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", "0") or 0)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{key}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram of observations for one label set.
+    """
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, bucket_count: int):
+        self.counts = [0] * bucket_count
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float, buckets):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of a set of threads at a fixed interval from a background thread.
+    Stacks are aggregated in folded format ("outer;inner;leaf count"), which flamegraph.pl
+    and speedscope render as a flame graph.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.thread_ids = set()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Trace:
+    """
+    Spans recorded while handling one request, on any thread the request's context reaches.
+    """
+
+    def __init__(self, name: str, labels: dict):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.labels = labels
+        self.started = time.perf_counter()
+        self.spans = []  # (name, labels, offset seconds, duration seconds)
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, labels: dict, started: float, duration: float):
+        with self._lock:
+            self.spans.append((name, labels, started - self.started, duration))
+
+    def watch_thread(self):
+        if self.profiler is not None:
+            self.profiler.thread_ids.add(threading.get_ident())
+
+    def summary(self):
+        """
+        Returns total seconds per span name (excluding the request's own span), largest first.
+        """
+        with self._lock:
+            totals = Counter()
+            for name, _, _, duration in self.spans:
+                if name != self.name:
+                    totals[name] += duration
+        return totals.most_common()
+
+
+class Metrics:
+    """
+    In-process counters and latency histograms, rendered in Prometheus text format.
+
+    span() times a block into the <name>_seconds histogram and, inside trace(), adds it
+    to the current request's trace. Collectors registered with register_collector() report
+    values other components already keep (cache hit counters and the like) at scrape time.
+    """
+
+    def __init__(self, namespace: str = None, buckets=None):
+        self.namespace = METRICS_NAMESPACE if namespace is None else namespace
+        self.buckets = tuple(sorted(buckets or METRICS_BUCKETS))
+        self._counters = {}    # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Adds value to the counter <name>_total.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """
+        Records a duration in the histogram <name>_seconds (and in the current trace).
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(len(self.buckets))
+            histogram.observe(seconds, self.buckets)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, labels, time.perf_counter() - seconds, seconds)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block into the <name>_seconds histogram.
+        """
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.watch_thread()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @contextmanager
+    def trace(self, name: str, **labels):
+        """
+        Handles one request: times it as a span, collects the spans of everything it calls,
+        logs their breakdown if the request is slow and, when PROFILE_SLOW_SECONDS is set,
+        keeps a flame graph of slow requests in PROFILE_DIR.
+        """
+        trace = Trace(name, labels)
+        if PROFILE_SLOW_SECONDS:
+            trace.profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+            trace.profiler.start()
+        token = _current_trace.set(trace)
+        try:
+            with self.span(name, **labels):
+                yield trace
+        finally:
+            _current_trace.reset(token)
+            duration = time.perf_counter() - trace.started
+            if trace.profiler is not None:
+                trace.profiler.stop()
+                if duration >= PROFILE_SLOW_SECONDS:
+                    self._save_profile(trace)
+            if duration >= TRACE_SLOW_SECONDS:
+                breakdown = ", ".join(f"{span}={seconds * 1000:.0f}ms" for span, seconds in trace.summary())
+                logger.warning(f"Slow {name} request {trace.trace_id} took {duration:.2f}s: {breakdown}")
+
+    def _save_profile(self, trace: Trace):
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{trace.name}-{trace.trace_id}.folded")
+            trace.profiler.write(path)
+            logger.info(f"Profile of slow {trace.name} request {trace.trace_id} written to {path}.")
+        except Exception as e:
+            logger.error(f"Error writing profile for request {trace.trace_id}: {e}")
+
+    def register_collector(self, collector):
+        """
+        Registers collector() -> iterable of (name, type, labels, value), called on every
+        render. type is "counter" or "gauge"; counter names get the _total suffix.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Returns all metrics in Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.total, h.count) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        collected = {}
+        for collector in self._collectors:
+            try:
+                for name, kind, labels, value in collector():
+                    if value is None:
+                        continue
+                    if kind == "counter":
+                        counters.setdefault(name, {})[_label_key(labels)] = value
+                    else:
+                        collected.setdefault(name, {})[_label_key(labels)] = value
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {e}")
+
+        for name in sorted(counters):
+            full_name = self._name(f"{name}_total")
+            if name in self._help:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{full_name}{_format_labels(key)} {value:g}")
+
+        for name in sorted(collected):
+            full_name = self._name(name)
+            if name in self._help:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} gauge")
+            for key, value in sorted(collected[name].items()):
+                lines.append(f"{full_name}{_format_labels(key)} {value:g}")
+
+        for name in sorted(histograms):
+            full_name = self._name(f"{name}_seconds")
+            if name in self._help:
+                lines.append(f"# HELP {full_name} {self._help[name]}")
+            lines.append(f"# TYPE {full_name} histogram")
+            for key, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {cumulative}")
+                lines.append(f"{full_name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def current_trace():
+    """
+    Returns the Trace of the request being handled on this context, or None.
+    """
+    return _current_trace.get()
+
+
+metrics = Metrics()
@@ -0,0 +1,75 @@
+# namespace_compactor.py
+
+import threading
+
+from rdflib import URIRef
+
+# Characters that conventionally end a namespace IRI.
+NAMESPACE_SEPARATORS = "#/:"
+
+
+class NamespaceCompactor:
+    """
+    Shortens IRIs to prefix:local form using the longest registered namespace.
+
+    Namespaces are stored in a dict keyed by namespace IRI. Lookup walks back through
+    the IRI's separator positions (last '#', '/' or ':' first), so each IRI costs a few
+    dict lookups rather than a scan over every prefix. Results are memoised because
+    result sets repeat the same terms many times.
+    """
+
+    def __init__(self, namespaces=(), memo_size: int = 100_000):
+        self._prefix_by_namespace = {}
+        self._memo = {}
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+        for prefix, namespace in namespaces:
+            self.add(prefix, namespace)
+
+    def add(self, prefix: str, namespace):
+        """
+        Registers prefix for namespace. The first prefix registered for a namespace wins.
+        """
+        namespace = str(namespace)
+        if namespace and namespace not in self._prefix_by_namespace:
+            self._prefix_by_namespace[namespace] = prefix
+            with self._lock:
+                self._memo.clear()
+
+    def compact_iri(self, iri: str) -> str:
+        """
+        Returns iri as prefix:local, or unchanged if no registered namespace matches.
+        """
+        cached = self._memo.get(iri)
+        if cached is not None:
+            return cached
+
+        compacted = iri
+        lookup = self._prefix_by_namespace
+        end = len(iri)
+        while end > 0:
+            cut = max(iri.rfind(sep, 0, end) for sep in NAMESPACE_SEPARATORS)
+            if cut < 0:
+                break
+            prefix = lookup.get(iri[:cut + 1])
+            if prefix is not None:
+                compacted = f"{prefix}:{iri[cut + 1:]}"
+                break
+            end = cut
+
+        with self._lock:
+            if len(self._memo) >= self._memo_size:
+                self._memo.clear()
+            self._memo[iri] = compacted
+        return compacted
+
+    def compact(self, value) -> str:
+        """
+        Returns an RDF term as a string, compacting URIRefs.
+        """
+        if isinstance(value, URIRef):
+            return self.compact_iri(str(value))
+        return str(value)
+
+    def namespaces(self):
+        return {prefix: namespace for namespace, prefix in self._prefix_by_namespace.items()}
@@ -0,0 +1,279 @@
+# ontology_cache.py
+
+import os
+import time
+import pickle
+import hashlib
+import logging
+import threading
+import traceback
+from array import array
+
+import rdflib
+from rdflib import Graph
+
+from triple_store import TRIPLE_STORE_FORMAT, TRIPLE_STORE_SUFFIX, write_triple_store, open_mapped_graph
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout changes so stale snapshots are ignored.
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+
+DEFAULT_CACHE_DIR = os.getenv("ONTOLOGY_SNAPSHOT_DIR", "ontology_cache")
+DEFAULT_MAX_BYTES = int(os.getenv("ONTOLOGY_SNAPSHOT_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of the file's bytes.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OntologySnapshotCache:
+    """
+    Persistent cache of parsed ontology graphs keyed on the source file's content hash.
+
+    A snapshot stores the distinct RDF terms once and the triples as a flat array of
+    term IDs, which is much cheaper to restore than re-tokenising Turtle.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self.metrics = {
+            "parse_count": 0,
+            "parse_seconds_total": 0.0,
+            "snapshot_load_count": 0,
+            "snapshot_load_seconds_total": 0.0,
+            "snapshot_store_count": 0,
+            # Attaching a memory-mapped triple store; counted apart from snapshot loads
+            "mmap_open_count": 0,
+            "mmap_open_seconds_total": 0.0,
+            "evictions": 0,
+            "last_load": None,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _snapshot_path(self, content_hash: str) -> str:
+        # rdflib's term pickling is version dependent, so the version is part of the key.
+        return os.path.join(self.cache_dir, f"{content_hash}-rdflib{rdflib.__version__}{SNAPSHOT_SUFFIX}")
+
+    def _record_load(self, source: str, seconds: float, content_hash: str):
+        with self._lock:
+            if source == "parse":
+                self.metrics["parse_count"] += 1
+                self.metrics["parse_seconds_total"] += seconds
+            elif source == "mmap":
+                self.metrics["mmap_open_count"] += 1
+                self.metrics["mmap_open_seconds_total"] += seconds
+            else:
+                self.metrics["snapshot_load_count"] += 1
+                self.metrics["snapshot_load_seconds_total"] += seconds
+            self.metrics["last_load"] = {"source": source, "seconds": seconds, "content_hash": content_hash}
+        logger.info(f"Ontology {content_hash[:12]} loaded via {source} in {seconds * 1000:.1f} ms.")
+
+    def load(self, content_hash: str):
+        """
+        Restores the graph for content_hash from its snapshot.
+        Returns the Graph, or None if no usable snapshot exists.
+        """
+        path = self._snapshot_path(content_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+            if payload.get("version") != SNAPSHOT_FORMAT_VERSION:
+                logger.info(f"Ignoring snapshot {path} with outdated format.")
+                self.invalidate(content_hash)
+                return None
+
+            terms = payload["terms"]
+            ids = payload["triples"]
+            graph = Graph()
+            for prefix, namespace in payload["namespaces"]:
+                graph.bind(prefix, namespace, override=True, replace=True)
+            graph.addN(
+                (terms[ids[i]], terms[ids[i + 1]], terms[ids[i + 2]], graph)
+                for i in range(0, len(ids), 3)
+            )
+            # Touch the file so eviction treats it as recently used.
+            os.utime(path, None)
+            return graph
+        except Exception as e:
+            logger.error(f"Error loading ontology snapshot {path}: {e}")
+            traceback.print_exc()
+            self.invalidate(content_hash)
+            return None
+
+    def store(self, content_hash: str, graph: Graph):
+        """
+        Writes a snapshot of graph under content_hash and enforces the size cap.
+        """
+        term_ids = {}
+        terms = []
+        ids = array("I")
+        for triple in graph:
+            for term in triple:
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(terms)
+                    terms.append(term)
+                ids.append(term_id)
+
+        payload = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "terms": terms,
+            "triples": ids,
+            "namespaces": [(prefix, str(namespace)) for prefix, namespace in graph.namespaces()],
+        }
+        path = self._snapshot_path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Atomic rename so concurrent workers never see a half-written snapshot.
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.metrics["snapshot_store_count"] += 1
+        except Exception as e:
+            logger.error(f"Error writing ontology snapshot {path}: {e}")
+            traceback.print_exc()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._enforce_size_cap(keep=path)
+
+    def _enforce_size_cap(self, keep: str = None):
+        """
+        Evicts least recently used snapshots until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith((SNAPSHOT_SUFFIX, TRIPLE_STORE_SUFFIX)):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self.metrics["evictions"] += 1
+                logger.info(f"Evicted ontology snapshot {path} to respect the cache size cap.")
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, content_hash: str = None):
+        """
+        Removes the snapshot (and triple store) for content_hash, or every snapshot if no
+        hash is given.
+        """
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith((SNAPSHOT_SUFFIX, TRIPLE_STORE_SUFFIX)):
+                continue
+            if content_hash is None or name.startswith(f"{content_hash}-"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def load_graph(self, file_path: str):
+        """
+        Returns (graph, content_hash) for file_path, restoring from a snapshot when one
+        exists and otherwise parsing the file and snapshotting the result.
+        """
+        content_hash = file_content_hash(file_path)
+
+        start = time.perf_counter()
+        graph = self.load(content_hash)
+        if graph is not None:
+            self._record_load("snapshot", time.perf_counter() - start, content_hash)
+            return graph, content_hash
+
+        start = time.perf_counter()
+        graph = Graph()
+        graph.parse(file_path)
+        self._record_load("parse", time.perf_counter() - start, content_hash)
+        self.store(content_hash, graph)
+        return graph, content_hash
+
+    def _triple_store_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}-{TRIPLE_STORE_FORMAT}{TRIPLE_STORE_SUFFIX}")
+
+    def load_mapped_graph(self, file_path: str):
+        """
+        Returns (graph, content_hash) for file_path, where graph is a read-only Graph over
+        a memory-mapped triple store shared by every process that loads the same file.
+        The store is built once from the parsed graph (or its snapshot) on first use.
+        """
+        content_hash = file_content_hash(file_path)
+        path = self._triple_store_path(content_hash)
+
+        start = time.perf_counter()
+        if not os.path.exists(path):
+            graph, _ = self.load_graph(file_path)
+            write_triple_store(graph, path)
+            self._enforce_size_cap(keep=path)
+            del graph
+        try:
+            graph = open_mapped_graph(path)
+        except Exception as e:
+            # A corrupt or foreign file is rebuilt on the next load
+            logger.error(f"Error attaching triple store {path}: {e}")
+            traceback.print_exc()
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        os.utime(path, None)
+        self._record_load("mmap", time.perf_counter() - start, content_hash)
+        return graph, content_hash
+
+    def stats(self):
+        """
+        Returns a copy of the cache metrics, including mean parse vs. snapshot load time.
+        """
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["mean_parse_seconds"] = (
+            stats["parse_seconds_total"] / stats["parse_count"] if stats["parse_count"] else None
+        )
+        stats["mean_snapshot_load_seconds"] = (
+            stats["snapshot_load_seconds_total"] / stats["snapshot_load_count"] if stats["snapshot_load_count"] else None
+        )
+        stats["mean_mmap_open_seconds"] = (
+            stats["mmap_open_seconds_total"] / stats["mmap_open_count"] if stats["mmap_open_count"] else None
+        )
+        return stats
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> OntologySnapshotCache:
+    """
+    Returns the process-wide snapshot cache, creating it on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = OntologySnapshotCache()
+        return _default_cache
@@ -0,0 +1,111 @@
+# ontology_chunker.py
+
+import logging
+
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.namespace import RDF, RDFS, OWL, SH, SKOS
+
+logger = logging.getLogger(__name__)
+
+CLASS_TYPES = {OWL.Class, RDFS.Class}
+PROPERTY_TYPES = {OWL.ObjectProperty, OWL.DatatypeProperty, OWL.AnnotationProperty, RDF.Property}
+SHAPE_TYPES = {SH.NodeShape, SH.PropertyShape}
+
+# Predicates rendered under a readable field name, in this order.
+FIELD_PREDICATES = [
+    ("label", RDFS.label),
+    ("label", SKOS.prefLabel),
+    ("comment", RDFS.comment),
+    ("definition", SKOS.definition),
+    ("subClassOf", RDFS.subClassOf),
+    ("subPropertyOf", RDFS.subPropertyOf),
+    ("domain", RDFS.domain),
+    ("range", RDFS.range),
+    ("targetClass", SH.targetClass),
+    ("targetNode", SH.targetNode),
+    ("targetSubjectsOf", SH.targetSubjectsOf),
+    ("targetObjectsOf", SH.targetObjectsOf),
+]
+
+# Predicates that only add noise to an embedded chunk.
+SKIPPED_PREDICATES = {RDF.type, RDFS.isDefinedBy}
+
+# How deep nested blank nodes (e.g. sh:property [...]) are expanded inline.
+MAX_BNODE_DEPTH = 2
+
+
+def subject_kind(types) -> str:
+    """
+    Classifies a subject as class, property, shape or resource from its rdf:types.
+    """
+    if types & SHAPE_TYPES:
+        return "shape"
+    if types & CLASS_TYPES:
+        return "class"
+    if types & PROPERTY_TYPES:
+        return "property"
+    return "resource"
+
+
+def _render_term(graph: Graph, term, depth: int = 0) -> str:
+    if isinstance(term, Literal):
+        return str(term)
+    if isinstance(term, BNode):
+        if depth >= MAX_BNODE_DEPTH:
+            return "[...]"
+        parts = [
+            f"{_render_term(graph, p)} {_render_term(graph, o, depth + 1)}"
+            for p, o in sorted(graph.predicate_objects(term))
+        ]
+        return "[" + "; ".join(parts) + "]"
+    return graph.namespace_manager.normalizeUri(term)
+
+
+def subject_document(graph: Graph, subject, source: str = None):
+    """
+    Builds one compact Document describing subject and its direct statements.
+    """
+    types = set(graph.objects(subject, RDF.type))
+    lines = [_render_term(graph, subject)]
+    if types:
+        lines.append("type: " + ", ".join(sorted(_render_term(graph, t) for t in types)))
+
+    handled = set(SKIPPED_PREDICATES)
+    fields = {}
+    for field, predicate in FIELD_PREDICATES:
+        handled.add(predicate)
+        # Several predicates share a field (rdfs:label / skos:prefLabel), so values are merged
+        fields.setdefault(field, set()).update(_render_term(graph, o) for o in graph.objects(subject, predicate))
+    for field, values in fields.items():
+        if values:
+            lines.append(f"{field}: " + " | ".join(sorted(values)))
+
+    for predicate, obj in sorted(graph.predicate_objects(subject)):
+        if predicate in handled:
+            continue
+        lines.append(f"{_render_term(graph, predicate)}: {_render_term(graph, obj)}")
+
+    metadata = {
+        "subject": str(subject),
+        "rdf_type": ", ".join(sorted(str(t) for t in types)),
+        "kind": subject_kind(types),
+    }
+    if source:
+        metadata["source"] = source
+    # Imported on first use, as langchain_core is slow to import
+    from langchain_core.documents import Document
+    return Document(page_content="\n".join(lines), metadata=metadata)
+
+
+def iter_subject_documents(graph: Graph, source: str = None):
+    """
+    Yields one Document per named subject in the graph (classes, properties, SHACL shapes
+    and other resources). Blank nodes are inlined into the subject that references them.
+    """
+    count = 0
+    for subject in graph.subjects(unique=True):
+        if not isinstance(subject, URIRef):
+            continue
+        count += 1
+        yield subject_document(graph, subject, source=source)
+    logger.info(f"Chunked graph into {count} subject documents.")
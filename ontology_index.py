@@ -0,0 +1,266 @@
+# ontology_index.py
+
+import logging
+import time
+from collections import defaultdict
+
+from rdflib import Graph, URIRef, Literal
+from rdflib.namespace import RDF, RDFS, OWL, SH, SKOS
+
+logger = logging.getLogger(__name__)
+
+CLASS_TYPES = {OWL.Class, RDFS.Class}
+PROPERTY_TYPES = {OWL.ObjectProperty, OWL.DatatypeProperty, OWL.AnnotationProperty, RDF.Property}
+LABEL_PREDICATES = (RDFS.label, SKOS.prefLabel)
+SHAPE_TARGET_PREDICATES = (SH.targetClass, SH.targetNode, SH.targetSubjectsOf, SH.targetObjectsOf)
+# Predicates whose changes can alter a SHACL shape's index entries.
+SHAPE_PREDICATES = set(SHAPE_TARGET_PREDICATES) | {SH.property, SH.path, SH.datatype, SH["class"]}
+
+
+class SchemaIndex:
+    """
+    In-memory indexes over an ontology's schema: class hierarchy (with transitive
+    closure), property domain/range, labels and SHACL shape targets.
+
+    Built once per graph; apply_changes() updates only the entries touched by a set of
+    added/removed triples.
+    """
+
+    def __init__(self, graph: Graph = None):
+        self.graph = None
+        self.build(graph)
+
+    def _reset(self):
+        self.classes = set()
+        self.properties = set()
+        self.superclasses = defaultdict(set)   # class -> direct superclasses
+        self.subclasses = defaultdict(set)     # class -> direct subclasses
+        self.domains = defaultdict(set)        # property -> rdfs:domain classes
+        self.ranges = defaultdict(set)         # property -> rdfs:range classes/datatypes
+        self.domain_properties = defaultdict(set)  # class -> properties with that rdfs:domain
+        self.uri_labels = defaultdict(set)     # uri -> labels
+        self.label_uris = defaultdict(set)     # lower-cased label -> uris
+        self.shape_targets = defaultdict(set)  # shape -> targeted classes/nodes/properties
+        self.target_shapes = defaultdict(set)  # target -> shapes
+        self.shape_constraints = defaultdict(set)  # shape -> {(path, class-or-datatype)}
+        self.path_shapes = defaultdict(set)    # property path -> shapes constraining it
+        self._ancestors = {}
+        self._descendants = {}
+
+    def build(self, graph: Graph):
+        """
+        (Re)builds every index from graph.
+        """
+        start = time.perf_counter()
+        self._reset()
+        self.graph = graph
+        if graph is None:
+            return
+
+        for s, p, o in graph.triples((None, RDF.type, None)):
+            self._add(s, p, o)
+        for predicate in (RDFS.subClassOf, RDFS.domain, RDFS.range) + LABEL_PREDICATES:
+            for s, p, o in graph.triples((None, predicate, None)):
+                self._add(s, p, o)
+        shapes = set()
+        for predicate in SHAPE_TARGET_PREDICATES + (SH.property,):
+            shapes.update(graph.subjects(predicate, None))
+        for shape in shapes:
+            self._index_shape(shape)
+
+        # Warm the closure so lookups are plain dict reads
+        for cls in list(self.classes | set(self.superclasses) | set(self.subclasses)):
+            self.ancestors(cls)
+            self.descendants(cls)
+        logger.info(
+            f"Schema index built in {(time.perf_counter() - start) * 1000:.1f} ms: "
+            f"{len(self.classes)} classes, {len(self.properties)} properties, {len(self.shape_targets)} shapes."
+        )
+
+    # --- incremental maintenance ---
+
+    def _add(self, s, p, o):
+        if p == RDF.type:
+            if o in CLASS_TYPES:
+                self.classes.add(s)
+            elif o in PROPERTY_TYPES:
+                self.properties.add(s)
+        elif p == RDFS.subClassOf:
+            self.superclasses[s].add(o)
+            self.subclasses[o].add(s)
+            self.classes.add(s)
+        elif p == RDFS.domain:
+            self.domains[s].add(o)
+            self.domain_properties[o].add(s)
+            self.properties.add(s)
+        elif p == RDFS.range:
+            self.ranges[s].add(o)
+            self.properties.add(s)
+        elif p in LABEL_PREDICATES and isinstance(o, Literal):
+            self.uri_labels[s].add(str(o))
+            self.label_uris[str(o).lower()].add(s)
+
+    def _remove(self, s, p, o):
+        if p == RDF.type:
+            if o in CLASS_TYPES and not (set(self.graph.objects(s, RDF.type)) & CLASS_TYPES):
+                self.classes.discard(s)
+            elif o in PROPERTY_TYPES and not (set(self.graph.objects(s, RDF.type)) & PROPERTY_TYPES):
+                self.properties.discard(s)
+        elif p == RDFS.subClassOf:
+            self.superclasses[s].discard(o)
+            self.subclasses[o].discard(s)
+            if not self.superclasses[s] and not (set(self.graph.objects(s, RDF.type)) & CLASS_TYPES):
+                self.classes.discard(s)
+        elif p == RDFS.domain:
+            self.domains[s].discard(o)
+            self.domain_properties[o].discard(s)
+        elif p == RDFS.range:
+            self.ranges[s].discard(o)
+        elif p in LABEL_PREDICATES and isinstance(o, Literal):
+            # The same label may still be asserted through the other label predicate
+            if not any((s, lp, o) in self.graph for lp in LABEL_PREDICATES):
+                self.uri_labels[s].discard(str(o))
+                self.label_uris[str(o).lower()].discard(s)
+
+    def _unindex_shape(self, shape):
+        for target in self.shape_targets.pop(shape, set()):
+            self.target_shapes[target].discard(shape)
+        for path, _ in self.shape_constraints.pop(shape, set()):
+            self.path_shapes[path].discard(shape)
+
+    def _index_shape(self, shape):
+        self._unindex_shape(shape)
+        graph = self.graph
+        for predicate in SHAPE_TARGET_PREDICATES:
+            for target in graph.objects(shape, predicate):
+                self.shape_targets[shape].add(target)
+                self.target_shapes[target].add(shape)
+        constraints = [shape] + list(graph.objects(shape, SH.property))
+        for constraint in constraints:
+            for path in graph.objects(constraint, SH.path):
+                value_type = graph.value(constraint, SH.datatype) or graph.value(constraint, SH["class"])
+                self.shape_constraints[shape].add((path, value_type))
+                self.path_shapes[path].add(shape)
+
+    def _owning_shapes(self, node):
+        """
+        Returns the shapes whose index entries depend on node: the shapes that reference it
+        through sh:property, or node itself.
+        """
+        return set(self.graph.subjects(SH.property, node)) or {node}
+
+    def _invalidate_closure(self, cls):
+        for node in self.descendants(cls) | {cls}:
+            self._ancestors.pop(node, None)
+        for node in self.ancestors(cls) | {cls}:
+            self._descendants.pop(node, None)
+
+    def apply_changes(self, added=(), removed=()):
+        """
+        Updates the indexes for triples already added to / removed from self.graph.
+        """
+        start = time.perf_counter()
+        affected_shapes = set()
+        for change, triples in ((self._remove, removed), (self._add, added)):
+            for s, p, o in triples:
+                if p == RDFS.subClassOf:
+                    # Invalidate using the hierarchy both before and after the edge change
+                    self._invalidate_closure(s)
+                    self._invalidate_closure(o)
+                    change(s, p, o)
+                    self._invalidate_closure(s)
+                    self._invalidate_closure(o)
+                else:
+                    change(s, p, o)
+                if p in SHAPE_PREDICATES:
+                    affected_shapes.add(s)
+        for node in affected_shapes:
+            for shape in self._owning_shapes(node):
+                self._index_shape(shape)
+        logger.debug(f"Schema index updated in {(time.perf_counter() - start) * 1e6:.0f} µs.")
+
+    # --- lookups ---
+
+    def ancestors(self, cls):
+        """
+        Returns all (transitive) superclasses of cls.
+        """
+        cached = self._ancestors.get(cls)
+        if cached is None:
+            cached = self._closure(cls, self.superclasses)
+            self._ancestors[cls] = cached
+        return cached
+
+    def descendants(self, cls):
+        """
+        Returns all (transitive) subclasses of cls.
+        """
+        cached = self._descendants.get(cls)
+        if cached is None:
+            cached = self._closure(cls, self.subclasses)
+            self._descendants[cls] = cached
+        return cached
+
+    @staticmethod
+    def _closure(start, edges):
+        seen = set()
+        stack = list(edges.get(start, ()))
+        while stack:
+            node = stack.pop()
+            if node in seen or node == start:
+                continue
+            seen.add(node)
+            stack.extend(edges.get(node, ()))
+        return frozenset(seen)
+
+    def get_subclasses(self, cls, transitive: bool = False):
+        return set(self.descendants(cls)) if transitive else set(self.subclasses.get(cls, ()))
+
+    def get_superclasses(self, cls, transitive: bool = False):
+        return set(self.ancestors(cls)) if transitive else set(self.superclasses.get(cls, ()))
+
+    def properties_of(self, cls, inherited: bool = False):
+        """
+        Returns {property: set of ranges} for properties whose domain is cls, either through
+        rdfs:domain or through a SHACL shape targeting cls. With inherited=True the
+        properties of all superclasses are included.
+        """
+        classes = {cls} | (set(self.ancestors(cls)) if inherited else set())
+        result = defaultdict(set)
+        for c in classes:
+            for prop in self.domain_properties.get(c, ()):
+                result[prop].update(self.ranges.get(prop, ()))
+            for shape in self.target_shapes.get(c, ()):
+                for path, value_type in self.shape_constraints.get(shape, ()):
+                    if value_type is not None:
+                        result[path].add(value_type)
+                    else:
+                        result[path]
+        return dict(result)
+
+    def domain_range(self, prop):
+        """
+        Returns {"domain": set, "range": set} for prop, combining rdfs:domain/rdfs:range
+        with the targets and value types of SHACL shapes constraining prop.
+        """
+        domain = set(self.domains.get(prop, ()))
+        range_ = set(self.ranges.get(prop, ()))
+        for shape in self.path_shapes.get(prop, ()):
+            domain.update(t for t in self.shape_targets.get(shape, ()) if isinstance(t, URIRef))
+            range_.update(vt for path, vt in self.shape_constraints.get(shape, ()) if path == prop and vt is not None)
+        return {"domain": domain, "range": range_}
+
+    def find_by_label(self, label: str):
+        """
+        Returns the URIs whose rdfs:label/skos:prefLabel equals label (case-insensitive).
+        """
+        return set(self.label_uris.get(label.strip().lower(), ()))
+
+    def labels_of(self, uri):
+        return set(self.uri_labels.get(uri, ()))
+
+    def shapes_for(self, target):
+        return set(self.target_shapes.get(target, ()))
+
+    def targets_of(self, shape):
+        return set(self.shape_targets.get(shape, ()))
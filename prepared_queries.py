@@ -0,0 +1,130 @@
+# prepared_queries.py
+
+import logging
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+# rdflib's SPARQL grammar (pyparsing) keeps parse state on shared parser elements, so
+# queries parsed on concurrent tool threads corrupt each other; parses are serialised
+_parse_lock = threading.Lock()
+
+# Parameterised schema lookups, run by RDFConnector.execute_template. Variables listed
+# in "bindings" are supplied through initBindings at evaluation time, so each template
+# is parsed and translated to SPARQL algebra only once. schema_lookup() falls back to
+# them while no SchemaIndex is built.
+QUERY_TEMPLATES = {
+    "list_classes": {
+        "description": "All classes in the ontology with their labels.",
+        "bindings": [],
+        "query": """
+            SELECT DISTINCT ?class ?label WHERE {
+                { ?class a owl:Class } UNION { ?class a rdfs:Class }
+                OPTIONAL { ?class rdfs:label ?label }
+            }
+        """,
+    },
+    "class_properties": {
+        "description": "Properties whose rdfs:domain is the class, or that a SHACL shape targeting the class constrains.",
+        "bindings": ["class"],
+        "query": """
+            SELECT DISTINCT ?property ?range WHERE {
+                {
+                    ?property rdfs:domain ?class .
+                    OPTIONAL { ?property rdfs:range ?range }
+                } UNION {
+                    ?shape sh:targetClass ?class ;
+                           sh:property ?constraint .
+                    ?constraint sh:path ?property .
+                    OPTIONAL { ?constraint sh:datatype|sh:class ?range }
+                }
+            }
+        """,
+    },
+    "property_domain_range": {
+        "description": "Domain and range of a property, from rdfs:domain/rdfs:range or from SHACL shapes using it as sh:path.",
+        "bindings": ["property"],
+        "query": """
+            SELECT DISTINCT ?domain ?range WHERE {
+                {
+                    ?property rdfs:domain ?domain .
+                    OPTIONAL { ?property rdfs:range ?range }
+                } UNION {
+                    ?property rdfs:range ?range .
+                    FILTER NOT EXISTS { ?property rdfs:domain ?anyDomain }
+                } UNION {
+                    ?shape sh:property ?constraint .
+                    ?constraint sh:path ?property .
+                    OPTIONAL { ?shape sh:targetClass ?domain }
+                    OPTIONAL { ?constraint sh:datatype|sh:class ?range }
+                }
+            }
+        """,
+    },
+    "subclasses": {
+        "description": "Direct subclasses of a class.",
+        "bindings": ["class"],
+        "query": """
+            SELECT DISTINCT ?subclass ?label WHERE {
+                ?subclass rdfs:subClassOf ?class .
+                OPTIONAL { ?subclass rdfs:label ?label }
+            }
+        """,
+    },
+}
+
+
+class PreparedQueryRegistry:
+    """
+    LRU registry of prepared (parsed and algebra-translated) SPARQL queries keyed by query text.
+
+    Prefixes are resolved at prepare time, so the registry must be cleared whenever the
+    namespace bindings change.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query_text: str, init_ns: dict = None):
+        """
+        Returns the prepared query for query_text, preparing and caching it on first use.
+        Raises the parser's exception if the query is invalid.
+        """
+        with self._lock:
+            prepared = self._queries.get(query_text)
+            if prepared is not None:
+                self._queries.move_to_end(query_text)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+
+        # Imported here: rdflib's SPARQL parser is slow to import and only needed once a graph is queried
+        from rdflib.plugins.sparql import prepareQuery
+
+        with _parse_lock:
+            prepared = prepareQuery(query_text, initNs=init_ns or {})
+        with self._lock:
+            self._queries[query_text] = prepared
+            while len(self._queries) > self.max_entries:
+                self._queries.popitem(last=False)
+        return prepared
+
+    def template(self, name: str, init_ns: dict = None):
+        """
+        Returns the prepared query for a named entry in QUERY_TEMPLATES.
+        """
+        return self.get(QUERY_TEMPLATES[name]["query"], init_ns)
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._queries)}
@@ -0,0 +1,166 @@
+# query_cache.py
+
+import os
+import re
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv("SPARQL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = float(os.getenv("SPARQL_CACHE_TTL_SECONDS", "600"))
+
+# Order matters: literals, IRIs and comments are matched before whitespace so their
+# contents are never rewritten.
+_TOKEN_RE = re.compile(
+    r'(?P<literal>"""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*')"
+    r'|(?P<iri><[^<>"\s{}|^`\\]*>)'
+    r"|(?P<comment>#[^\n]*)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>[^\s\"'<#]+|.)",
+    re.DOTALL,
+)
+_PREFIX_RE = re.compile(r"^\s*PREFIX\s+([A-Za-z][\w.-]*)?:\s*<([^>]*)>", re.IGNORECASE)
+_BASE_RE = re.compile(r"^\s*BASE\s*<([^>]*)>", re.IGNORECASE)
+# Whitespace next to these punctuation tokens carries no meaning.
+_TIGHT_PUNCTUATION = set("{}(),;")
+
+
+def _collapse(query: str) -> str:
+    out = []
+    pending_space = False
+    for match in _TOKEN_RE.finditer(query):
+        kind = match.lastgroup
+        token = match.group()
+        if kind in ("space", "comment"):
+            pending_space = True
+            continue
+        if pending_space and out and out[-1] not in _TIGHT_PUNCTUATION and token not in _TIGHT_PUNCTUATION:
+            out.append(" ")
+        pending_space = False
+        out.append(token)
+    return "".join(out)
+
+
+def normalize_query(query: str, known_prefixes: dict = None) -> str:
+    """
+    Returns a canonical form of a SPARQL query for use as a cache key.
+
+    Comments are dropped, insignificant whitespace is collapsed, and PREFIX/BASE
+    declarations are deduplicated and sorted. Declarations that merely repeat a
+    namespace already in known_prefixes are removed, since they do not change the
+    query's meaning.
+    """
+    known = {prefix: str(uri) for prefix, uri in (known_prefixes or {}).items()}
+    body = _collapse(query)
+
+    declarations = set()
+    while True:
+        prefix_match = _PREFIX_RE.match(body)
+        if prefix_match:
+            prefix, iri = prefix_match.group(1) or "", prefix_match.group(2)
+            if known.get(prefix) != iri:
+                declarations.add(f"PREFIX {prefix}:<{iri}>")
+            body = body[prefix_match.end():]
+            continue
+        base_match = _BASE_RE.match(body)
+        if base_match:
+            declarations.add(f"BASE <{base_match.group(1)}>")
+            body = body[base_match.end():]
+            continue
+        break
+
+    return " ".join(sorted(declarations) + [body.strip()])
+
+
+def estimate_size(value) -> int:
+    """
+    Returns a rough byte size of a query result (lists/dicts of strings).
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class QueryResultCache:
+    """
+    Thread-safe LRU cache for query results with a TTL and a total byte budget.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl_seconds: float = None):
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss or expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting least recently used entries to stay in budget.
+        Values larger than the whole budget are not cached.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            logger.debug(f"Result of {size} bytes exceeds cache budget; not cached.")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns hit/miss counters, hit rate and current occupancy.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,262 @@
+# router.py
+
+import os
+import re
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ROUTER_EMBEDDING_THRESHOLD = float(os.getenv("ROUTER_EMBEDDING_THRESHOLD", "0.80"))
+ROUTER_MAX_ROUTES = int(os.getenv("ROUTER_MAX_ROUTES", "3"))
+
+CURIE_PATTERN = re.compile(r"^<?([A-Za-z][\w-]*:[^\s?,;!<>]+?|https?://[^\s>]+)>?$")
+TERM_STOPWORDS = {"the", "a", "an", "class", "property", "of", "for"}
+
+
+class Route:
+    """
+    A way to answer part of a question with one tool call.
+
+    keywords are matched as whole words, case-insensitively. build_args(question, tail)
+    returns the tool arguments, where tail is the question text after the matched
+    keyword (empty for embedding matches), or None if no confident call can be built.
+    description is embedded for the fallback when no keyword matches. A generic route
+    (e.g. "what is") is only used when no specific route matched.
+    """
+
+    def __init__(self, name: str, tool_name: str, keywords=(), description: str = None, build_args=None,
+                 generic: bool = False):
+        self.name = name
+        self.generic = generic
+        self.tool_name = tool_name
+        self.keywords = tuple(keywords)
+        self.description = description
+        self.build_args = build_args or (lambda question, tail: None)
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over lower-cased keywords. search() finds every whole-word
+    keyword occurrence in one pass over the text, whatever the number of keywords.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # state -> [(keyword length, value)]
+        for keyword, value in keywords:
+            state = 0
+            for char in keyword.lower():
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = self._goto[state][char] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append((len(keyword), value))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                # Children of the root fail back to the root
+                self._fail[next_state] = self._goto[fail].get(char, 0) if state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def search(self, text: str):
+        """
+        Yields (start, end, value) for each whole-word keyword occurrence in text.
+        """
+        text = text.lower()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._out[state]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    yield start, end, value
+
+
+class QuestionRouter:
+    """
+    Picks the tool calls a question needs without asking the LLM.
+
+    All routes' keywords are compiled into one automaton, so keyword routing costs one
+    pass over the question regardless of how many connectors there are. If no keyword
+    matches, the question vector is compared against the route descriptions (embedded
+    once, on first use) with a single matrix product. Only routes whose arguments can
+    be built confidently become calls.
+    """
+
+    def __init__(self, routes, embeddings_model=None, threshold: float = None, max_routes: int = None):
+        self.routes = list(routes)
+        self.embeddings_model = embeddings_model
+        self.threshold = ROUTER_EMBEDDING_THRESHOLD if threshold is None else threshold
+        self.max_routes = max_routes or ROUTER_MAX_ROUTES
+        self._automaton = KeywordAutomaton(
+            (keyword, index) for index, route in enumerate(self.routes) for keyword in route.keywords
+        )
+        self._description_routes = [route for route in self.routes if route.description]
+        self._description_matrix = None
+        self._lock = threading.Lock()
+        self.stats_counters = {"questions": 0, "keyword_routed": 0, "embedding_routed": 0, "unrouted": 0}
+
+    def _description_vectors(self):
+        import numpy as np
+
+        with self._lock:
+            if self._description_matrix is None:
+                vectors = np.asarray(
+                    self.embeddings_model.embed_documents([route.description for route in self._description_routes]),
+                    dtype=np.float32
+                )
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                self._description_matrix = vectors / np.where(norms == 0, 1, norms)
+            return self._description_matrix
+
+    def _keyword_calls(self, question: str):
+        calls = []
+        generic_calls = []
+        seen = set()
+        for start, end, route_index in self._automaton.search(question):
+            route = self.routes[route_index]
+            if route.name in seen:
+                continue
+            args = route.build_args(question, question[end:].strip())
+            if args is not None:
+                seen.add(route.name)
+                (generic_calls if route.generic else calls).append((route, args))
+        return calls or generic_calls
+
+    def _embedding_calls(self, question: str, question_vector):
+        # numpy is imported on first use, like the embedding model itself
+        import numpy as np
+
+        if not self._description_routes or self.embeddings_model is None:
+            return []
+        if question_vector is None:
+            question_vector = self.embeddings_model.embed_query(question)
+        query = np.asarray(question_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if not norm:
+            return []
+        similarities = self._description_vectors() @ (query / norm)
+        calls = []
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.threshold:
+                break
+            route = self._description_routes[index]
+            args = route.build_args(question, "")
+            if args is not None:
+                calls.append((route, args))
+        return calls
+
+    def route(self, question: str, question_vector=None, use_embeddings: bool = True):
+        """
+        Returns up to max_routes (route, tool args) pairs for question. question_vector
+        avoids re-embedding a question that was already embedded.
+        """
+        source = "keyword_routed"
+        try:
+            calls = self._keyword_calls(question)
+            if not calls and use_embeddings:
+                calls = self._embedding_calls(question, question_vector)
+                source = "embedding_routed"
+        except Exception as e:
+            logger.error(f"Error routing question: {e}")
+            calls = []
+        with self._lock:
+            self.stats_counters["questions"] += 1
+            self.stats_counters[source if calls else "unrouted"] += 1
+        if calls:
+            logger.info(f"Router selected {[route.name for route, _ in calls[:self.max_routes]]} ({source}).")
+        return calls[:self.max_routes]
+
+    def stats(self):
+        with self._lock:
+            return {**self.stats_counters, "routes": len(self.routes)}
+
+
+def extract_term(tail: str, rdf_connector):
+    """
+    Returns a CURIE or IRI for the term a question names right after a keyword (e.g.
+    "subclasses of dvt:Vehicle" or "properties of the vehicle type"), or None.
+    Plain words are resolved through exact label matches in the schema index.
+    """
+    words = [w for w in re.split(r"[\s?,;!]+", tail.strip()) if w][:6]
+    while words and words[0].lower() in TERM_STOPWORDS:
+        words = words[1:]
+    if not words:
+        return None
+    match = CURIE_PATTERN.match(words[0].rstrip("."))
+    if match:
+        return match.group(1)
+    for length in range(min(len(words), 4), 0, -1):
+        uris = rdf_connector.schema_index.find_by_label(" ".join(words[:length]).rstrip("."))
+        if len(uris) == 1:
+            return rdf_connector.compact_term(next(iter(uris)))
+    return None
+
+
+def _schema_args_builder(operation: str, rdf_connector):
+    def build_args(question, tail):
+        term = extract_term(tail, rdf_connector)
+        return {"operation": operation, "term": term} if term else None
+    return build_args
+
+
+def ontology_routes(rdf_connector=None, rag_available: bool = False):
+    """
+    Returns the routes for the built-in ontology tools that are available.
+    """
+    routes = []
+    if rdf_connector is not None:
+        routes.append(Route(
+            "list_classes", "lookup_ontology_schema",
+            keywords=("list classes", "list all classes", "all classes", "which classes", "what classes", "list the classes"),
+            build_args=lambda question, tail: {"operation": "list_classes"}
+        ))
+        for operation, keywords in (
+            ("subclasses", ("subclasses of", "subclass of", "subtypes of", "kinds of")),
+            ("superclasses", ("superclasses of", "superclass of", "parent class of", "parents of")),
+            ("properties_of_class", ("properties of", "attributes of", "fields of")),
+            ("domain_range", ("domain of", "range of", "domain and range of")),
+            ("shapes_for_target", ("shapes for", "shacl shapes for", "constraints on")),
+        ):
+            routes.append(Route(operation, "lookup_ontology_schema", keywords=keywords,
+                                build_args=_schema_args_builder(operation, rdf_connector)))
+    if rag_available:
+        routes.append(Route(
+            "ontology_rag", "query_text_with_rag",
+            keywords=("what is", "what are", "what does", "describe", "definition of", "define", "explain", "meaning of"),
+            description="Questions about the meaning, definition or description of concepts, classes and properties in the ontology.",
+            build_args=lambda question, tail: {"query_text": question, "k": 4},
+            generic=True
+        ))
+    return routes
+
+
+def build_router(connectors: dict, llm_tools: list, rag_handler=None):
+    """
+    Builds the router for a knowledge snapshot: built-in ontology routes for the tools
+    it offers plus the routes declared by its connectors (see BaseConnector.routes).
+    """
+    tool_names = {tool["function"]["name"] for tool in llm_tools}
+    routes = ontology_routes(
+        rdf_connector=connectors.get("rdf_connector") if "lookup_ontology_schema" in tool_names else None,
+        rag_available="query_text_with_rag" in tool_names,
+    )
+    for connector in connectors.values():
+        if hasattr(connector, "routes"):
+            routes.extend(route for route in connector.routes() if route.tool_name in tool_names)
+    embeddings_model = rag_handler.embeddings_model if rag_handler is not None else None
+    return QuestionRouter(routes, embeddings_model=embeddings_model)
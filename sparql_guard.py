@@ -0,0 +1,533 @@
+# sparql_guard.py
+"""
+Cost estimates, LIMITs, timeouts and result budgets for SPARQL queries on the uploaded graph.
+
+The timeout is cooperative: rdflib evaluates queries in pure Python on the consuming
+thread, and the deadline is checked for every triple the evaluation reads and between
+result rows. Work that reads no triples and yields no rows is not interrupted, e.g. a
+FILTER (such as a regex) or ORDER BY over join results that are already materialised,
+or aggregating them. Such a query can overrun SPARQL_TIMEOUT_SECONDS by the time that
+step takes; the tool timeout of the caller still bounds how long the model waits.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+from rdflib import Graph, Variable, BNode, RDF
+from rdflib.paths import Path, AlternativePath, SequencePath, InvPath, MulPath
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock budget for evaluating one query; kept below TOOL_TIMEOUT_SECONDS so the
+# model receives a rewrite hint rather than a bare tool timeout
+SPARQL_TIMEOUT_SECONDS = float(os.getenv("SPARQL_TIMEOUT_SECONDS", "20"))
+# LIMIT added to SELECT queries without one, and the largest LIMIT accepted
+SPARQL_DEFAULT_LIMIT = int(os.getenv("SPARQL_DEFAULT_LIMIT", "1000"))
+SPARQL_MAX_LIMIT = int(os.getenv("SPARQL_MAX_LIMIT", "10000"))
+# Queries whose largest estimated intermediate result exceeds this are rejected unevaluated
+SPARQL_MAX_ESTIMATED_ROWS = int(os.getenv("SPARQL_MAX_ESTIMATED_ROWS", "5000000"))
+# Budgets on what a query may return, checked row by row as results are consumed
+SPARQL_MAX_ROWS = int(os.getenv("SPARQL_MAX_ROWS", "10000"))
+SPARQL_MAX_RESULT_BYTES = int(os.getenv("SPARQL_MAX_RESULT_BYTES", str(16 * 1024 * 1024)))
+
+# Rough growth of a transitive path (p* / p+) over the edges it follows
+TRANSITIVE_PATH_FACTOR = 10
+# Bytes charged per returned value on top of its text, for the result memory budget
+VALUE_OVERHEAD_BYTES = 64
+
+# Query forms by algebra root, and the columns their rows are returned in. CONSTRUCT
+# and DESCRIBE return the triples of the resulting graph
+QUERY_FORMS = {
+    "SelectQuery": "SELECT",
+    "AskQuery": "ASK",
+    "ConstructQuery": "CONSTRUCT",
+    "DescribeQuery": "DESCRIBE",
+}
+TRIPLE_VARIABLES = ["subject", "predicate", "object"]
+ASK_VARIABLES = ["result"]
+
+
+class QueryInterrupted(Exception):
+    """
+    Raised from the graph's triple iteration when a guarded evaluation passes its
+    deadline or is cancelled, unwinding rdflib's evaluation generators.
+    """
+
+
+class QueryRejected(Exception):
+    """
+    Raised when a query is refused before evaluation. hint is the structured
+    explanation returned to the model.
+    """
+
+    def __init__(self, hint: dict):
+        super().__init__(hint["message"])
+        self.hint = hint
+
+
+class QueryPlan(NamedTuple):
+    query: object            # prepared rdflib Query to evaluate (LIMIT applied)
+    form: str                # "SELECT", "ASK", "CONSTRUCT" or "DESCRIBE"
+    variables: list          # projected variable names
+    estimated_rows: int      # largest estimated intermediate result
+    limit: int               # effective LIMIT of a SELECT, or None
+    limit_source: str        # "query", "injected", "clamped" or None
+
+
+def guard_hint(reason: str, message: str, **details) -> dict:
+    """
+    Returns the structured hint placed in a "query_guard" result row.
+    """
+    hint = {"reason": reason, "message": message}
+    hint.update(details)
+    return hint
+
+
+class GraphStatistics:
+    """
+    Triple counts per predicate and per rdf:type class, and distinct subject/object
+    counts, collected in one pass over a graph for cardinality estimates.
+    """
+
+    def __init__(self, graph):
+        self.predicate_counts = Counter()
+        self.type_counts = Counter()
+        subjects = set()
+        objects = set()
+        triple_count = 0
+        for s, p, o in graph.triples((None, None, None)):
+            triple_count += 1
+            self.predicate_counts[p] += 1
+            subjects.add(s)
+            objects.add(o)
+            if p == RDF.type:
+                self.type_counts[o] += 1
+        self.triple_count = triple_count
+        self.subject_count = max(len(subjects), 1)
+        self.object_count = max(len(objects), 1)
+
+    def path_rows(self, path) -> float:
+        """
+        Returns the estimated number of (subject, object) pairs a predicate or path matches.
+        """
+        if isinstance(path, (Variable, BNode)):
+            return self.triple_count
+        if isinstance(path, InvPath):
+            return self.path_rows(path.arg)
+        if isinstance(path, SequencePath):
+            return max(self.path_rows(arg) for arg in path.args)
+        if isinstance(path, AlternativePath):
+            return sum(self.path_rows(arg) for arg in path.args)
+        if isinstance(path, MulPath):
+            rows = self.path_rows(path.path)
+            if path.mod == "?":
+                return rows + self.subject_count
+            return rows * TRANSITIVE_PATH_FACTOR + (self.subject_count if path.mod == "*" else 0)
+        if isinstance(path, Path):
+            # Negated property sets match nearly every triple
+            return self.triple_count
+        return self.predicate_counts.get(path, 0)
+
+    def pattern_rows(self, s, p, o) -> float:
+        """
+        Returns the estimated number of solutions of one triple pattern.
+        """
+        subject_bound = not isinstance(s, (Variable, BNode))
+        object_bound = not isinstance(o, (Variable, BNode))
+        if p == RDF.type and object_bound:
+            rows = self.type_counts.get(o, 0)
+            return min(rows, 1) if subject_bound else rows
+        rows = self.path_rows(p)
+        if subject_bound:
+            rows = rows / self.subject_count
+        if object_bound:
+            rows = rows / self.object_count
+        # A pattern with bound terms can still match; never estimate below one row
+        return max(rows, 1) if rows else 0
+
+
+def _variables(pattern):
+    return {term for term in pattern if isinstance(term, (Variable, BNode))}
+
+
+class CostEstimator:
+    """
+    Walks the SPARQL algebra bottom-up, estimating each operator's output rows from
+    triple-pattern selectivity. Joins sharing a variable are assumed to be key joins
+    (the larger side bounds the output); joins sharing none are cartesian products.
+    """
+
+    def __init__(self, statistics: GraphStatistics, compact=str):
+        self.statistics = statistics
+        self.compact = compact
+        self.max_rows = 0
+        self.cartesian_groups = []  # lists of rendered patterns that share no variable
+        self.unbounded_paths = []
+        self.services = 0
+
+    def render(self, pattern) -> str:
+        return " ".join(
+            f"?{term}" if isinstance(term, Variable) else
+            f"_:{term}" if isinstance(term, BNode) else
+            term.n3() if isinstance(term, Path) else
+            self.compact(term)
+            for term in pattern
+        )
+
+    def _seen(self, rows):
+        self.max_rows = max(self.max_rows, rows)
+        return rows
+
+    def estimate(self, node):
+        """
+        Returns (estimated rows, variables) for an algebra node.
+        """
+        name = getattr(node, "name", None)
+        if name == "BGP":
+            return self._bgp(node.triples)
+        if name in ("Join", "LeftJoin", "Minus"):
+            left_rows, left_vars = self.estimate(node.p1)
+            right_rows, right_vars = self.estimate(node.p2)
+            if name == "Minus":
+                return left_rows, left_vars
+            if left_vars & right_vars or min(left_rows, right_rows) <= 1:
+                rows = max(left_rows, right_rows) if name == "Join" else left_rows
+            else:
+                rows = left_rows * right_rows
+                self.cartesian_groups.append([
+                    "patterns binding " + ", ".join(sorted(f"?{var}" for var in side))
+                    for side in (left_vars, right_vars)
+                ])
+            return self._seen(rows), left_vars | right_vars
+        if name == "Union":
+            left_rows, left_vars = self.estimate(node.p1)
+            right_rows, right_vars = self.estimate(node.p2)
+            return self._seen(left_rows + right_rows), left_vars | right_vars
+        if name == "values":
+            return len(node.res), {var for row in node.res for var in row}
+        if name == "ServiceGraphPattern":
+            self.services += 1
+            return 0, set()
+        if name == "Slice" and node.length is not None:
+            rows, variables = self.estimate(node.p)
+            return min(rows, node.length), variables
+        if name == "Graph":
+            return self.estimate(node.p)
+        # CompValue.get returns the key itself for a missing key; attribute access gives None
+        child = getattr(node, "p", None) if name is not None else None
+        if child is not None:
+            return self.estimate(child)
+        return 0, set()
+
+    def _bgp(self, triples):
+        if not triples:
+            return 1, set()
+        # Group patterns into components connected through shared variables
+        components = []  # [variables, patterns]
+        for pattern in triples:
+            variables = _variables(pattern)
+            merged = [variables, [pattern]]
+            for component in list(components):
+                if component[0] & variables:
+                    merged[0] |= component[0]
+                    merged[1] = component[1] + merged[1]
+                    components.remove(component)
+            components.append(merged)
+
+        total_rows = 1
+        all_variables = set()
+        component_rows = []
+        for variables, patterns in components:
+            rows = 0
+            for pattern in patterns:
+                rows = max(rows, self.statistics.pattern_rows(*pattern))
+                s, p, o = pattern
+                if isinstance(p, MulPath) and p.mod in "*+" and isinstance(s, (Variable, BNode)) and isinstance(o, (Variable, BNode)):
+                    self.unbounded_paths.append(self.render(pattern))
+            component_rows.append((rows, patterns))
+            total_rows *= rows
+            all_variables |= variables
+        large = [patterns for rows, patterns in component_rows if rows > 1]
+        if len(large) > 1:
+            self.cartesian_groups.append([" . ".join(self.render(p) for p in patterns) for patterns in large])
+        return self._seen(total_rows), all_variables
+
+
+def _apply_limit(prepared, max_limit: int, default_limit: int):
+    """
+    Returns (query, limit, limit_source): a SELECT or CONSTRUCT gets default_limit when it
+    has no LIMIT (including an OFFSET without LIMIT), and a LIMIT above max_limit is
+    clamped. Other query forms are unchanged.
+    """
+    from rdflib.plugins.sparql.parserutils import CompValue
+    from rdflib.plugins.sparql.sparql import Query
+
+    algebra = prepared.algebra
+    if algebra.name not in ("SelectQuery", "ConstructQuery"):
+        return prepared, None, None
+    body = algebra.p
+    if body.name == "Slice" and body.length is not None and body.length <= max_limit:
+        return prepared, body.length, "query"
+
+    if body.name == "Slice" and body.length is not None:
+        limited = CompValue("Slice", p=body.p, start=body.start, length=max_limit)
+        limit, source = max_limit, "clamped"
+    elif body.name == "Slice":
+        # OFFSET without LIMIT: keep the offset, add the default limit
+        limited = CompValue("Slice", p=body.p, start=body.start, length=default_limit)
+        limit, source = default_limit, "injected"
+    else:
+        limited = CompValue("Slice", p=body, start=0, length=default_limit)
+        limit, source = default_limit, "injected"
+    rewritten = CompValue(algebra.name, **algebra)
+    rewritten["p"] = limited
+    return Query(prepared.prologue, rewritten), limit, source
+
+
+class _CheckedGraph(Graph):
+    """
+    View of a graph (same store and identifier) that calls check() for every triple
+    the evaluation reads. rdflib evaluates BGPs and property paths by iterating
+    graph.triples(), so even an evaluation that produces no rows checks its deadline.
+    """
+
+    def __init__(self, graph, check):
+        super().__init__(store=graph.store, identifier=graph.identifier, namespace_manager=graph.namespace_manager)
+        self._check = check
+
+    def triples(self, triple):
+        check = self._check
+        for found in super().triples(triple):
+            check()
+            yield found
+
+
+class GuardedEvaluation:
+    """
+    Evaluates a planned query lazily on the consuming thread. Iterating yields raw
+    result rows until the query finishes, the timeout passes, cancel() is called or a
+    row/memory budget is exceeded. stopped is then None or the hint explaining why rows
+    were cut off. Closing the iterator stops the evaluation.
+
+    The timeout counts only time spent evaluating, so pauses between result pages do
+    not use it up. It is checked between rows and for every triple read.
+    """
+
+    def __init__(self, graph, plan: QueryPlan, timeout: float = None, max_rows: int = None, max_bytes: int = None):
+        self.graph = graph
+        self.plan = plan
+        self.vars = [Variable(name) for name in plan.variables]
+        self.timeout = SPARQL_TIMEOUT_SECONDS if timeout is None else timeout
+        self.max_rows = SPARQL_MAX_ROWS if max_rows is None else max_rows
+        self.max_bytes = SPARQL_MAX_RESULT_BYTES if max_bytes is None else max_bytes
+        self.stopped = None
+        self.row_count = 0
+        self._cancelled = threading.Event()
+        self._spent = 0.0
+        self._resumed = None  # monotonic time evaluation last resumed, None while paused
+
+    def cancel(self):
+        """
+        Stops the evaluation at its next row or triple read.
+        """
+        self._cancelled.set()
+
+    def _check(self):
+        if self._cancelled.is_set():
+            raise QueryInterrupted("cancelled")
+        if self._resumed is not None and self._spent + time.monotonic() - self._resumed > self.timeout:
+            raise QueryInterrupted("timeout")
+
+    def _stop(self, reason: str, message: str, **details):
+        self.stopped = guard_hint(reason, message, rows_returned=self.row_count, **details)
+        metrics.increment("sparql_guard", outcome=reason)
+        logger.warning(f"SPARQL query stopped ({reason}) after {self.row_count} rows.")
+
+    def _evaluate(self):
+        """
+        Yields the raw rows of the query: binding tuples for SELECT, (bool,) for ASK and
+        triples for CONSTRUCT/DESCRIBE.
+        """
+        result = _CheckedGraph(self.graph, self._check).query(self.plan.query)
+        if self.plan.form == "ASK":
+            yield (result.askAnswer,)
+        elif self.plan.form == "SELECT":
+            yield from result
+        else:
+            yield from result.graph
+
+    def __iter__(self):
+        rows = self._evaluate()
+        result_bytes = 0
+        try:
+            while True:
+                self._resumed = time.monotonic()
+                try:
+                    self._check()
+                    row = next(rows, None)
+                except QueryInterrupted as e:
+                    if str(e) == "cancelled":
+                        self._stop("cancelled", "Evaluation was cancelled before the query finished.")
+                    else:
+                        self._stop(
+                            "timeout",
+                            f"Evaluation was stopped after {self.timeout:g}s. Bind more terms (a class with "
+                            "'?x a <Class>', a subject or a literal), drop OPTIONAL chains, avoid unbounded "
+                            "property paths (p* / p+) between two variables, and add a small LIMIT.",
+                            timeout_seconds=self.timeout,
+                        )
+                    return
+                finally:
+                    self._spent += time.monotonic() - self._resumed
+                    self._resumed = None
+                if row is None:
+                    return
+
+                self.row_count += 1
+                result_bytes += sum(len(str(value)) + VALUE_OVERHEAD_BYTES for value in row if value is not None)
+                if self.row_count > self.max_rows:
+                    self.row_count -= 1
+                    self._stop(
+                        "row_budget",
+                        f"The result exceeded {self.max_rows} rows. Add filters, aggregate with "
+                        "COUNT/GROUP BY, or page with LIMIT and OFFSET.",
+                        max_rows=self.max_rows,
+                    )
+                    return
+                if result_bytes > self.max_bytes:
+                    self.row_count -= 1
+                    self._stop(
+                        "memory_budget",
+                        f"The result exceeded {self.max_bytes} bytes. Select fewer or shorter variables "
+                        "(e.g. omit long comments) or page with LIMIT and OFFSET.",
+                        max_bytes=self.max_bytes,
+                    )
+                    return
+                yield row
+        finally:
+            rows.close()
+
+
+class QueryGuard:
+    """
+    Checks and bounds SPARQL queries against one graph before and during evaluation.
+
+    plan() estimates the cost of a prepared query from its algebra and the graph's
+    statistics, rejects SERVICE calls and queries whose estimated intermediate results
+    are too large (cartesian products, unbounded scans), and injects or clamps LIMIT.
+    evaluate() runs the plan under the timeout and row/memory budgets.
+    """
+
+    def __init__(self, graph=None, compact=str, max_estimated_rows: int = None,
+                 default_limit: int = None, max_limit: int = None):
+        self.graph = graph
+        self.compact = compact
+        self.max_estimated_rows = SPARQL_MAX_ESTIMATED_ROWS if max_estimated_rows is None else max_estimated_rows
+        self.default_limit = SPARQL_DEFAULT_LIMIT if default_limit is None else default_limit
+        self.max_limit = SPARQL_MAX_LIMIT if max_limit is None else max_limit
+        self._statistics = None
+        self._lock = threading.Lock()
+
+    def statistics(self) -> GraphStatistics:
+        """
+        Returns the graph statistics, collecting them on first use.
+        """
+        with self._lock:
+            if self._statistics is None:
+                started = time.perf_counter()
+                self._statistics = GraphStatistics(self.graph)
+                logger.info(
+                    f"SPARQL guard statistics collected for {self._statistics.triple_count} triples "
+                    f"in {time.perf_counter() - started:.2f}s."
+                )
+            return self._statistics
+
+    def invalidate(self):
+        """
+        Drops the statistics after the graph changed.
+        """
+        with self._lock:
+            self._statistics = None
+
+    def _reject(self, reason: str, message: str, **details):
+        metrics.increment("sparql_guard", outcome=reason)
+        raise QueryRejected(guard_hint(reason, message, **details))
+
+    def plan(self, prepared) -> QueryPlan:
+        """
+        Returns the QueryPlan for a prepared query. Raises QueryRejected with a rewrite
+        hint when the query must not be evaluated.
+        """
+        algebra = prepared.algebra
+        form = QUERY_FORMS.get(algebra.name)
+        if form is None:
+            self._reject(
+                "unsupported_query_form",
+                f"{algebra.name} queries are not supported; use SELECT, ASK, CONSTRUCT or DESCRIBE.",
+            )
+
+        estimator = CostEstimator(self.statistics(), self.compact)
+        body = getattr(algebra, "p", None)
+        estimator.estimate(body if body is not None else algebra)
+        estimated_rows = int(estimator.max_rows)
+
+        if estimator.services:
+            self._reject(
+                "service_not_allowed",
+                "SERVICE clauses are not allowed; query only the uploaded graph.",
+            )
+        if estimated_rows > self.max_estimated_rows:
+            if estimator.cartesian_groups:
+                self._reject(
+                    "cartesian_product",
+                    "These groups of triple patterns share no variable, so every combination of "
+                    f"their matches would be produced (~{estimated_rows} rows). Connect them through "
+                    "a shared variable, or run them as separate queries.",
+                    estimated_rows=estimated_rows,
+                    disconnected_patterns=estimator.cartesian_groups[0],
+                )
+            details = {"estimated_rows": estimated_rows}
+            if estimator.unbounded_paths:
+                details["unbounded_paths"] = estimator.unbounded_paths
+            self._reject(
+                "estimated_cost",
+                f"The query would build about {estimated_rows} intermediate rows. Bind a subject, a "
+                "class ('?x a <Class>') or an object, and bind one end of transitive paths; for schema "
+                "questions use lookup_ontology_schema instead.",
+                **details,
+            )
+
+        query, limit, limit_source = _apply_limit(prepared, self.max_limit, self.default_limit)
+        if limit_source in ("injected", "clamped"):
+            metrics.increment("sparql_guard", outcome=f"limit_{limit_source}")
+        if form == "SELECT":
+            variables = [str(var) for var in (getattr(algebra, "PV", None) or [])]
+        elif form == "ASK":
+            variables = ASK_VARIABLES
+        else:
+            variables = TRIPLE_VARIABLES
+        return QueryPlan(query, form, variables, estimated_rows, limit, limit_source)
+
+    def evaluate(self, plan: QueryPlan, **budgets) -> GuardedEvaluation:
+        return GuardedEvaluation(self.graph, plan, **budgets)
+
+    def limit_hint(self, plan: QueryPlan, row_count: int):
+        """
+        Returns a hint when a LIMIT added or lowered by the guard cut the result, else None.
+        Only SELECT rows are solutions: the triples of a CONSTRUCT or DESCRIBE graph do not
+        say whether its solution LIMIT was reached, so no hint is given for them.
+        """
+        if plan.form != "SELECT" or plan.limit_source not in ("injected", "clamped") or row_count < plan.limit:
+            return None
+        return guard_hint(
+            f"limit_{plan.limit_source}",
+            f"The result was capped at LIMIT {plan.limit}. Add filters to narrow it, or page "
+            f"with ORDER BY, LIMIT (at most {self.max_limit}) and OFFSET.",
+            limit=plan.limit,
+        )
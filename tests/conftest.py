@@ -0,0 +1,75 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep caches, registries and vector stores written by the modules under test out of the repository
+_state_dir = tempfile.mkdtemp(prefix="chatbot-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("ONTOLOGY_SNAPSHOT_DIR", os.path.join(_state_dir, "ontology_cache"))
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_state_dir, "chroma_db"))
+os.environ.setdefault("ANSWER_CACHE_PATH", os.path.join(_state_dir, "answer_cache.sqlite3"))
+os.environ.setdefault("KNOWLEDGE_REGISTRY_PATH", os.path.join(_state_dir, "knowledge_bases.json"))
+
+DVT = "https://graph.bmwgroup.net/Ontology/DigitalVehicleTwinOntology-1.0/"
+
+# A small ontology in the shape of the DigitalVehicleTwinOntology: a class hierarchy,
+# properties with rdfs:domain/range, a SHACL shape and a few instances
+SAMPLE_ONTOLOGY = f"""
+@prefix dvt: <{DVT}> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+dvt:Product a owl:Class ; rdfs:label "Product" ; rdfs:comment "Anything built by the manufacturer." .
+dvt:Vehicle a owl:Class ; rdfs:subClassOf dvt:Product ; rdfs:label "Vehicle" .
+dvt:Car a owl:Class ; rdfs:subClassOf dvt:Vehicle ; rdfs:label "Car" .
+dvt:Component a owl:Class ; rdfs:subClassOf dvt:Product ; rdfs:label "Component" .
+dvt:Engine a owl:Class ; rdfs:subClassOf dvt:Component ; rdfs:label "Engine" .
+
+dvt:hasComponent a owl:ObjectProperty ; rdfs:label "has component" ;
+    rdfs:domain dvt:Vehicle ; rdfs:range dvt:Component .
+dvt:serialNumber a owl:DatatypeProperty ; rdfs:label "serial number" ;
+    rdfs:domain dvt:Product ; rdfs:range xsd:string .
+
+dvt:EngineShape a sh:NodeShape ;
+    sh:targetClass dvt:Engine ;
+    sh:property [ sh:path dvt:displacement ; sh:datatype xsd:decimal ] .
+
+dvt:car1 a dvt:Car ; rdfs:label "Car one" ; dvt:hasComponent dvt:engine1 ; dvt:serialNumber "C-1" .
+dvt:car2 a dvt:Car ; rdfs:label "Car two" ; dvt:hasComponent dvt:engine2 ; dvt:serialNumber "C-2" .
+dvt:engine1 a dvt:Engine ; dvt:serialNumber "E-1" ; dvt:displacement 2.0 .
+dvt:engine2 a dvt:Engine ; dvt:serialNumber "E-2" ; dvt:displacement 3.0 .
+"""
+
+
+@pytest.fixture
+def ontology_file(tmp_path):
+    path = tmp_path / "sample_ontology.ttl"
+    path.write_text(SAMPLE_ONTOLOGY, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """
+    Replaces the OpenAI embedding client with deterministic offline embeddings.
+    """
+    import connector_loader
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    monkeypatch.setattr(connector_loader, "OpenAIEmbeddings", lambda **kwargs: DeterministicFakeEmbedding(size=32))
+
+
+@pytest.fixture
+def collection_name(request):
+    # One Chroma collection per test, so tests do not see each other's chunks
+    return "test_" + request.node.name.replace("[", "_").replace("]", "")[:50]
@@ -0,0 +1,96 @@
+# test_answer_cache.py
+
+import mongomock
+import pytest
+
+from answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticAnswerCache(path=str(tmp_path / "answers.sqlite3"), max_entries=3, threshold=0.9)
+
+
+def test_lookup_returns_similar_question_in_scope(cache):
+    cache.store("Which classes exist?", [1.0, 0.0, 0.0], "Vehicle, Engine", "ontology-a")
+    hit = cache.lookup([0.99, 0.1, 0.0], "ontology-a")
+    assert hit["answer"] == "Vehicle, Engine"
+    assert hit["similarity"] > 0.9
+
+
+def test_lookup_misses_other_scope_and_dissimilar_question(cache):
+    cache.store("Which classes exist?", [1.0, 0.0, 0.0], "Vehicle, Engine", "ontology-a")
+    assert cache.lookup([1.0, 0.0, 0.0], "ontology-b") is None
+    assert cache.lookup([0.0, 1.0, 0.0], "ontology-a") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_invalidate_drops_only_that_scope(cache):
+    cache.store("q1", [1.0, 0.0], "a", "ontology-a")
+    cache.store("q2", [1.0, 0.0], "b", "ontology-b")
+    cache.invalidate("ontology-a")
+    assert cache.lookup([1.0, 0.0], "ontology-a") is None
+    assert cache.lookup([1.0, 0.0], "ontology-b")["answer"] == "b"
+
+
+def test_entries_survive_restart_and_evict_lru(cache, tmp_path):
+    for i in range(4):
+        cache.store(f"q{i}", [float(i == j) for j in range(4)], f"answer {i}", "scope")
+    assert cache.stats()["entries"] == 3
+
+    reopened = SemanticAnswerCache(path=cache.path, max_entries=3, threshold=0.9)
+    assert reopened.lookup([1.0, 0.0, 0.0, 0.0], "scope") is None
+    assert reopened.lookup([0.0, 0.0, 0.0, 1.0], "scope")["answer"] == "answer 3"
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    import app3
+    from benchmarks.fake_openai import ScriptedOpenAI
+
+    monkeypatch.setattr(app3, "answer_cache", SemanticAnswerCache(path=str(tmp_path / "answers.sqlite3"), threshold=0.99))
+    monkeypatch.setattr(app3, "client", ScriptedOpenAI([
+        ("class hierarchy", [("lookup_ontology_schema", {"operation": "list_classes"})]),
+        ("mileage", [("query_mongodb", {"filter": {}})]),
+    ]))
+    return app3
+
+
+@pytest.fixture
+def snapshot(fake_embeddings, ontology_file, collection_name):
+    from connector_loader import load_connectors
+    from connectors.client_pool import ClientPool
+    from connectors.mongo_connector import MongoConnector
+    from ingestion import KnowledgeSnapshot
+
+    connectors, llm_tools, rag_handler = load_connectors(ontology_file, collection_name=collection_name)
+    mongo = MongoConnector("mongodb://test", "vehicles", "service_logs",
+                           client_factory=mongomock.MongoClient, pool=ClientPool())
+    mongo.connect()
+    mongo.collection.insert_one({"vehicle_id": "V1", "mileage": 1200})
+    connectors["mongo_connector"] = mongo
+    return KnowledgeSnapshot.create(connectors, llm_tools + [mongo.tool_spec()], rag_handler, ontology_file)
+
+
+def ask(app, snapshot, question):
+    session = app.session_store.get_or_create(None)
+    events = list(app.chat_turn_events(session, question, snapshot=snapshot))
+    return [event for event, _ in events]
+
+
+def test_ontology_answer_is_cached(app, snapshot):
+    snapshot = snapshot._replace(router=None)
+    assert "cache_hit" not in ask(app, snapshot, "Show the class hierarchy")
+    assert "cache_hit" in ask(app, snapshot, "Show the class hierarchy")
+
+
+def test_answer_using_database_tool_is_not_cached(app, snapshot):
+    snapshot = snapshot._replace(router=None)
+    assert "tool_end" in ask(app, snapshot, "What is the mileage of V1?")
+    assert app.answer_cache.stats()["entries"] == 0
+    assert "cache_hit" not in ask(app, snapshot, "What is the mileage of V1?")
+
+
+def test_answer_using_routed_database_tool_is_not_cached(app, snapshot):
+    ask(app, snapshot, "Show the service history of V1")
+    assert app.answer_cache.stats()["entries"] == 0
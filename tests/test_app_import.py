@@ -0,0 +1,19 @@
+# test_app_import.py
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_app_defers_heavy_modules():
+    # A fresh interpreter, since other tests have already imported the connectors
+    code = (
+        "import sys, app3; "
+        "print(','.join(m for m in ('rdflib', 'numpy', 'openai', 'connector_loader', 'langchain_community') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=os.environ.copy(),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
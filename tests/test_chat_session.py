@@ -0,0 +1,63 @@
+# test_chat_session.py
+
+from chat_session import ChatSession, SessionStore, tool_result_key
+
+
+def test_tool_result_key_ignores_argument_order():
+    assert tool_result_key("tool", '{"b": 1, "a": 2}') == tool_result_key("tool", '{ "a": 2, "b": 1 }')
+    assert tool_result_key("tool", "not json") == ("tool", "not json")
+
+
+def test_tool_results_are_reused_until_knowledge_changes():
+    session = ChatSession("s")
+    session.sync_knowledge(1)
+    session.store_tool_result("lookup", '{"a": 1}', "result")
+    assert session.get_tool_result("lookup", '{"a":1}') == "result"
+    session.sync_knowledge(1)
+    assert session.get_tool_result("lookup", '{"a": 1}') == "result"
+    session.sync_knowledge(2)
+    assert session.get_tool_result("lookup", '{"a": 1}') is None
+
+
+def test_errors_pages_and_continuations_are_not_stored():
+    session = ChatSession("s")
+    session.store_tool_result("lookup", "{}", "Error: timed out")
+    session.store_tool_result("query", "{}", '{"rows": [], "continuation_id": "abc"}')
+    session.store_tool_result("fetch_more_tool_results", "{}", "[]")
+    assert session.tool_results == {}
+
+
+def test_trim_history_cuts_at_user_messages():
+    session = ChatSession("s")
+    session.history = [
+        {"role": "user", "content": "q1"},
+        {"role": "assistant", "tool_calls": []},
+        {"role": "tool", "content": "r1"},
+        {"role": "assistant", "content": "a1"},
+        {"role": "user", "content": "q2"},
+        {"role": "assistant", "content": "a2"},
+    ]
+    session.trim_history(max_messages=4)
+    assert [m.get("content") for m in session.history] == ["q2", "a2"]
+
+
+def test_store_reuses_and_evicts_sessions():
+    store = SessionStore(max_sessions=2)
+    first = store.get_or_create(None)
+    assert store.get_or_create(first.session_id) is first
+    store.get_or_create("second")
+    store.get_or_create("third")
+    assert len(store) == 2
+    assert store.get_or_create(first.session_id) is not first
+
+
+def test_idle_session_expires(monkeypatch):
+    import chat_session
+
+    now = [1000.0]
+    monkeypatch.setattr(chat_session.time, "monotonic", lambda: now[0])
+    store = SessionStore(ttl_seconds=60)
+    session = store.get_or_create("s")
+    session.append({"role": "user", "content": "hello"})
+    now[0] += 61
+    assert store.get_or_create("s").history == []
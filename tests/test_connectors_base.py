@@ -0,0 +1,52 @@
+# test_connectors_base.py
+
+import asyncio
+
+import mongomock
+import pytest
+
+from connector_loader import RDFConnector
+from connectors.base import BaseConnector, query_concurrently
+from connectors.client_pool import ClientPool
+from connectors.mongo_connector import MongoConnector
+
+
+@pytest.fixture
+def rdf_connector(ontology_file):
+    with RDFConnector(backend="memory", file_path=ontology_file) as connector:
+        yield connector
+
+
+@pytest.fixture
+def mongo_connector():
+    connector = MongoConnector("mongodb://test", "vehicles", "service_logs",
+                               client_factory=mongomock.MongoClient, pool=ClientPool())
+    with connector:
+        connector.collection.insert_many([{"vehicle_id": f"V{i}"} for i in range(5)])
+        yield connector
+
+
+def test_query_concurrently_with_rdf_and_mongo(rdf_connector, mongo_connector):
+    results = asyncio.run(query_concurrently([
+        (rdf_connector, "SELECT ?car WHERE { ?car a dvt:Car } ORDER BY ?car", {"limit": 10}),
+        (mongo_connector, {}, {"limit": 3, "projection": {"_id": 0}}),
+        (rdf_connector, "SELECT ?s WHERE { ?s ?p ?o }", {"limit": 4}),
+    ]))
+    assert results[0] == [{"car": "dvt:car1"}, {"car": "dvt:car2"}]
+    assert results[1] == [{"vehicle_id": "V0"}, {"vehicle_id": "V1"}, {"vehicle_id": "V2"}]
+    assert len(results[2]) == 4
+
+
+def test_query_concurrently_returns_exceptions_in_order(rdf_connector):
+    results = asyncio.run(query_concurrently([
+        (BaseConnector(), "anything", {}),
+        (rdf_connector, "ASK { ?s a dvt:Car }", {}),
+    ]))
+    assert isinstance(results[0], NotImplementedError)
+    assert results[1] == [{"result": True}]
+
+
+def test_context_manager_releases_graph(ontology_file):
+    with RDFConnector(backend="memory", file_path=ontology_file) as connector:
+        assert connector.graph is not None
+    assert connector.graph is None
@@ -0,0 +1,107 @@
+# test_ingestion.py
+
+import time
+
+import pytest
+
+from connector_loader import load_connectors
+from ingestion import IngestionQueue, KnowledgeSnapshot, KnowledgeStore
+from knowledge_registry import KnowledgeRegistry
+
+OTHER_ONTOLOGY = """
+@prefix ex: <http://example.org/fleet/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+
+ex:Fleet a owl:Class ; rdfs:label "Fleet" ; rdfs:comment "A group of vehicles run by one operator." .
+ex:Depot a owl:Class ; rdfs:label "Depot" ; rdfs:comment "Where a fleet is parked and serviced." .
+ex:Operator a owl:Class ; rdfs:label "Operator" ; rdfs:comment "Company running a fleet." .
+"""
+
+
+def wait_for(job, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert job.finished, job.to_dict()
+    return job
+
+
+@pytest.fixture
+def registry(tmp_path, collection_name):
+    registry = KnowledgeRegistry(path=str(tmp_path / "knowledge_bases.json"))
+    registry.collection_name = lambda name: collection_name
+    return registry
+
+
+@pytest.fixture
+def other_ontology_file(tmp_path):
+    path = tmp_path / "other_ontology.ttl"
+    path.write_text(OTHER_ONTOLOGY, encoding="utf-8")
+    return str(path)
+
+
+def collection_ids(rag_handler):
+    return set(rag_handler.open_collection()[0].get(include=[])["ids"])
+
+
+def test_store_swap_rejects_older_version():
+    store = KnowledgeStore()
+    newer = KnowledgeSnapshot({}, [], None, version=2)
+    assert store.swap(newer) is not None
+    assert store.swap(KnowledgeSnapshot({}, [], None, version=1)) is None
+    assert store.current() is newer
+
+
+def test_job_publishes_snapshot(fake_embeddings, registry, ontology_file):
+    swaps = []
+    queue = IngestionQueue(registry, on_swap=lambda previous, snapshot: swaps.append(snapshot))
+    job = wait_for(queue.submit(ontology_file, knowledge_base="fleet"))
+
+    assert job.status == "succeeded"
+    assert all(job.stages[stage]["status"] == "done" for stage in ("parse", "index", "chunk", "embed"))
+    snapshot = registry.current("fleet")
+    assert swaps == [snapshot]
+    assert snapshot.version == job.version
+    assert snapshot.triple_count > 0
+    assert job.result["embedding_stats"]["chunks_embedded"] == len(snapshot.rag_handler.chunk_ids)
+
+
+def test_failed_job_keeps_live_snapshot(fake_embeddings, registry, ontology_file, tmp_path):
+    queue = IngestionQueue(registry)
+    wait_for(queue.submit(ontology_file, knowledge_base="fleet"))
+    live = registry.current("fleet")
+
+    broken = tmp_path / "broken.ttl"
+    broken.write_text("@prefix ex: <http://example.org/> . ex:a ex:b", encoding="utf-8")
+    job = wait_for(queue.submit(str(broken), knowledge_base="fleet"))
+    assert job.status == "failed"
+    assert registry.current("fleet") is live
+    # Text chunks embedded from the unparseable file are removed again
+    assert collection_ids(live.rag_handler) == set(live.rag_handler.chunk_ids)
+
+
+def test_superseded_job_deletes_its_chunks(fake_embeddings, registry, ontology_file, other_ontology_file):
+    queue = IngestionQueue(registry)
+    wait_for(queue.submit(ontology_file, knowledge_base="fleet"))
+    live = registry.current("fleet")
+    # A newer version is live by the time the next job finishes
+    registry.publish("fleet", live._replace(version=live.version + 100))
+
+    job = wait_for(queue.submit(other_ontology_file, knowledge_base="fleet"))
+    assert job.status == "superseded"
+    assert collection_ids(live.rag_handler) == set(live.rag_handler.chunk_ids)
+
+
+def test_retrieval_ignores_chunks_of_unpublished_build(fake_embeddings, ontology_file, other_ontology_file,
+                                                       collection_name):
+    _, _, live = load_connectors(ontology_file, collection_name=collection_name)
+    # A build of another ontology embeds into the same collection before it is published
+    _, _, building = load_connectors(other_ontology_file, collection_name=collection_name, defer_deletes=True)
+    assert not building.chunk_ids & live.chunk_ids
+    assert collection_ids(live) == live.chunk_ids | building.chunk_ids
+
+    for query in ("a group of vehicles run by one operator", "vehicle components"):
+        docs = live.query_text(query, k=10)
+        assert docs
+        assert {live.chunk_id(doc["page_content"]) for doc in docs} <= live.chunk_ids
@@ -0,0 +1,110 @@
+# test_knowledge_registry.py
+
+import pytest
+
+from connector_loader import load_connectors
+from ingestion import KnowledgeSnapshot
+from knowledge_registry import KnowledgeRegistry
+
+from conftest import DVT, SAMPLE_ONTOLOGY
+
+
+@pytest.fixture
+def registry_path(tmp_path):
+    return str(tmp_path / "knowledge_bases.json")
+
+
+@pytest.fixture
+def make_registry(registry_path, collection_name):
+    def make(**kwargs):
+        registry = KnowledgeRegistry(path=registry_path, **kwargs)
+        registry.collection_name = lambda name: f"{collection_name}_{name}"[:63]
+        return registry
+    return make
+
+
+@pytest.fixture
+def publish(fake_embeddings, collection_name):
+    def publish(registry, name, ontology_file, version=1):
+        connectors, llm_tools, rag_handler = load_connectors(ontology_file, collection_name=registry.collection_name(name))
+        snapshot = KnowledgeSnapshot.create(connectors, llm_tools, rag_handler, ontology_file, version)
+        assert registry.publish(name, snapshot) is not None
+        return snapshot
+    return publish
+
+
+def write_ontology(tmp_path, name, extra=""):
+    path = tmp_path / name
+    path.write_text(SAMPLE_ONTOLOGY + extra, encoding="utf-8")
+    return str(path)
+
+
+def class_count(snapshot):
+    rows = snapshot.rdf_connector.execute_query("SELECT (COUNT(?c) AS ?n) WHERE { ?c a owl:Class }")
+    return int(next(iter(rows))["n"])
+
+
+def test_unknown_base_is_empty(make_registry):
+    registry = make_registry()
+    assert not registry.get("missing").loaded
+    assert "missing" not in registry
+
+
+def test_published_base_reloads_lazily_in_a_new_registry(make_registry, publish, tmp_path):
+    ontology_file = write_ontology(tmp_path, "fleet.ttl")
+    publish(make_registry(), "fleet", ontology_file)
+
+    restarted = make_registry()
+    assert "fleet" in restarted
+    assert not restarted.current("fleet").loaded
+    snapshot = restarted.get("fleet")
+    assert snapshot.loaded and class_count(snapshot) == 5
+    assert restarted.get("fleet") is snapshot
+    assert restarted.loads == 1
+
+
+def test_least_recently_used_base_is_evicted_and_reloaded(make_registry, publish, tmp_path):
+    registry = make_registry(max_loaded=1)
+    publish(registry, "first", write_ontology(tmp_path, "first.ttl"))
+    publish(registry, "second", write_ontology(tmp_path, "second.ttl"))
+    assert not registry.current("first").loaded
+    assert registry.current("second").loaded
+    assert registry.evictions == 1
+
+    assert class_count(registry.get("first")) == 5
+    assert registry.loads == 1
+    assert not registry.current("second").loaded
+
+
+def test_triple_budget_evicts(make_registry, publish, tmp_path):
+    registry = make_registry(max_triples=1)
+    publish(registry, "first", write_ontology(tmp_path, "first.ttl"))
+    publish(registry, "second", write_ontology(tmp_path, "second.ttl"))
+    # The base just published is kept even though it alone exceeds the budget
+    assert [registry.current(name).loaded for name in ("first", "second")] == [False, True]
+
+
+def test_upload_in_another_process_evicts_stale_base(make_registry, publish, tmp_path):
+    ontology_file = write_ontology(tmp_path, "fleet.ttl")
+    worker = make_registry()
+    publish(worker, "fleet", ontology_file)
+    other_worker = make_registry()
+    assert class_count(other_worker.get("fleet")) == 5
+
+    # Same path, new content: only the content hash tells the other worker
+    write_ontology(tmp_path, "fleet.ttl", extra=f"<{DVT}Truck> a <http://www.w3.org/2002/07/owl#Class> .\n")
+    publish(worker, "fleet", ontology_file, version=2)
+    assert class_count(other_worker.get("fleet")) == 6
+    assert other_worker.loads == 2
+
+
+def test_attached_connector_survives_eviction(make_registry, publish, tmp_path):
+    registry = make_registry(max_loaded=1)
+    publish(registry, "first", write_ontology(tmp_path, "first.ttl"))
+    tool = {"type": "function", "function": {"name": "query_database", "parameters": {}}}
+    registry.attach_connector("first", "database", object(), tool)
+    publish(registry, "second", write_ontology(tmp_path, "second.ttl"))
+
+    snapshot = registry.get("first")
+    assert "database" in snapshot.connectors
+    assert [t["function"]["name"] for t in snapshot.llm_tools][-2:] == ["query_database", "fetch_more_tool_results"]
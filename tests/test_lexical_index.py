@@ -0,0 +1,83 @@
+# test_lexical_index.py
+
+import pytest
+from langchain_core.documents import Document
+
+from lexical_index import (
+    LexicalIndex, QueryEmbeddingCache, is_identifier_query, local_name, reciprocal_rank_fusion, tokenize,
+)
+
+EX = "http://example.org/fleet#"
+
+
+def test_tokenize_splits_camel_case():
+    assert tokenize("hasEngine HTTPServer v2") == ["hasengine", "has", "engine", "httpserver", "http", "server", "v2", "v", "2"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("dvt:hasComponent", True),
+    ("<http://example.org/fleet#Depot>", True),
+    ("serialNumber", True),
+    ("ServiceRecord", True),
+    ("what is a depot", False),
+    ("depot", False),
+])
+def test_identifier_queries(query, expected):
+    assert is_identifier_query(query) is expected
+
+
+def test_local_name():
+    assert local_name(EX + "Depot") == "Depot"
+    assert local_name("http://example.org/fleet/Depot/") == "Depot"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    assert reciprocal_rank_fusion([["a", "b"], ["c", "b"]]) == ["b", "a", "c"]
+
+
+@pytest.fixture
+def index():
+    documents = [
+        ("Fleet", "Fleet: a group of vehicles run by one operator."),
+        ("Depot", "Depot: where a fleet is parked and serviced."),
+        ("Operator", "Operator: company running vehicles."),
+        ("ServiceRecord", "ServiceRecord: maintenance performed on a vehicle at a depot."),
+    ]
+    index = LexicalIndex(compact=lambda iri: "ex:" + local_name(iri))
+    for name, text in documents:
+        index.add(Document(page_content=text, metadata={"subject": EX + name}))
+    return index.finish()
+
+
+def test_bm25_ranks_exact_terms_first(index):
+    ranked = [index.keys[i] for i, _ in index.search("where is the fleet parked")]
+    assert ranked[0] == EX + "Depot"
+    assert index.search("spaceship") == []
+
+
+def test_identifier_lookup(index):
+    for identifier in (EX + "ServiceRecord", f"<{EX}ServiceRecord>", "ex:ServiceRecord", "servicerecord", "other:ServiceRecord"):
+        assert [d.metadata["subject"] for d in index.lookup_identifier(identifier)] == [EX + "ServiceRecord"]
+    assert index.lookup_identifier("Truck") == []
+
+
+def test_empty_index_searches_nothing():
+    assert LexicalIndex().finish().search("fleet") == []
+
+
+def test_query_embedding_cache_reuses_vectors():
+    calls = []
+    cache = QueryEmbeddingCache(max_entries=2)
+
+    def embed(text):
+        calls.append(text)
+        return [float(len(text))]
+
+    assert cache.get_or_embed("model", "a", embed) == [1.0]
+    assert cache.get_or_embed("model", "a", embed) == [1.0]
+    # Another model embeds the same text separately
+    cache.get_or_embed("other", "a", embed)
+    cache.get_or_embed("model", "bb", embed)
+    assert calls == ["a", "a", "bb"]
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["hits"] == 1
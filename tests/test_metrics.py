@@ -0,0 +1,59 @@
+# test_metrics.py
+
+import contextvars
+import threading
+
+from metrics import Metrics
+
+
+def test_counters_render_with_escaped_labels():
+    metrics = Metrics(namespace="test")
+    metrics.describe("requests", "Requests handled.")
+    metrics.increment("requests", route="/chat")
+    metrics.increment("requests", 2, route="/chat")
+    metrics.increment("requests", route='say "hi"')
+    lines = metrics.render().splitlines()
+    assert "# HELP test_requests_total Requests handled." in lines
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{route="/chat"} 3' in lines
+    assert 'test_requests_total{route="say \\"hi\\""} 1' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(namespace="test", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        metrics.observe("query", seconds, backend="memory")
+    lines = metrics.render().splitlines()
+    assert 'test_query_seconds_bucket{backend="memory",le="0.1"} 1' in lines
+    assert 'test_query_seconds_bucket{backend="memory",le="1"} 2' in lines
+    assert 'test_query_seconds_bucket{backend="memory",le="+Inf"} 3' in lines
+    assert 'test_query_seconds_count{backend="memory"} 3' in lines
+    assert 'test_query_seconds_sum{backend="memory"} 5.55' in lines
+
+
+def test_collectors_report_at_render_time():
+    metrics = Metrics(namespace="test")
+    hits = [0]
+    metrics.register_collector(lambda: [("cache_hits", "counter", {}, hits[0]), ("cache_entries", "gauge", {}, 7)])
+    metrics.register_collector(lambda: 1 / 0)
+    hits[0] = 4
+    lines = metrics.render().splitlines()
+    assert "test_cache_hits_total 4" in lines
+    assert "# TYPE test_cache_entries gauge" in lines
+    assert "test_cache_entries 7" in lines
+
+
+def test_trace_collects_spans_from_other_threads():
+    metrics = Metrics(namespace="test")
+    with metrics.trace("chat") as trace:
+        with metrics.span("route"):
+            pass
+        # Worker threads join the trace when they run in a copy of the request's context
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(lambda: metrics.observe("tool", 0.25),))
+        worker.start()
+        worker.join()
+    assert {name for name, _ in trace.summary()} == {"route", "tool"}
+    assert 'test_chat_seconds_count 1' in metrics.render().splitlines()
+    # Outside a trace, spans are only counted
+    metrics.observe("tool", 0.1)
+    assert len(trace.spans) == 3
@@ -0,0 +1,63 @@
+# test_mongo_connector.py
+
+import mongomock
+import pytest
+
+from connectors.client_pool import ClientPool
+from connectors import mongo_connector
+from connectors.mongo_connector import MongoConnector
+
+
+@pytest.fixture
+def connector():
+    connector = MongoConnector("mongodb://test", "vehicles", "service_logs",
+                               client_factory=mongomock.MongoClient, pool=ClientPool())
+    connector.connect()
+    connector.collection.insert_many([
+        {"vehicle_id": "V1", "date": "2024-01-05", "mileage": 1200},
+        {"vehicle_id": "V1", "date": "2024-03-10", "mileage": 5400},
+        {"vehicle_id": "V2", "date": "2024-02-20", "mileage": 800},
+    ])
+    yield connector
+    connector.close()
+
+
+def test_filter(connector):
+    rows = list(connector.execute_query({"vehicle_id": "V1"}))
+    assert [row["date"] for row in rows] == ["2024-01-05", "2024-03-10"]
+
+
+def test_filter_as_json_text(connector):
+    rows = list(connector.execute_query('{"vehicle_id": "V2"}'))
+    assert [row["mileage"] for row in rows] == [800]
+
+
+def test_projection(connector):
+    rows = list(connector.execute_query({"vehicle_id": "V2"}, projection={"_id": 0, "date": 1}))
+    assert rows == [{"date": "2024-02-20"}]
+
+
+def test_limit_is_capped(connector, monkeypatch):
+    monkeypatch.setattr(mongo_connector, "MONGO_MAX_ROWS", 2)
+    assert len(list(connector.execute_query({}))) == 2
+    assert len(list(connector.execute_query({}, limit=50))) == 2
+    assert len(list(connector.execute_query({}, limit=1))) == 1
+
+
+def test_sort(connector):
+    rows = list(connector.execute_query({}, projection={"_id": 0, "mileage": 1}, sort={"mileage": -1}))
+    assert [row["mileage"] for row in rows] == [5400, 1200, 800]
+
+
+@pytest.mark.parametrize("query", [
+    {"$where": "this.mileage > 1000"},
+    {"$or": [{"vehicle_id": "V1"}, {"$expr": {"$function": {"body": "", "args": [], "lang": "js"}}}]},
+])
+def test_rejects_server_side_javascript(connector, query):
+    with pytest.raises(ValueError):
+        connector.execute_query(query)
+
+
+def test_results_are_json_serialisable(connector):
+    rows = list(connector.execute_query({"vehicle_id": "V2"}))
+    assert isinstance(rows[0]["_id"], str)
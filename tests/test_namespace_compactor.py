@@ -0,0 +1,65 @@
+# test_namespace_compactor.py
+
+import pytest
+from rdflib import BNode, Literal, URIRef
+
+from connector_loader import RDFConnector
+from namespace_compactor import NamespaceCompactor
+
+from conftest import DVT
+
+
+@pytest.fixture
+def compactor():
+    return NamespaceCompactor([
+        ("ex", "http://example.org/"),
+        ("exv", "http://example.org/vocab#"),
+        ("urn", "urn:example:"),
+    ])
+
+
+@pytest.mark.parametrize("iri, compacted", [
+    ("http://example.org/thing", "ex:thing"),
+    # The longest registered namespace wins
+    ("http://example.org/vocab#Thing", "exv:Thing"),
+    ("urn:example:item", "urn:item"),
+    ("http://other.org/thing", "http://other.org/thing"),
+])
+def test_compacts_with_longest_namespace(compactor, iri, compacted):
+    assert compactor.compact_iri(iri) == compacted
+    # Memoised lookups return the same result
+    assert compactor.compact_iri(iri) == compacted
+
+
+def test_compact_leaves_other_terms_alone(compactor):
+    assert compactor.compact(URIRef("http://example.org/a")) == "ex:a"
+    assert compactor.compact(Literal("http://example.org/a")) == "http://example.org/a"
+    assert compactor.compact(BNode("b1")) == "b1"
+
+
+def test_first_prefix_for_a_namespace_wins(compactor):
+    compactor.add("other", "http://example.org/")
+    assert compactor.compact_iri("http://example.org/thing") == "ex:thing"
+
+
+def test_added_namespace_clears_memo(compactor):
+    assert compactor.compact_iri("http://other.org/thing") == "http://other.org/thing"
+    compactor.add("other", "http://other.org/")
+    assert compactor.compact_iri("http://other.org/thing") == "other:thing"
+
+
+def test_memo_stays_bounded():
+    compactor = NamespaceCompactor([("ex", "http://example.org/")], memo_size=10)
+    for i in range(25):
+        compactor.compact_iri(f"http://example.org/item{i}")
+    assert len(compactor._memo) <= 10
+
+
+def test_connector_round_trips_every_iri(ontology_file):
+    connector = RDFConnector(backend="memory")
+    assert connector.connect(ontology_file, build_index=False)
+    iris = {term for triple in connector.graph for term in triple if isinstance(term, URIRef)}
+    assert URIRef(DVT + "Car") in iris
+    for iri in iris:
+        assert connector.resolve_term(connector.compact_term(iri)) == iri
+    assert connector.compact_term(URIRef(DVT + "Car")) == "dvt:Car"
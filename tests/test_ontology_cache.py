@@ -0,0 +1,74 @@
+# test_ontology_cache.py
+
+import os
+
+import pytest
+from rdflib import Graph
+
+from ontology_cache import OntologySnapshotCache, file_content_hash
+
+from conftest import SAMPLE_ONTOLOGY
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OntologySnapshotCache(cache_dir=str(tmp_path / "cache"))
+
+
+def test_second_load_restores_snapshot(cache, ontology_file):
+    parsed, content_hash = cache.load_graph(ontology_file)
+    restored, same_hash = cache.load_graph(ontology_file)
+    assert same_hash == content_hash == file_content_hash(ontology_file)
+    assert set(restored) == set(parsed)
+    assert dict(restored.namespaces())["dvt"] == dict(parsed.namespaces())["dvt"]
+    stats = cache.stats()
+    assert (stats["parse_count"], stats["snapshot_load_count"]) == (1, 1)
+    assert stats["last_load"]["source"] == "snapshot"
+
+
+def test_changed_content_is_parsed_again(cache, ontology_file):
+    _, first_hash = cache.load_graph(ontology_file)
+    with open(ontology_file, "a", encoding="utf-8") as f:
+        f.write("dvt:car3 a dvt:Car .\n")
+    graph, second_hash = cache.load_graph(ontology_file)
+    assert second_hash != first_hash
+    assert cache.stats()["parse_count"] == 2
+    assert len(graph) == len(Graph().parse(data=SAMPLE_ONTOLOGY, format="turtle")) + 1
+
+
+def test_corrupt_snapshot_is_discarded(cache, ontology_file):
+    _, content_hash = cache.load_graph(ontology_file)
+    with open(cache._snapshot_path(content_hash), "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.load(content_hash) is None
+    assert not os.path.exists(cache._snapshot_path(content_hash))
+    graph, _ = cache.load_graph(ontology_file)
+    assert len(graph) > 0
+
+
+def test_size_cap_evicts_oldest_snapshot(tmp_path):
+    cache = OntologySnapshotCache(cache_dir=str(tmp_path / "cache"), max_bytes=1)
+    hashes = []
+    for index in range(2):
+        path = tmp_path / f"ontology{index}.ttl"
+        path.write_text(SAMPLE_ONTOLOGY + f"dvt:extra{index} a dvt:Car .\n", encoding="utf-8")
+        hashes.append(cache.load_graph(str(path))[1])
+    # The snapshot just written is kept even though it alone exceeds the cap
+    assert cache.load(hashes[0]) is None
+    assert cache.load(hashes[1]) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_mapped_graph_is_built_once(cache, ontology_file):
+    first, content_hash = cache.load_mapped_graph(ontology_file)
+    second, _ = cache.load_mapped_graph(ontology_file)
+    try:
+        assert set(second) == set(first)
+        stats = cache.stats()
+        assert stats["mmap_open_count"] == 2
+        assert stats["parse_count"] == 1
+    finally:
+        first.close()
+        second.close()
+    cache.invalidate(content_hash)
+    assert os.listdir(cache.cache_dir) == []
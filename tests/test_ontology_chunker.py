@@ -0,0 +1,51 @@
+# test_ontology_chunker.py
+
+import pytest
+from rdflib import Graph, Namespace, URIRef
+
+from ontology_chunker import iter_subject_documents, subject_document
+
+from conftest import DVT, SAMPLE_ONTOLOGY
+
+D = Namespace(DVT)
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    graph.parse(data=SAMPLE_ONTOLOGY, format="turtle")
+    return graph
+
+
+def test_one_document_per_named_subject(graph):
+    documents = list(iter_subject_documents(graph, source="sample.ttl"))
+    subjects = {document.metadata["subject"] for document in documents}
+    # Blank nodes are inlined, never chunked on their own
+    assert subjects == {str(s) for s in graph.subjects(unique=True) if isinstance(s, URIRef)}
+    assert len(documents) == len(subjects)
+    assert str(D.Car) in subjects and str(D.EngineShape) in subjects
+    assert all(document.metadata["source"] == "sample.ttl" for document in documents)
+
+
+def test_class_document_fields(graph):
+    document = subject_document(graph, D.Car)
+    assert document.page_content.splitlines() == [
+        "dvt:Car",
+        "type: owl:Class",
+        "label: Car",
+        "subClassOf: dvt:Vehicle",
+    ]
+    assert document.metadata["kind"] == "class"
+
+
+def test_property_and_instance_kinds(graph):
+    assert subject_document(graph, D.hasComponent).metadata["kind"] == "property"
+    instance = subject_document(graph, D.car1)
+    assert instance.metadata["kind"] == "resource"
+    assert "dvt:hasComponent: dvt:engine1" in instance.page_content.splitlines()
+
+
+def test_shape_inlines_blank_node_constraints(graph):
+    document = subject_document(graph, D.EngineShape)
+    assert document.metadata["kind"] == "shape"
+    assert "sh:property: [sh:datatype xsd:decimal; sh:path dvt:displacement]" in document.page_content.splitlines()
@@ -0,0 +1,88 @@
+# test_ontology_index.py
+
+import pytest
+from rdflib import BNode, Graph, Namespace
+from rdflib.namespace import OWL, RDF, RDFS, SH, XSD
+
+from ontology_index import SchemaIndex
+
+from conftest import DVT, SAMPLE_ONTOLOGY
+
+D = Namespace(DVT)
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    graph.parse(data=SAMPLE_ONTOLOGY, format="turtle")
+    return graph
+
+
+@pytest.fixture
+def index(graph):
+    return SchemaIndex(graph)
+
+
+def test_class_hierarchy(index):
+    assert index.get_subclasses(D.Product) == {D.Vehicle, D.Component}
+    assert index.get_subclasses(D.Product, transitive=True) == {D.Vehicle, D.Car, D.Component, D.Engine}
+    assert index.get_superclasses(D.Car, transitive=True) == {D.Vehicle, D.Product}
+
+
+def test_properties_include_shapes_and_inherited_domains(index):
+    assert index.properties_of(D.Engine) == {D.displacement: {XSD.decimal}}
+    assert index.properties_of(D.Engine, inherited=True) == {
+        D.displacement: {XSD.decimal}, D.serialNumber: {XSD.string}
+    }
+    assert index.properties_of(D.Car, inherited=True) == {
+        D.hasComponent: {D.Component}, D.serialNumber: {XSD.string}
+    }
+
+
+def test_domain_range_combines_rdfs_and_shacl(index):
+    assert index.domain_range(D.hasComponent) == {"domain": {D.Vehicle}, "range": {D.Component}}
+    assert index.domain_range(D.displacement) == {"domain": {D.Engine}, "range": {XSD.decimal}}
+
+
+def test_labels(index):
+    assert index.find_by_label("  has Component ") == {D.hasComponent}
+    assert index.labels_of(D.Car) == {"Car"}
+    assert index.shapes_for(D.Engine) == {D.EngineShape}
+
+
+def assert_same_index(index, graph):
+    rebuilt = SchemaIndex(graph)
+    for cls in rebuilt.classes | index.classes:
+        assert index.get_superclasses(cls, transitive=True) == rebuilt.get_superclasses(cls, transitive=True)
+        assert index.get_subclasses(cls, transitive=True) == rebuilt.get_subclasses(cls, transitive=True)
+        assert index.properties_of(cls, inherited=True) == rebuilt.properties_of(cls, inherited=True)
+    assert index.domain_range(D.weight) == rebuilt.domain_range(D.weight)
+
+
+def test_incremental_changes_match_a_rebuild(index, graph):
+    # Warm the closure caches so the update has to invalidate them
+    index.get_subclasses(D.Product, transitive=True)
+    index.get_superclasses(D.Car, transitive=True)
+
+    constraint = BNode()
+    added = [
+        (D.Truck, RDF.type, OWL.Class),
+        (D.Truck, RDFS.subClassOf, D.Vehicle),
+        (D.Vehicle, RDFS.subClassOf, D.Asset),
+        (D.EngineShape, SH.property, constraint),
+        (constraint, SH.path, D.weight),
+        (constraint, SH.datatype, XSD.decimal),
+    ]
+    for triple in added:
+        graph.add(triple)
+    index.apply_changes(added=added)
+    assert_same_index(index, graph)
+    assert D.Truck in index.get_subclasses(D.Product, transitive=True)
+    assert D.Asset in index.get_superclasses(D.Car, transitive=True)
+
+    removed = [(D.Vehicle, RDFS.subClassOf, D.Product), (constraint, SH.path, D.weight)]
+    for triple in removed:
+        graph.remove(triple)
+    index.apply_changes(removed=removed)
+    assert_same_index(index, graph)
+    assert D.Car not in index.get_subclasses(D.Product, transitive=True)
@@ -0,0 +1,87 @@
+# test_prepared_queries.py
+
+import pytest
+
+from connector_loader import RDFConnector
+from prepared_queries import PreparedQueryRegistry, QUERY_TEMPLATES
+
+
+def test_registry_reuses_prepared_query():
+    registry = PreparedQueryRegistry()
+    first = registry.get("SELECT ?s WHERE { ?s ?p ?o }")
+    assert registry.get("SELECT ?s WHERE { ?s ?p ?o }") is first
+    assert registry.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_registry_evicts_least_recently_used():
+    registry = PreparedQueryRegistry(max_entries=2)
+    for variable in ("a", "b", "c"):
+        registry.get(f"SELECT ?{variable} WHERE {{ ?{variable} ?p ?o }}")
+    assert registry.stats()["entries"] == 2
+    registry.get("SELECT ?a WHERE { ?a ?p ?o }")
+    assert registry.stats()["misses"] == 4
+
+
+def test_registry_raises_on_invalid_query():
+    with pytest.raises(Exception):
+        PreparedQueryRegistry().get("SELEKT nothing")
+
+
+@pytest.fixture
+def connector(ontology_file):
+    connector = RDFConnector(backend="memory")
+    assert connector.connect(ontology_file, build_index=False)
+    return connector
+
+
+def test_execute_template_binds_variables(connector):
+    rows = connector.execute_template("subclasses", **{"class": "dvt:Product"})
+    assert sorted(row["subclass"] for row in rows) == ["dvt:Component", "dvt:Vehicle"]
+
+
+def test_execute_template_uses_result_cache(connector):
+    connector.execute_template("property_domain_range", property="dvt:hasComponent")
+    rows = connector.execute_template("property_domain_range", property="dvt:hasComponent")
+    assert rows == [{"domain": "dvt:Vehicle", "range": "dvt:Component"}]
+    assert connector.query_cache.stats()["hits"] == 1
+
+
+def test_execute_template_requires_bindings(connector):
+    assert connector.execute_template("subclasses") == []
+    assert connector.execute_template("no_such_template") == []
+
+
+@pytest.mark.parametrize("operation, term", [
+    ("list_classes", None),
+    ("subclasses", "dvt:Product"),
+    ("properties_of_class", "dvt:Engine"),
+    ("properties_of_class", "dvt:Vehicle"),
+    ("domain_range", "dvt:serialNumber"),
+])
+def test_schema_lookup_templates_match_index(connector, operation, term):
+    from_templates = connector.schema_lookup(operation, term)
+    connector.build_schema_index()
+    assert from_templates == connector.schema_lookup(operation, term)
+
+
+def test_schema_lookup_without_index_rejects_transitive(connector):
+    assert connector.schema_lookup("subclasses", "dvt:Product", transitive=True).startswith("Error")
+
+
+def test_templates_declare_their_bindings():
+    for template in QUERY_TEMPLATES.values():
+        for variable in template["bindings"]:
+            assert f"?{variable}" in template["query"]
+
+
+def test_registry_parses_safely_on_concurrent_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    registry = PreparedQueryRegistry(max_entries=1000)
+    queries = [
+        f"SELECT ?c WHERE {{ ?c a owl:Class }} ORDER BY ?c LIMIT {i}" if i % 2 else f"SELECT ?s WHERE {{ ?s ?p ?o }} LIMIT {i}"
+        for i in range(400)
+    ]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        prepared = list(pool.map(lambda query: registry.get(query, {"owl": "http://www.w3.org/2002/07/owl#"}), queries))
+    assert len(prepared) == len(queries)
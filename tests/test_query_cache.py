@@ -0,0 +1,76 @@
+# test_query_cache.py
+
+import pytest
+
+from query_cache import QueryResultCache, estimate_size, normalize_query
+
+KNOWN = {"rdfs": "http://www.w3.org/2000/01/rdf-schema#"}
+
+
+@pytest.mark.parametrize("variant", [
+    "SELECT ?s WHERE { ?s rdfs:label ?l }",
+    "SELECT ?s\nWHERE {\n  ?s rdfs:label ?l   # the label\n}",
+    "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\nSELECT ?s WHERE { ?s rdfs:label ?l }",
+])
+def test_equivalent_queries_normalise_alike(variant):
+    assert normalize_query(variant, KNOWN) == normalize_query("SELECT ?s WHERE { ?s rdfs:label ?l }", KNOWN)
+
+
+def test_literals_iris_and_comments_in_strings_are_kept():
+    query = 'SELECT ?s WHERE { ?s rdfs:label "a  #b" . ?s ?p <http://example.org/a#b> }'
+    normalised = normalize_query(query, KNOWN)
+    assert '"a  #b"' in normalised
+    assert "<http://example.org/a#b>" in normalised
+
+
+def test_prefix_declarations_are_sorted_and_unknown_ones_kept():
+    first = normalize_query("PREFIX b: <http://b/> PREFIX a: <http://a/> SELECT * WHERE { ?s a:p b:o }")
+    second = normalize_query("PREFIX a: <http://a/>\nPREFIX b: <http://b/>\nSELECT * WHERE { ?s a:p b:o }")
+    assert first == second
+    assert first.startswith("PREFIX a:<http://a/> PREFIX b:<http://b/>")
+    # A prefix bound to a different namespace changes the query
+    assert normalize_query("PREFIX rdfs: <http://other/> SELECT ?s WHERE { ?s rdfs:label ?l }", KNOWN) != \
+        normalize_query("SELECT ?s WHERE { ?s rdfs:label ?l }", KNOWN)
+
+
+def test_different_queries_normalise_apart():
+    assert normalize_query("SELECT ?s WHERE { ?s ?p 'a b' }") != normalize_query("SELECT ?s WHERE { ?s ?p 'a  b' }")
+
+
+def test_cache_hit_and_miss():
+    cache = QueryResultCache()
+    assert cache.get("q") is None
+    cache.put("q", [{"s": "a"}])
+    assert cache.get("q") == [{"s": "a"}]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_expired_entries_miss(monkeypatch):
+    import query_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryResultCache(ttl_seconds=10)
+    cache.put("q", ["row"])
+    now[0] += 11
+    assert cache.get("q") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    value = ["x" * 100]
+    cache = QueryResultCache(max_bytes=estimate_size(value) * 2)
+    cache.put("a", value)
+    cache.put("b", value)
+    cache.get("a")
+    cache.put("c", value)
+    assert cache.get("b") is None
+    assert cache.get("a") == value and cache.get("c") == value
+    assert cache.stats()["evictions"] == 1
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = QueryResultCache(max_bytes=100)
+    cache.put("q", ["x" * 1000])
+    assert cache.get("q") is None
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,97 @@
+# test_rdf_connector.py
+
+import pytest
+
+from connector_loader import RDFConnector
+from sparql_guard import QueryGuard
+
+ALL_TRIPLES = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+
+@pytest.fixture
+def connector(ontology_file):
+    connector = RDFConnector(backend="memory")
+    assert connector.connect(ontology_file)
+    # A small default LIMIT, so the guard caps ALL_TRIPLES
+    connector.query_guard = QueryGuard(connector.graph, compact=connector.compact_term, default_limit=5)
+    yield connector
+    connector.close()
+
+
+def test_iter_query_appends_limit_hint(connector):
+    rows = list(connector.iter_query(ALL_TRIPLES))
+    assert len(rows) == 6
+    assert rows[-1]["query_guard"]["reason"] == "limit_injected"
+
+
+def test_cached_iter_query_keeps_limit_hint(connector):
+    first = list(connector.iter_query(ALL_TRIPLES))
+    assert list(connector.iter_query(ALL_TRIPLES)) == first
+    assert connector.query_cache.stats()["hits"] == 1
+
+
+def test_execute_query_after_iter_query_returns_only_data_rows(connector):
+    list(connector.iter_query(ALL_TRIPLES))
+    rows = list(connector.execute_query(ALL_TRIPLES))
+    assert len(rows) == 5
+    assert all("query_guard" not in row for row in rows)
+
+
+def test_iter_query_after_execute_query_keeps_limit_hint(connector):
+    list(connector.execute_query(ALL_TRIPLES))
+    rows = list(connector.iter_query(ALL_TRIPLES))
+    assert rows[-1]["query_guard"]["reason"] == "limit_injected"
+
+
+def test_columnar_and_row_results_are_cached_apart(connector):
+    rows = list(connector.execute_query(ALL_TRIPLES))
+    columnar = connector.execute_query(ALL_TRIPLES, columnar=True)
+    assert columnar["variables"] == ["s", "p", "o"]
+    assert len(columnar["rows"]) == len(rows)
+
+
+def test_normalised_query_text_shares_cache_entry(connector):
+    list(connector.execute_query("SELECT ?c WHERE { ?c a owl:Class }"))
+    list(connector.execute_query("""
+        PREFIX owl: <http://www.w3.org/2002/07/owl#>
+        SELECT ?c   WHERE {
+            ?c a owl:Class   # every class
+        }
+    """))
+    assert connector.query_cache.stats()["hits"] == 1
+
+
+def test_graph_change_invalidates_cache(connector):
+    from rdflib import URIRef
+    from rdflib.namespace import RDF, OWL
+
+    query = "SELECT ?c WHERE { ?c a owl:Class } LIMIT 100"
+    before = len(list(connector.execute_query(query)))
+    connector.add_triples([(URIRef("https://example.org/Truck"), RDF.type, OWL.Class)])
+    assert len(list(connector.execute_query(query))) == before + 1
+
+
+def test_execute_query_is_lazy_and_limited(connector):
+    rows = connector.execute_query(ALL_TRIPLES, limit=2)
+    assert not isinstance(rows, list)
+    assert len(list(rows)) == 2
+
+
+def test_execute_query_returns_no_rows_for_invalid_query(connector):
+    assert list(connector.execute_query("SELEKT nothing")) == []
+
+
+def test_columnar_limit(connector):
+    assert len(connector.execute_query(ALL_TRIPLES, limit=3, columnar=True)["rows"]) == 3
+
+
+def test_iter_query_reports_invalid_query(connector):
+    rows = list(connector.iter_query("SELECT ?s WHERE { ?s a unknown:Thing }"))
+    assert len(rows) == 1
+    assert rows[0]["error"].startswith("Invalid SPARQL query")
+    assert rows[0]["query_guard"]["reason"] == "invalid_query"
+
+
+def test_iter_query_reports_rejected_query(connector):
+    rows = list(connector.iter_query("SELECT * WHERE { SERVICE <http://example.org/sparql> { ?s ?p ?o } }"))
+    assert [row["query_guard"]["reason"] for row in rows] == ["service_not_allowed"]
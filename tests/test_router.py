@@ -0,0 +1,102 @@
+# test_router.py
+
+import pytest
+
+from connector_loader import RDFConnector
+from router import KeywordAutomaton, QuestionRouter, Route, ontology_routes
+
+
+def matches(automaton, text):
+    return sorted((text[start:end].lower(), value) for start, end, value in automaton.search(text))
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton([(word, word) for word in ("he", "she", "his", "hers", "she sells")])
+    assert matches(automaton, "she sells hers") == [("hers", "hers"), ("she", "she"), ("she sells", "she sells")]
+
+
+def test_automaton_matches_whole_words_case_insensitively():
+    automaton = KeywordAutomaton([("all classes", 1), ("class", 2)])
+    assert matches(automaton, "List ALL Classes, please") == [("all classes", 1)]
+    assert matches(automaton, "subclass classy class.") == [("class", 2)]
+
+
+def test_automaton_matches_against_suffix_links():
+    automaton = KeywordAutomaton([("abcd", 1), ("bc", 2)])
+    assert matches(automaton, "x abc y") == []
+    assert matches(automaton, "a bc") == [("bc", 2)]
+
+
+@pytest.fixture(scope="module")
+def rdf_connector(tmp_path_factory):
+    from conftest import SAMPLE_ONTOLOGY
+
+    path = tmp_path_factory.mktemp("router") / "sample.ttl"
+    path.write_text(SAMPLE_ONTOLOGY, encoding="utf-8")
+    connector = RDFConnector(backend="memory")
+    assert connector.connect(str(path))
+    yield connector
+    connector.close()
+
+
+@pytest.fixture
+def router(rdf_connector):
+    return QuestionRouter(ontology_routes(rdf_connector, rag_available=True))
+
+
+def calls(router, question, **kwargs):
+    return [(route.name, args) for route, args in router.route(question, **kwargs)]
+
+
+def test_routes_schema_questions_by_keyword(router):
+    assert calls(router, "Which classes are there?") == [("list_classes", {"operation": "list_classes"})]
+    assert calls(router, "What are the subclasses of dvt:Product?") == [
+        ("subclasses", {"operation": "subclasses", "term": "dvt:Product"})
+    ]
+
+
+def test_resolves_plain_terms_through_labels(router):
+    assert calls(router, "What are the properties of the vehicle?") == [
+        ("properties_of_class", {"operation": "properties_of_class", "term": "dvt:Vehicle"})
+    ]
+
+
+def test_unresolvable_term_is_not_routed(router):
+    assert calls(router, "List the subclasses of spaceships", use_embeddings=False) == []
+    assert router.stats()["unrouted"] == 1
+
+
+def test_generic_route_only_without_specific_match(router):
+    assert [name for name, _ in calls(router, "What is a car?")] == ["ontology_rag"]
+    assert [name for name, _ in calls(router, "What is the range of dvt:hasComponent?")] == ["domain_range"]
+
+
+def test_max_routes(rdf_connector):
+    router = QuestionRouter(ontology_routes(rdf_connector), max_routes=1)
+    assert len(router.route("subclasses of dvt:Product and superclasses of dvt:Car")) == 1
+
+
+class KeywordEmbeddings:
+    """
+    Embeds texts as counts of a few marker words, so similarity is predictable.
+    """
+
+    WORDS = ("mileage", "service", "definition")
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(text.lower().count(word)) for word in self.WORDS]
+
+
+def test_embedding_fallback_picks_similar_description():
+    router = QuestionRouter([
+        Route("mileage", "query_mongodb", description="Vehicle mileage readings",
+              build_args=lambda question, tail: {"filter": {}}),
+        Route("service", "query_mongodb", description="Service history of a vehicle",
+              build_args=lambda question, tail: {"filter": {"type": "service"}}),
+    ], embeddings_model=KeywordEmbeddings(), threshold=0.9)
+    assert calls(router, "How high is the mileage?") == [("mileage", {"filter": {}})]
+    assert calls(router, "Tell me a joke") == []
+    assert router.stats()["embedding_routed"] == 1
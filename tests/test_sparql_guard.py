@@ -0,0 +1,140 @@
+# test_sparql_guard.py
+
+import pytest
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDF, RDFS
+from rdflib.plugins.sparql import prepareQuery
+
+from sparql_guard import QueryGuard
+
+EX = "http://example.org/"
+INIT_NS = {"ex": URIRef(EX), "rdf": RDF, "rdfs": RDFS}
+
+
+@pytest.fixture(scope="module")
+def graph():
+    graph = Graph()
+    for i in range(50):
+        item = URIRef(f"{EX}item{i}")
+        graph.add((item, RDF.type, URIRef(EX + "Item")))
+        graph.add((item, RDFS.label, URIRef(f"{EX}label{i}")))
+    return graph
+
+
+@pytest.fixture
+def guard(graph):
+    return QueryGuard(graph, default_limit=10, max_limit=20)
+
+
+def plan(guard, text):
+    return guard.plan(prepareQuery(text, initNs=INIT_NS))
+
+
+def rows(guard, text):
+    return list(guard.evaluate(plan(guard, text)))
+
+
+def test_injects_default_limit(guard):
+    query_plan = plan(guard, "SELECT ?s WHERE { ?s a ex:Item }")
+    assert (query_plan.limit, query_plan.limit_source) == (10, "injected")
+    assert len(rows(guard, "SELECT ?s WHERE { ?s a ex:Item }")) == 10
+
+
+def test_keeps_limit_within_maximum(guard):
+    query_plan = plan(guard, "SELECT ?s WHERE { ?s a ex:Item } LIMIT 15")
+    assert (query_plan.limit, query_plan.limit_source) == (15, "query")
+    assert len(list(guard.evaluate(query_plan))) == 15
+
+
+def test_clamps_limit_above_maximum(guard):
+    query_plan = plan(guard, "SELECT ?s WHERE { ?s a ex:Item } LIMIT 40")
+    assert (query_plan.limit, query_plan.limit_source) == (20, "clamped")
+    assert len(list(guard.evaluate(query_plan))) == 20
+
+
+def test_offset_without_limit_gets_default_limit(guard):
+    query_plan = plan(guard, "SELECT ?s WHERE { ?s a ex:Item } ORDER BY ?s OFFSET 5")
+    assert (query_plan.limit, query_plan.limit_source) == (10, "injected")
+    result = [str(row[0]) for row in guard.evaluate(query_plan)]
+    assert result == sorted(f"{EX}item{i}" for i in range(50))[5:15]
+
+
+def test_offset_and_limit_above_maximum_keep_offset(guard):
+    result = rows(guard, "SELECT ?s WHERE { ?s a ex:Item } ORDER BY ?s OFFSET 45 LIMIT 40")
+    assert len(result) == 5
+
+
+def test_ask_has_no_limit(guard):
+    query_plan = plan(guard, "ASK { ?s a ex:Item }")
+    assert query_plan.limit is None
+    assert list(guard.evaluate(query_plan)) == [(True,)]
+
+
+def test_limit_hint_when_injected_limit_is_reached(guard):
+    query_plan = plan(guard, "SELECT ?s WHERE { ?s a ex:Item }")
+    assert guard.limit_hint(query_plan, 10)["reason"] == "limit_injected"
+    assert guard.limit_hint(query_plan, 9) is None
+    assert guard.limit_hint(plan(guard, "SELECT ?s WHERE { ?s a ex:Item } LIMIT 10"), 10) is None
+
+
+def test_no_limit_hint_for_graph_results(guard):
+    query_plan = plan(guard, "CONSTRUCT { ?s ?p ?o } WHERE { ?s ?p ?o }")
+    assert query_plan.limit_source == "injected"
+    triples = list(guard.evaluate(query_plan))
+    assert len(triples) == 10
+    assert guard.limit_hint(query_plan, len(triples)) is None
+
+
+def test_rejects_cartesian_product(graph):
+    from sparql_guard import QueryRejected
+
+    guard = QueryGuard(graph, max_estimated_rows=1000)
+    with pytest.raises(QueryRejected) as rejected:
+        plan(guard, "SELECT ?a ?b WHERE { ?a a ex:Item . ?b a ex:Item }")
+    assert rejected.value.hint["reason"] == "cartesian_product"
+    assert rejected.value.hint["estimated_rows"] == 2500
+    # The same patterns joined through a variable stay within the estimate
+    assert plan(guard, "SELECT ?a ?l WHERE { ?a a ex:Item . ?a rdfs:label ?l }").estimated_rows <= 1000
+
+
+def test_rejects_service(guard):
+    from sparql_guard import QueryRejected
+
+    with pytest.raises(QueryRejected) as rejected:
+        plan(guard, "SELECT * WHERE { SERVICE <http://example.org/sparql> { ?s ?p ?o } }")
+    assert rejected.value.hint["reason"] == "service_not_allowed"
+
+
+def test_timeout_stops_evaluation(guard):
+    evaluation = guard.evaluate(plan(guard, "SELECT ?s WHERE { ?s a ex:Item }"), timeout=0)
+    assert list(evaluation) == []
+    assert evaluation.stopped["reason"] == "timeout"
+    assert evaluation.stopped["rows_returned"] == 0
+
+
+def test_timeout_counts_only_evaluation_time(guard):
+    import time
+
+    evaluation = guard.evaluate(plan(guard, "SELECT ?s WHERE { ?s a ex:Item }"), timeout=0.5)
+    rows = iter(evaluation)
+    next(rows)
+    # A pause between result pages does not use up the deadline
+    time.sleep(0.6)
+    assert len(list(rows)) == 9
+    assert evaluation.stopped is None
+
+
+def test_cancel_stops_evaluation(guard):
+    evaluation = guard.evaluate(plan(guard, "SELECT ?s WHERE { ?s a ex:Item }"))
+    rows = iter(evaluation)
+    next(rows)
+    evaluation.cancel()
+    assert list(rows) == []
+    assert evaluation.stopped["reason"] == "cancelled"
+    assert evaluation.stopped["rows_returned"] == 1
+
+
+def test_row_budget_stops_evaluation(guard):
+    evaluation = guard.evaluate(plan(guard, "SELECT ?s WHERE { ?s a ex:Item }"), max_rows=3)
+    assert len(list(evaluation)) == 3
+    assert evaluation.stopped["reason"] == "row_budget"
@@ -0,0 +1,68 @@
+# test_tool_executor.py
+
+import threading
+import time
+
+import pytest
+
+from tool_executor import ToolCallExecutor, stop_when_set
+
+
+def message(call_id, tool_name, content):
+    return {"role": "tool", "tool_call_id": call_id, "name": tool_name, "content": content}
+
+
+@pytest.fixture
+def executor():
+    return ToolCallExecutor(max_workers=4, default_timeout=5, timeouts={"slow": 0.2})
+
+
+def test_outcomes_arrive_in_completion_order(executor):
+    delays = {"a": 0.3, "b": 0.0, "c": 0.15}
+
+    def execute(call_id, tool_name, tool_args, cancel_event):
+        time.sleep(delays[call_id])
+        return message(call_id, tool_name, call_id)
+
+    outcomes = list(executor.iter_run([(call_id, "tool", {}) for call_id in "abc"], execute))
+    assert [outcome["id"] for outcome in outcomes] == ["b", "c", "a"]
+    assert [outcome["index"] for outcome in outcomes] == [1, 2, 0]
+    assert all(outcome["status"] == "ok" for outcome in outcomes)
+    assert outcomes[0]["message"]["content"] == "b"
+
+
+def test_timed_out_call_is_cancelled(executor):
+    cancelled = threading.Event()
+
+    def execute(call_id, tool_name, tool_args, cancel_event):
+        if tool_name == "slow":
+            if cancel_event.wait(5):
+                cancelled.set()
+        return message(call_id, tool_name, "done")
+
+    outcomes = {o["id"]: o for o in executor.iter_run([("1", "slow", {}), ("2", "fast", {})], execute)}
+    assert outcomes["2"]["status"] == "ok"
+    assert outcomes["1"]["status"] == "timeout"
+    assert "timed out after 0.2 seconds" in outcomes["1"]["message"]["content"]
+    assert cancelled.wait(1)
+    assert executor.stats()["slow"]["timeouts"] == 1
+
+
+def test_error_becomes_tool_message(executor):
+    def execute(call_id, tool_name, tool_args, cancel_event):
+        raise ValueError("boom")
+
+    [outcome] = executor.iter_run([("1", "broken", {})], execute)
+    assert outcome["status"] == "error"
+    assert outcome["message"] == message("1", "broken", "Error executing tool broken: boom")
+    assert executor.stats()["broken"]["errors"] == 1
+
+
+def test_stop_when_set_stops_consuming():
+    cancel_event = threading.Event()
+    consumed = []
+    for item in stop_when_set(range(10), cancel_event):
+        consumed.append(item)
+        if item == 2:
+            cancel_event.set()
+    assert consumed == [0, 1, 2]
@@ -0,0 +1,95 @@
+# test_tool_results.py
+
+import json
+
+from tool_results import ContinuationStore, fetch_more, page_rows, shape_tool_result
+
+
+class TrackedRows:
+    """
+    Row iterator that records how far it was read and whether it was closed.
+    """
+
+    def __init__(self, count):
+        self.read = 0
+        self.count = count
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.read >= self.count:
+            raise StopIteration
+        self.read += 1
+        return {"n": self.read - 1}
+
+    def close(self):
+        self.closed = True
+
+
+def test_small_result_keeps_plain_list():
+    assert json.loads(shape_tool_result([{"n": 1}, {"n": 2}])) == [{"n": 1}, {"n": 2}]
+
+
+def test_strings_and_dicts_are_capped():
+    assert "[TRUNCATED" in shape_tool_result("x" * 1000, max_tokens=10)
+    assert "[TRUNCATED" in shape_tool_result({"text": "x" * 1000}, max_tokens=10)
+    assert shape_tool_result(None) == "No tool response."
+
+
+def test_pages_through_all_rows_reading_each_once():
+    store = ContinuationStore()
+    rows = TrackedRows(25)
+    page = json.loads(page_rows(rows, max_rows=10, store=store))
+    assert [row["n"] for row in page["rows"]] == list(range(10))
+    # One row is read ahead to know there is more
+    assert rows.read == 11
+
+    seen = page["rows"]
+    while page.get("truncated"):
+        page = json.loads(fetch_more(page["continuation_id"], max_rows=10, store=store))
+        seen += page["rows"]
+    assert [row["n"] for row in seen] == list(range(25))
+    assert page["offset"] == 20
+    assert page["notice"] == "This is the last page of the result."
+
+
+def test_token_budget_cuts_pages():
+    store = ContinuationStore()
+    rows = ({"text": "x" * 400, "n": i} for i in range(20))
+    page = json.loads(page_rows(rows, max_tokens=400, store=store))
+    assert page["truncated"]
+    assert 0 < page["returned_rows"] < 20
+
+
+def test_unknown_continuation_is_an_error():
+    assert fetch_more("missing", store=ContinuationStore()).startswith("Error: continuation_id 'missing'")
+
+
+def test_continuation_is_single_use():
+    store = ContinuationStore()
+    page = json.loads(page_rows(TrackedRows(5), max_rows=2, store=store))
+    fetch_more(page["continuation_id"], max_rows=2, store=store)
+    assert fetch_more(page["continuation_id"], store=store).startswith("Error")
+
+
+def test_evicted_continuation_closes_its_rows():
+    store = ContinuationStore(max_entries=1)
+    first = TrackedRows(5)
+    page_rows(first, max_rows=2, store=store)
+    page_rows(TrackedRows(5), max_rows=2, store=store)
+    assert first.closed
+
+
+def test_expired_continuation_closes_its_rows(monkeypatch):
+    import tool_results
+
+    now = [1000.0]
+    monkeypatch.setattr(tool_results.time, "monotonic", lambda: now[0])
+    store = ContinuationStore(ttl_seconds=10)
+    rows = TrackedRows(5)
+    page = json.loads(page_rows(rows, max_rows=2, store=store))
+    now[0] += 11
+    assert fetch_more(page["continuation_id"], store=store).startswith("Error")
+    assert rows.closed
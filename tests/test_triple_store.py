@@ -0,0 +1,79 @@
+# test_triple_store.py
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from connector_loader import RDFConnector
+from triple_store import MappedTripleStore, open_mapped_graph, write_triple_store
+
+from conftest import DVT
+
+QUERIES = [
+    "SELECT ?s ?p ?o WHERE { ?s ?p ?o } ORDER BY ?s ?p ?o LIMIT 500",
+    "SELECT ?c ?parent WHERE { ?c rdfs:subClassOf ?parent } ORDER BY ?c",
+    "SELECT ?car ?serial WHERE { ?car a dvt:Car ; dvt:hasComponent/dvt:serialNumber ?serial } ORDER BY ?car",
+    "SELECT ?e WHERE { ?e dvt:displacement ?d FILTER(?d > 2.5) }",
+    "SELECT (COUNT(?s) AS ?n) WHERE { ?s a ?type }",
+    "ASK { dvt:car1 dvt:hasComponent dvt:engine1 }",
+]
+
+
+@pytest.fixture
+def graphs(ontology_file, tmp_path):
+    graph = Graph()
+    graph.parse(ontology_file)
+    path = str(tmp_path / "sample.triples")
+    write_triple_store(graph, path)
+    mapped = open_mapped_graph(path)
+    yield graph, mapped
+    mapped.close()
+
+
+def test_mapped_graph_holds_the_same_triples(graphs):
+    graph, mapped = graphs
+    assert len(mapped) == len(graph)
+    assert set(mapped) == set(graph)
+    assert dict(mapped.namespaces())["dvt"] == URIRef(DVT)
+
+
+@pytest.mark.parametrize("pattern", [
+    (URIRef(DVT + "car1"), None, None),
+    (None, RDF.type, None),
+    (None, None, URIRef(DVT + "Engine")),
+    (None, URIRef(DVT + "serialNumber"), Literal("E-1")),
+    (URIRef(DVT + "car1"), RDFS.label, Literal("Car one")),
+    (URIRef(DVT + "nothing"), None, None),
+])
+def test_triple_patterns_match(graphs, pattern):
+    graph, mapped = graphs
+    assert set(mapped.triples(pattern)) == set(graph.triples(pattern))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_sparql_results_match(graphs, query):
+    graph, mapped = graphs
+    namespaces = {"dvt": URIRef(DVT), "rdfs": RDFS}
+    expected = list(graph.query(query, initNs=namespaces))
+    assert list(mapped.query(query, initNs=namespaces)) == expected
+
+
+def test_mapped_graph_is_read_only(graphs):
+    _, mapped = graphs
+    with pytest.raises(TypeError):
+        mapped.add((URIRef(DVT + "car3"), RDF.type, URIRef(DVT + "Car")))
+
+
+def test_connector_backends_agree(ontology_file):
+    memory = RDFConnector(backend="memory")
+    mapped = RDFConnector(backend="mmap")
+    assert memory.connect(ontology_file) and mapped.connect(ontology_file)
+    assert isinstance(mapped.graph.store, MappedTripleStore)
+    try:
+        for query in QUERIES[:4]:
+            assert list(mapped.execute_query(query)) == list(memory.execute_query(query))
+        assert mapped.schema_lookup("subclasses", "dvt:Product", transitive=True) == \
+            memory.schema_lookup("subclasses", "dvt:Product", transitive=True)
+    finally:
+        memory.close()
+        mapped.close()
@@ -0,0 +1,80 @@
+# test_upload.py
+
+import io
+import os
+import time
+
+import pytest
+
+BROKEN_ONTOLOGY = "@prefix ex: <http://example.org/> . ex:a ex:b"
+
+
+@pytest.fixture
+def app(fake_embeddings, monkeypatch, tmp_path):
+    import app3
+
+    monkeypatch.setitem(app3.app.config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    return app3
+
+
+def upload(app, content, knowledge_base, filename="ontology.ttl"):
+    response = app.app.test_client().post("/upload-ontology", data={
+        "knowledge_base": knowledge_base,
+        "file": (io.BytesIO(content.encode("utf-8")), filename),
+    }, content_type="multipart/form-data")
+    assert response.status_code == 202, response.get_json()
+    job = app.ingestion_queue.get(response.get_json()["job_id"])
+    deadline = time.monotonic() + 30
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert job.finished, job.to_dict()
+    return job
+
+
+def removed(path, timeout: float = 5.0):
+    # Unused uploads are deleted right after their job finishes
+    deadline = time.monotonic() + timeout
+    while os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return not os.path.exists(path)
+
+
+def test_failed_upload_keeps_live_file(app, request, ontology_file):
+    from conftest import SAMPLE_ONTOLOGY
+
+    knowledge_base = "upload_" + request.node.name[-20:]
+    live = upload(app, SAMPLE_ONTOLOGY, knowledge_base)
+    assert live.status == "succeeded"
+
+    # Same file name as the live upload, so the old handler would have overwritten it
+    broken = upload(app, BROKEN_ONTOLOGY, knowledge_base)
+    assert broken.status == "failed"
+    assert app.knowledge_registry.ontology_file(knowledge_base) == live.file_path
+    assert app.knowledge_registry.current(knowledge_base).ontology_file == live.file_path
+    with open(live.file_path, encoding="utf-8") as f:
+        assert f.read() == SAMPLE_ONTOLOGY
+    assert removed(broken.file_path)
+
+
+def test_new_upload_replaces_old_file(app, request):
+    from conftest import SAMPLE_ONTOLOGY
+
+    knowledge_base = "upload_" + request.node.name[-20:]
+    first = upload(app, SAMPLE_ONTOLOGY, knowledge_base)
+    second = upload(app, SAMPLE_ONTOLOGY.replace('"C-1"', '"C-100"'), knowledge_base)
+    assert second.status == "succeeded"
+    assert second.file_path != first.file_path
+    assert app.knowledge_registry.ontology_file(knowledge_base) == second.file_path
+    assert os.path.exists(second.file_path)
+    assert removed(first.file_path)
+
+
+def test_reupload_of_same_content_keeps_file(app, request):
+    from conftest import SAMPLE_ONTOLOGY
+
+    knowledge_base = "upload_" + request.node.name[-20:]
+    first = upload(app, SAMPLE_ONTOLOGY, knowledge_base)
+    second = upload(app, SAMPLE_ONTOLOGY, knowledge_base)
+    assert second.status == "succeeded"
+    assert second.file_path == first.file_path
+    assert os.path.exists(second.file_path)
@@ -0,0 +1,126 @@
+# tool_executor.py
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+TOOL_EXECUTOR_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", "8"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+
+
+def stop_when_set(iterable, cancel_event: threading.Event):
+    """
+    Yields from iterable until cancel_event is set, so a timed-out tool stops
+    consuming (and formatting) further rows.
+    """
+    for item in iterable:
+        if cancel_event.is_set():
+            logger.info("Tool result consumption cancelled.")
+            return
+        yield item
+
+
+class ToolCallExecutor:
+    """
+    Runs the tool calls of one LLM turn concurrently on a bounded thread pool.
+
+    Each call gets a deadline (per tool name, falling back to default_timeout). When a
+    deadline passes, the call is cancelled: a queued call never starts, and a running
+    call sees its cancel_event set. Its outcome becomes a timeout message. Per-tool
+    durations are aggregated in stats().
+    """
+
+    def __init__(self, max_workers: int = None, default_timeout: float = None, timeouts: dict = None):
+        self.default_timeout = TOOL_TIMEOUT_SECONDS if default_timeout is None else default_timeout
+        self.timeouts = dict(timeouts or {})
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or TOOL_EXECUTOR_WORKERS, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    def _record(self, tool_name: str, duration_ms: float, status: str):
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "timeouts": 0, "errors": 0})
+            stats["calls"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            if status == "timeout":
+                stats["timeouts"] += 1
+            elif status == "error":
+                stats["errors"] += 1
+
+    def iter_run(self, calls, execute):
+        """
+        Submits calls (a list of (call_id, tool_name, tool_args)) and yields outcome dicts
+        in completion order. execute(call_id, tool_name, tool_args, cancel_event) must
+        return the tool message for the LLM.
+
+        Each outcome has: index, id, name, status ("ok", "timeout" or "error"),
+        duration_ms and message.
+        """
+        pending = {}
+        for index, (call_id, tool_name, tool_args) in enumerate(calls):
+            cancel_event = threading.Event()
+            submitted = time.perf_counter()
+            # Copy the caller's context so the call's spans join the request's trace
+            future = self._pool.submit(
+                contextvars.copy_context().run, execute, call_id, tool_name, tool_args, cancel_event
+            )
+            pending[future] = (index, call_id, tool_name, cancel_event, submitted, submitted + self.timeout_for(tool_name))
+
+        while pending:
+            nearest_deadline = min(entry[5] for entry in pending.values())
+            done, _ = wait(pending, timeout=max(nearest_deadline - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, call_id, tool_name, _, submitted, _ = pending.pop(future)
+                duration_ms = (time.perf_counter() - submitted) * 1000
+                try:
+                    message = future.result()
+                    status = "ok"
+                except Exception as e:
+                    logger.error(f"Tool '{tool_name}' (ID: {call_id}) raised: {e}")
+                    message = self._error_message(call_id, tool_name, f"Error executing tool {tool_name}: {e}")
+                    status = "error"
+                self._record(tool_name, duration_ms, status)
+                yield {"index": index, "id": call_id, "name": tool_name, "status": status,
+                       "duration_ms": round(duration_ms, 1), "message": message}
+
+            now = time.perf_counter()
+            for future, (index, call_id, tool_name, cancel_event, submitted, deadline) in list(pending.items()):
+                if now < deadline:
+                    continue
+                del pending[future]
+                cancel_event.set()
+                future.cancel()
+                timeout = self.timeout_for(tool_name)
+                logger.warning(f"Tool '{tool_name}' (ID: {call_id}) timed out after {timeout:g}s and was cancelled.")
+                duration_ms = (now - submitted) * 1000
+                self._record(tool_name, duration_ms, "timeout")
+                message = self._error_message(
+                    call_id, tool_name,
+                    f"Error: tool {tool_name} timed out after {timeout:g} seconds. Try a narrower or simpler request."
+                )
+                yield {"index": index, "id": call_id, "name": tool_name, "status": "timeout",
+                       "duration_ms": round(duration_ms, 1), "message": message}
+
+    @staticmethod
+    def _error_message(call_id, tool_name, content):
+        return {"role": "tool", "tool_call_id": call_id, "name": tool_name, "content": content}
+
+    def stats(self):
+        """
+        Returns per-tool call counts, mean/max duration and timeout/error counts.
+        """
+        with self._lock:
+            return {
+                name: {**stats, "mean_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0}
+                for name, stats in self._stats.items()
+            }
@@ -0,0 +1,225 @@
+# tool_results.py
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "4000"))
+TOOL_RESULT_MAX_ROWS = int(os.getenv("TOOL_RESULT_MAX_ROWS", "200"))
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "500"))
+# Rough average for JSON-ish English text with OpenAI tokenizers.
+CHARS_PER_TOKEN = 4
+# Characters kept free for the paging envelope (offset, notice, continuation_id).
+ENVELOPE_RESERVE_CHARS = 512
+
+CONTINUATION_TOOL_NAME = "fetch_more_tool_results"
+CONTINUATION_TOOL = {
+    "type": "function",
+    "function": {
+        "name": CONTINUATION_TOOL_NAME,
+        "description": "Fetch the next page of a tool result that was truncated. Use the continuation_id returned in the truncated result. Only do this if the rows already returned are not enough to answer.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "continuation_id": {
+                    "type": "string",
+                    "description": "The continuation_id from a truncated tool result."
+                }
+            },
+            "required": ["continuation_id"]
+        }
+    }
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns a cheap token estimate for text (no tokenizer call on the hot path).
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def preview(value, limit: int = None) -> str:
+    """
+    Returns a bounded string rendering of value for logging.
+    """
+    limit = LOG_PREVIEW_CHARS if limit is None else limit
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def close_rows(rows):
+    """
+    Closes a row iterator that supports it (generators, guarded query results), so the
+    work behind an abandoned result stops.
+    """
+    close = getattr(rows, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logger.error(f"Error closing result iterator: {e}")
+
+
+class ResumedRows:
+    """
+    Row iterator with one already-read row put back in front. close() closes the source.
+    """
+
+    def __init__(self, first, rows):
+        self._first = [first]
+        self._rows = rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._first:
+            return self._first.pop()
+        return next(self._rows)
+
+    def close(self):
+        self._first = []
+        close_rows(self._rows)
+
+
+class ContinuationStore:
+    """
+    Bounded, expiring store of partially consumed result iterators, keyed by continuation ID.
+    Iterators that expire or are evicted are closed.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # id -> (iterator, offset, expires_at)
+        self._lock = threading.Lock()
+
+    def _sweep(self, now: float):
+        """
+        Removes expired and overflowing entries. Returns their iterators; the caller
+        closes them outside the lock. Entries are in insertion order, so expiry is too.
+        """
+        dropped = []
+        while self._entries:
+            continuation_id, (iterator, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at >= now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[continuation_id]
+            dropped.append(iterator)
+        return dropped
+
+    def put(self, iterator, offset: int) -> str:
+        continuation_id = uuid.uuid4().hex[:16]
+        now = time.monotonic()
+        with self._lock:
+            self._entries[continuation_id] = (iterator, offset, now + self.ttl_seconds)
+            dropped = self._sweep(now)
+        for rows in dropped:
+            close_rows(rows)
+        return continuation_id
+
+    def take(self, continuation_id: str):
+        """
+        Removes and returns (iterator, offset) for continuation_id, or None if unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.pop(continuation_id, None)
+            dropped = self._sweep(now)
+        for rows in dropped:
+            close_rows(rows)
+        if entry is None:
+            return None
+        if entry[2] < now:
+            close_rows(entry[0])
+            return None
+        return entry[0], entry[1]
+
+continuation_store = ContinuationStore()
+
+
+def _truncate_text(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return (
+        f"{text[:max_chars]}\n[TRUNCATED: output was {len(text)} characters "
+        f"(~{estimate_tokens(text)} tokens); showing the first {max_chars}. Narrow the request to see more.]"
+    )
+
+
+def page_rows(rows, max_tokens: int = None, max_rows: int = None, store: ContinuationStore = None, offset: int = 0) -> str:
+    """
+    Serialises rows from an iterator until the row or token budget is reached.
+
+    Untruncated first pages keep the plain JSON list format. Otherwise returns a JSON
+    object with the rows, a truncation notice and a continuation_id for the rest.
+    """
+    max_tokens = max_tokens or TOOL_RESULT_MAX_TOKENS
+    max_rows = max_rows or TOOL_RESULT_MAX_ROWS
+    store = store or continuation_store
+    max_chars = max(max_tokens * CHARS_PER_TOKEN - ENVELOPE_RESERVE_CHARS, ENVELOPE_RESERVE_CHARS)
+    rows = iter(rows)
+
+    parts = []
+    used_chars = 2
+    continuation_id = None
+    for row in rows:
+        encoded = json.dumps(row)
+        if parts and (len(parts) >= max_rows or used_chars + len(encoded) + 2 > max_chars):
+            continuation_id = store.put(ResumedRows(row, rows), offset + len(parts))
+            break
+        parts.append(encoded)
+        used_chars += len(encoded) + 2
+
+    body = "[" + ", ".join(parts) + "]"
+    if continuation_id is None and offset == 0:
+        return _truncate_text(body, max_tokens)
+
+    meta = {"offset": offset, "returned_rows": len(parts), "truncated": continuation_id is not None}
+    if continuation_id is not None:
+        meta["continuation_id"] = continuation_id
+        meta["notice"] = (
+            f"Result truncated after {offset + len(parts)} rows to stay within the tool output budget. "
+            f"Call {CONTINUATION_TOOL_NAME} with this continuation_id for more rows, "
+            "or refine the query (add filters or LIMIT) if these rows are sufficient."
+        )
+    else:
+        meta["notice"] = "This is the last page of the result."
+    return _truncate_text('{"rows": ' + body + ", " + json.dumps(meta)[1:], max_tokens)
+
+
+def shape_tool_result(result, max_tokens: int = None, max_rows: int = None, store: ContinuationStore = None) -> str:
+    """
+    Converts a tool's raw result into message content that fits the tool output budget.
+    Strings and dicts are capped by size; lists and generators are paged row by row.
+    """
+    max_tokens = max_tokens or TOOL_RESULT_MAX_TOKENS
+    if isinstance(result, str):
+        return _truncate_text(result, max_tokens)
+    if isinstance(result, dict):
+        return _truncate_text(json.dumps(result), max_tokens)
+    if result is None:
+        return "No tool response."
+    return page_rows(result, max_tokens=max_tokens, max_rows=max_rows, store=store)
+
+
+def fetch_more(continuation_id: str, max_tokens: int = None, max_rows: int = None, store: ContinuationStore = None) -> str:
+    """
+    Returns the next page for a continuation_id produced by page_rows.
+    """
+    store = store or continuation_store
+    entry = store.take(continuation_id)
+    if entry is None:
+        return f"Error: continuation_id '{continuation_id}' is unknown or has expired. Re-run the original query."
+    rows, offset = entry
+    return page_rows(rows, max_tokens=max_tokens, max_rows=max_rows, store=store, offset=offset)
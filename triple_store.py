@@ -0,0 +1,289 @@
+# triple_store.py
+
+import os
+import json
+import mmap
+import struct
+import logging
+import threading
+from functools import lru_cache
+
+import numpy as np
+from rdflib import Graph, URIRef
+from rdflib.store import Store
+from rdflib.util import from_n3
+
+logger = logging.getLogger(__name__)
+
+TRIPLE_STORE_SUFFIX = ".triples"
+TRIPLE_STORE_TERM_CACHE = int(os.getenv("TRIPLE_STORE_TERM_CACHE", "65536"))
+
+# File layout (little endian, sections 8-byte aligned):
+#   header   magic, term count, triple count, metadata bytes, term blob bytes
+#   metadata JSON (namespace bindings)
+#   offsets  uint64[terms + 1] into the term blob
+#   blob     N3 encodings of all terms, sorted bytewise; a term's ID is its rank
+#   spo, pos, osp  uint32[triples, 3] with rows in (s,p,o), (p,o,s), (o,s,p) column order, each sorted
+MAGIC = b"RDFTS001"
+# Part of the cache file name, so files in an older layout are never attached
+TRIPLE_STORE_FORMAT = "mmap1"
+HEADER = struct.Struct("<8sQQQQ")
+# Column order of each index, as positions into an (s, p, o) triple
+INDEX_ORDERS = {"spo": (0, 1, 2), "pos": (1, 2, 0), "osp": (2, 0, 1)}
+
+
+def _pad(length: int) -> int:
+    return (8 - length % 8) % 8
+
+
+def write_triple_store(graph: Graph, path: str):
+    """
+    Writes graph as an integer-encoded triple store file at path. The file is written
+    to a temporary name and renamed, so concurrent readers only ever see a complete file.
+    """
+    encoded = {}
+    for triple in graph:
+        for term in triple:
+            if term not in encoded:
+                encoded[term] = term.n3().encode("utf-8")
+    blobs = sorted(set(encoded.values()))
+    term_ids = {blob: term_id for term_id, blob in enumerate(blobs)}
+
+    offsets = np.zeros(len(blobs) + 1, dtype="<u8")
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    triples = np.array(
+        [[term_ids[encoded[s]], term_ids[encoded[p]], term_ids[encoded[o]]] for s, p, o in graph],
+        dtype="<u4"
+    ).reshape(-1, 3)
+
+    metadata = json.dumps({"namespaces": [(prefix, str(namespace)) for prefix, namespace in graph.namespaces()]}).encode("utf-8")
+    blob = b"".join(blobs)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(blobs), len(triples), len(metadata), len(blob)))
+            for section in (metadata, offsets.tobytes(), blob):
+                f.write(section)
+                f.write(b"\0" * _pad(len(section)))
+            for order in INDEX_ORDERS.values():
+                index = triples[:, order]
+                # lexsort sorts by the last key first
+                index = index[np.lexsort((index[:, 2], index[:, 1], index[:, 0]))]
+                f.write(np.ascontiguousarray(index).tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    logger.info(f"Wrote triple store {path}: {len(blobs)} terms, {len(triples)} triples.")
+
+
+class MappedTripleStore(Store):
+    """
+    Read-only rdflib store over a memory-mapped triple store file.
+
+    Triples are looked up by binary search in the sorted SPO/POS/OSP index arrays, and
+    term IDs are resolved through the sorted term dictionary, all directly on the
+    mapping. Nothing is copied into the process, so any number of worker processes can
+    attach to the same file and share one copy in the OS page cache. Decoded terms are
+    kept in a bounded per-process LRU.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_terms, n_triples, metadata_len, blob_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a triple store file.")
+
+        position = HEADER.size
+        metadata = json.loads(self._mmap[position:position + metadata_len].decode("utf-8"))
+        position += metadata_len + _pad(metadata_len)
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=n_terms + 1, offset=position)
+        position += self._offsets.nbytes + _pad(self._offsets.nbytes)
+        self._blob_start = position
+        position += blob_len + _pad(blob_len)
+        self._indexes = {}
+        for name in INDEX_ORDERS:
+            self._indexes[name] = np.frombuffer(self._mmap, dtype="<u4", count=n_triples * 3, offset=position).reshape(-1, 3)
+            position += n_triples * 12
+
+        self.n_terms = n_terms
+        self.n_triples = n_triples
+        self._term = lru_cache(maxsize=TRIPLE_STORE_TERM_CACHE)(self._decode_term)
+        self.__namespace = {}
+        self.__prefix = {}
+        for prefix, namespace in metadata.get("namespaces", []):
+            self.bind(prefix, URIRef(namespace))
+
+    # --- Term dictionary ---
+
+    def _encoded(self, term_id: int) -> bytes:
+        start = self._blob_start + int(self._offsets[term_id])
+        end = self._blob_start + int(self._offsets[term_id + 1])
+        return self._mmap[start:end]
+
+    def _decode_term(self, term_id: int):
+        return from_n3(self._encoded(term_id).decode("utf-8"))
+
+    def term_id(self, term):
+        """
+        Returns the ID of term, or None if it does not occur in the store.
+        """
+        target = term.n3().encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._encoded(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._encoded(lo) == target:
+            return lo
+        return None
+
+    # --- Index lookups ---
+
+    def _select(self, s, p, o):
+        """
+        Picks the index whose leading columns are bound. Returns (index name, key of
+        bound leading columns).
+        """
+        if s is not None:
+            if p is not None:
+                return "spo", (s, p, o)
+            if o is not None:
+                return "osp", (o, s)
+            return "spo", (s,)
+        if p is not None:
+            return "pos", (p, o)
+        if o is not None:
+            return "osp", (o,)
+        return "spo", ()
+
+    def _range(self, index, key):
+        lo, hi = 0, len(index)
+        for column, value in enumerate(key):
+            if value is None:
+                break
+            values = index[lo:hi, column]
+            lo, hi = lo + int(np.searchsorted(values, value, "left")), lo + int(np.searchsorted(values, value, "right"))
+            if lo >= hi:
+                break
+        return lo, hi
+
+    def _match_ids(self, triple_pattern):
+        """
+        Returns (index name, matching rows) for a pattern of terms and None wildcards,
+        or None if a bound term is not in the store.
+        """
+        ids = []
+        for term in triple_pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            term_id = self.term_id(term)
+            if term_id is None:
+                return None
+            ids.append(term_id)
+        name, key = self._select(*ids)
+        index = self._indexes[name]
+        lo, hi = self._range(index, key)
+        return name, index[lo:hi]
+
+    def count(self, triple_pattern) -> int:
+        """
+        Returns the number of triples matching a pattern without decoding any terms.
+        """
+        match = self._match_ids(triple_pattern)
+        return 0 if match is None else len(match[1])
+
+    def triples(self, triple_pattern, context=None):
+        # Patterns may carry non-term objects (e.g. SPARQL paths) only for p, which
+        # rdflib's Graph resolves before calling the store
+        match = self._match_ids(tuple(triple_pattern))
+        if match is None:
+            return
+        name, rows = match
+        order = INDEX_ORDERS[name]
+        positions = (order.index(0), order.index(1), order.index(2))
+        term = self._term
+        for row in rows.tolist():
+            yield (term(row[positions[0]]), term(row[positions[1]]), term(row[positions[2]])), iter(())
+
+    def __len__(self, context=None):
+        return self.n_triples
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    # --- Read-only ---
+
+    def add(self, triple, context, quoted=False):
+        raise TypeError("MappedTripleStore is read-only.")
+
+    def addN(self, quads):
+        raise TypeError("MappedTripleStore is read-only.")
+
+    def remove(self, triple, context=None):
+        raise TypeError("MappedTripleStore is read-only.")
+
+    # --- Namespace bindings (per process; same semantics as rdflib's Memory store) ---
+
+    def bind(self, prefix, namespace, override: bool = True):
+        bound_namespace = self.__namespace.get(prefix)
+        bound_prefix = self.__prefix.get(namespace)
+        if bound_prefix is None and bound_namespace is not None:
+            bound_prefix = self.__prefix.get(bound_namespace)
+        if override:
+            if bound_prefix is not None:
+                del self.__namespace[bound_prefix]
+            if bound_namespace is not None:
+                del self.__prefix[bound_namespace]
+            self.__prefix[namespace] = prefix
+            self.__namespace[prefix] = namespace
+        else:
+            self.__prefix[bound_namespace if bound_namespace is not None else namespace] = bound_prefix if bound_prefix is not None else prefix
+            self.__namespace[bound_prefix if bound_prefix is not None else prefix] = bound_namespace if bound_namespace is not None else namespace
+
+    def namespace(self, prefix):
+        return self.__namespace.get(prefix)
+
+    def prefix(self, namespace):
+        return self.__prefix.get(namespace)
+
+    def namespaces(self):
+        yield from list(self.__namespace.items())
+
+    def close(self, commit_pending_transaction: bool = False):
+        # The numpy views must be released before the mapping can be closed
+        self._indexes.clear()
+        self._offsets = None
+        self._term.cache_clear()
+        try:
+            self._mmap.close()
+        except BufferError:
+            logger.warning(f"Triple store {self.path} is still referenced; leaving it mapped.")
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "terms": self.n_terms,
+            "triples": self.n_triples,
+            "bytes": len(self._mmap),
+            "term_cache": self._term.cache_info()._asdict(),
+        }
+
+
+def open_mapped_graph(path: str) -> Graph:
+    """
+    Attaches to a triple store file and returns a read-only rdflib Graph over it.
+    """
+    return Graph(store=MappedTripleStore(path))